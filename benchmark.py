@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Benchmark - Measure what each driver read costs
+
+Runs drivers through DriverLoader.run_driver (real hardware, or simulated
+with --simulate) and reports per-read latency percentiles, CPU time, read/write
+syscalls and peak Python memory. It also reports how busy each driver keeps its
+worker pool at its configured read_in_sec. Results can be saved as a JSON
+baseline, and later runs fail (exit 1) when a driver got slower than the
+baseline by more than the threshold.
+
+    python3 benchmark.py --simulate --rounds 50
+    python3 benchmark.py --simulate --save-baseline bench_baseline.json
+    python3 benchmark.py --simulate --baseline bench_baseline.json --threshold 20
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+# Regressions smaller than this (ms) are treated as noise whatever the percentage
+MIN_REGRESSION_MS = 1.0
+
+
+def read_proc_io():
+    """Return (read syscalls, write syscalls) of this process, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/io', 'r') as f:
+            fields = dict(line.split(': ', 1) for line in f.read().splitlines())
+        return int(fields['syscr']), int(fields['syscw'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)]
+
+
+def bench_driver(loader, name, config_dict, rounds):
+    """
+    Read one driver `rounds` times (after one untimed first read) and return its metrics
+
+    Every read goes to the driver: the reading cache, failure backoff,
+    quarantine and worker-process isolation are turned off for the benchmark.
+    """
+    config_dict = dict(config_dict, cache_ttl_sec=0, read_in_sec=0, quarantine_after=0, isolate=False)
+
+    # First read includes the import and the driver's open(); report it on its own
+    start = time.perf_counter()
+    loader.run_driver(name, config_dict)
+    first_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    empty = 0
+    io_before = read_proc_io()
+    cpu_before = time.process_time()
+    for _ in range(rounds):
+        start = time.perf_counter()
+        readings = loader.run_driver(name, config_dict)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not readings:
+            empty += 1
+    cpu_ms = (time.process_time() - cpu_before) * 1000 / rounds
+    io_after = read_proc_io()
+
+    # Separate traced read, so tracemalloc overhead doesn't skew the timings
+    tracemalloc.start()
+    try:
+        loader.run_driver(name, config_dict)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    result = {
+        'rounds': rounds,
+        'first_ms': round(first_ms, 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(max(latencies), 3),
+        'cpu_ms': round(cpu_ms, 3),
+        'peak_kb': round(peak / 1024, 1),
+        'empty': empty,
+    }
+    if io_before and io_after:
+        result['syscr'] = round((io_after[0] - io_before[0]) / rounds, 1)
+        result['syscw'] = round((io_after[1] - io_before[1]) / rounds, 1)
+    return result
+
+
+def pool_load(loader, drivers, results):
+    """Share of one worker thread each pool needs: mean read time / read_in_sec, summed per pool"""
+    load = {}
+    for name, config_dict in drivers:
+        if name not in results:
+            continue
+        interval = float(config_dict.get('read_in_sec', 60)) or 60
+        share = results[name]['mean_ms'] / 1000.0 / interval
+        results[name]['load_pct'] = round(share * 100, 3)
+        pool = loader.get_pool_name(name, config_dict)
+        load[pool] = load.get(pool, 0.0) + share
+    return load
+
+
+def compare(results, baseline, threshold_pct):
+    """Return a list of regression messages against a baseline"""
+    regressions = []
+    for name, current in sorted(results.items()):
+        base = baseline.get('drivers', {}).get(name)
+        if not base:
+            continue
+        for metric in ('p95_ms', 'cpu_ms'):
+            old, new = base.get(metric), current.get(metric)
+            if old is None or new is None:
+                continue
+            if new > old * (1 + threshold_pct / 100.0) and new - old > MIN_REGRESSION_MS:
+                regressions.append(f'{name}: {metric} {old:g} -> {new:g} (+{(new / old - 1) * 100 if old else 100:.0f}%)')
+    return regressions
+
+
+def print_table(results, load, loader):
+    header = f"{'driver':<20}{'first':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'cpu':>9}{'peak KB':>9}{'syscr':>7}{'syscw':>7}{'empty':>6}{'load%':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, r in sorted(results.items()):
+        print(f"{name:<20}{r['first_ms']:9.1f}{r['p50_ms']:9.2f}{r['p95_ms']:9.2f}{r['p99_ms']:9.2f}"
+              f"{r['cpu_ms']:9.2f}{r['peak_kb']:9.1f}{r.get('syscr', 0):7g}{r.get('syscw', 0):7g}"
+              f"{r['empty']:6d}{r.get('load_pct', 0):8.2f}")
+    print('(times in ms per read; load% = mean read time / read_in_sec)')
+    for pool, share in sorted(load.items()):
+        size = loader.pool_sizes.get(pool, 1)
+        print(f"Pool '{pool}': {share:.3f} of a thread busy on average, {size} configured")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark driver reads')
+    parser.add_argument('--drivers', help='drivers_config.yaml to benchmark (default: drivers_config.yaml, '
+                                          'or every simulated driver with --simulate)')
+    parser.add_argument('--only', nargs='+', help='benchmark only these drivers or instances')
+    parser.add_argument('--rounds', type=int, default=20, help='timed reads per driver')
+    parser.add_argument('--simulate', action='store_true', help='run against simulated hardware (simulation.py)')
+    parser.add_argument('--sim-config', help='simulation config (YAML)')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--baseline', help='compare against this baseline JSON and exit 1 on regression')
+    parser.add_argument('--threshold', type=float, default=20.0, help='allowed slowdown in percent (default 20)')
+    parser.add_argument('--save-baseline', help='write results as a new baseline to this file')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='[%(asctime)s] %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    import yaml
+
+    sim = None
+    if args.simulate:
+        from simulation import Simulation, simulated_drivers_config
+        sim_config = {}
+        if args.sim_config:
+            with open(args.sim_config, 'r') as f:
+                sim_config = yaml.safe_load(f) or {}
+        sim = Simulation(sim_config).install()
+
+    try:
+        from driver_loader import DriverLoader
+        drivers_file = args.drivers
+        if not drivers_file and sim is not None:
+            drivers_file = os.path.join(sim.root, 'drivers_config.yaml')
+            with open(drivers_file, 'w') as f:
+                yaml.safe_dump(simulated_drivers_config(), f)
+        loader = DriverLoader(config_file=os.path.abspath(drivers_file or 'drivers_config.yaml'))
+        drivers = loader.get_enabled_drivers()
+        if args.only:
+            drivers = [(n, c) for n, c in drivers if n in args.only or n.split(':', 1)[0] in args.only]
+        if not drivers:
+            print('No enabled drivers to benchmark')
+            return 1
+
+        results = {}
+        try:
+            for name, config_dict in drivers:
+                print(f'Benchmarking {name} ({args.rounds} reads)...', file=sys.stderr)
+                results[name] = bench_driver(loader, name, config_dict, args.rounds)
+            load = pool_load(loader, drivers, results)
+        finally:
+            loader.shutdown()
+    finally:
+        if sim is not None:
+            sim.uninstall()
+
+    print_table(results, load, loader)
+    report = {
+        'meta': {
+            'time': time.time(),
+            'rounds': args.rounds,
+            'simulated': bool(args.simulate),
+            'python': sys.version.split()[0],
+        },
+        'drivers': results,
+        'pools': {pool: round(share, 4) for pool, share in load.items()},
+    }
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\nRegressions over {args.threshold:g}%:')
+            for line in regressions:
+                print(f'  {line}')
+            return 1
+        print(f'\nNo regressions over {args.threshold:g}% against {args.baseline}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,14 +5,17 @@ import http.server
 import socketserver
 from urllib.parse import urlparse, parse_qs
 
+from driver_loader import driver_module
 from nettemp import insert2
+from reading import Reading, as_readings
 
 
 class HTTPBridge:
     """Lightweight HTTP bridge that accepts local HTTP requests and forwards them to Nettemp Cloud."""
 
-    def __init__(self, cloud_client, default_device_id: str, config: dict | None):
+    def __init__(self, cloud_client, default_device_id: str, config: dict | None, loader=None):
         self.cloud_client = cloud_client
+        self.loader = loader
         self.default_device_id = default_device_id or 'nettemp-client'
         cfg = config or {}
         self.enabled = bool(cfg.get('enabled', False))
@@ -47,6 +50,14 @@ class HTTPBridge:
                 else:
                     self.send_error(502, 'Failed to forward payload')
 
+            def _send_json(self, data):
+                body = json.dumps(data).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
             def do_POST(self):
                 if not self._check_auth():
                     return
@@ -71,6 +82,19 @@ class HTTPBridge:
                     params = parse_qs(parsed.query)
                     success = bridge._handle_generic(params)
                     self._send_result(success)
+                elif parsed.path.rstrip('/') == '/status' and bridge.loader is not None:
+                    if not self._check_auth():
+                        return
+                    self._send_json(bridge._driver_status())
+                elif parsed.path.rstrip('/') == '/readings' and bridge.loader is not None:
+                    if not self._check_auth():
+                        return
+                    try:
+                        data = bridge._current_readings(parse_qs(parsed.query))
+                    except ValueError as e:
+                        self.send_error(400, str(e))
+                        return
+                    self._send_json(data)
                 else:
                     self.send_error(404)
 
@@ -112,7 +136,11 @@ class HTTPBridge:
     def _handle_payload(self, payload) -> bool:
         try:
             if isinstance(payload, list):
-                insert2(payload).request()
+                # Legacy payload: parse to Readings once at the edge
+                readings = as_readings(payload)
+                if not readings:
+                    return False
+                insert2(readings).request()
                 return True
             if isinstance(payload, dict):
                 if 'readings' in payload:
@@ -123,12 +151,51 @@ class HTTPBridge:
                         return self.cloud_client.send_payload(data)
                     return False
                 if 'rom' in payload:
-                    insert2([payload]).request()
+                    readings = as_readings([payload])
+                    if not readings:
+                        return False
+                    insert2(readings).request()
                     return True
         except Exception as e:
             logging.error(f'Bridge payload forward failed: {e}')
         return False
 
+    def _current_readings(self, params: dict[str, list[str]]) -> dict:
+        """
+        Current values of enabled drivers, keyed by driver (or instance) name
+
+        A reading taken within max_age seconds (default: the driver's
+        read_in_sec) is served from the loader's cache, so polling this
+        endpoint normally reuses the scheduler's last sample instead of
+        touching the hardware.
+        """
+        wanted = set(params.get('driver', []))
+        max_age = params.get('max_age', [None])[0]
+        if max_age is not None:
+            max_age = float(max_age)
+
+        data = {}
+        for name, cfg in self.loader.get_enabled_drivers():
+            if wanted and name not in wanted and driver_module(name) not in wanted:
+                continue
+            age = max_age if max_age is not None else float(cfg.get('read_in_sec', 60))
+            data[name] = [
+                dict(r.to_dict(), timestamp=r.timestamp)
+                for r in self.loader.run_driver(name, cfg, max_age=age)
+            ]
+        return data
+
+    def _driver_status(self) -> dict:
+        """Run counters and health of every enabled driver"""
+        stats = self.loader.get_driver_stats()
+        health = self.loader.get_driver_health()
+        status = {}
+        for name, _ in self.loader.get_enabled_drivers():
+            entry = dict(stats.get(name, {}))
+            entry.update(health.get(name, {'state': 'ok', 'failures': 0}))
+            status[name] = entry
+        return {'drivers': status}
+
     def _handle_generic(self, params: dict[str, list[str]]) -> bool:
         try:
             sysname = params.get('name', [''])[0] or self.default_device_id
@@ -144,14 +211,8 @@ class HTTPBridge:
             rom_parts.append(valuename)
             rom = '_'.join([p for p in rom_parts if p])
 
-            payload = [{
-                'rom': rom,
-                'type': valuename,
-                'value': value,
-                'unit': unit,
-                'name': f'{task}/{valuename}' if task else valuename
-            }]
-            insert2(payload).request()
+            reading = Reading(rom, valuename, value, f'{task}/{valuename}' if task else valuename, unit)
+            insert2([reading]).request()
             return True
         except Exception as e:
             logging.error(f'Bridge generic payload failed: {e}')
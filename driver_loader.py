@@ -3,21 +3,175 @@ Driver loader - Auto-discover and schedule sensor drivers
 """
 import importlib
 import logging
-import yaml
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from pathlib import Path
 
+from drivers import _i2c
+from drivers._base import DriverHandle, is_driver_class
+from reading import as_readings
+
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
 
+# Worker pool each driver runs on (override per driver with `pool:` in drivers_config.yaml).
+# Keeping the classes apart means a wedged bus read cannot starve network probes.
+DRIVER_POOLS = {
+    'adxl343': 'bus',
+    'adxl345': 'bus',
+    'bh1750': 'bus',
+    'bme280': 'bus',
+    'bmp180': 'bus',
+    'dht11': 'bus',
+    'dht22': 'bus',
+    'ds2482': 'bus',
+    'hih6130': 'bus',
+    'htu21d': 'bus',
+    'mpl3115a2': 'bus',
+    'sdm120': 'bus',
+    'tmp102': 'bus',
+    'tsl2561': 'bus',
+    'vl53l0x': 'bus',
+    'w1_kernel': 'bus',
+    'w1_kernel_gpio': 'bus',
+    'lm_sensors': 'subprocess',
+    'ping': 'network',
+}
+
+# Drivers that sit on an I2C bus. They share one handle and lock per bus and,
+# unless runtime.i2c_batching is off, are read back-to-back in one job per bus.
+I2C_DRIVERS = {
+    'adxl343', 'adxl345', 'bh1750', 'bme280', 'bmp180', 'hih6130', 'htu21d',
+    'mpl3115a2', 'tmp102', 'tsl2561', 'vl53l0x',
+}
+
+# I2C drivers that accept a shared smbus handle (`_smbus`) or busio.I2C (`_busio`)
+SMBUS_DRIVERS = {'bh1750', 'bme280', 'bmp180', 'hih6130', 'mpl3115a2', 'tmp102'}
+BUSIO_DRIVERS = {'adxl343', 'adxl345', 'htu21d', 'tsl2561', 'vl53l0x'}
+
+# Drivers on a serial line. Instances sharing a port are read in one job per port.
+SERIAL_DRIVERS = {'sdm120'}
+
+# Worker threads per pool class (override with runtime.pools in config.conf)
+DEFAULT_POOL_SIZES = {
+    'bus': 2,
+    'subprocess': 2,
+    'network': 4,
+    'default': 2,
+}
+
+# Seconds a driver may run before its reading is abandoned (override with timeout_sec)
+DEFAULT_TIMEOUT_SEC = 30
+
+# Seconds a reading is reused instead of sampling the sensor again (override with
+# cache_ttl_sec). DHT sensors need 2s between reads and a 1-Wire conversion takes 750ms.
+DEFAULT_CACHE_TTL_SEC = {
+    'dht11': 2,
+    'dht22': 2,
+    'ds2482': 1,
+    'w1_kernel': 1,
+    'w1_kernel_gpio': 1,
+}
+
+# A driver that fails (raises or returns nothing) several runs in a row is
+# retried after read_in_sec * (2^(failures-1) - 1) seconds, capped at
+# backoff_max_sec, and quarantined after quarantine_after failures: it is then
+# only re-probed every quarantine_probe_sec (all set in runtime or per driver).
+DEFAULT_BACKOFF_MAX_SEC = 900
+DEFAULT_QUARANTINE_AFTER = 10
+DEFAULT_QUARANTINE_PROBE_SEC = 3600
+
+# Drivers for which returning nothing is a normal run, not a failure: ds2482
+# only brings up hardware, and system's rate metrics have no value on the
+# first delta read (override per driver with empty_ok). Raising still fails.
+EMPTY_OK_DRIVERS = {'ds2482', 'system'}
+
+
+def driver_module(name):
+    """Return the driver module of a driver or driver instance name ('bme280:0x77' -> 'bme280')"""
+    return name.split(':', 1)[0]
+
+
+def expand_instances(driver_name, driver_config):
+    """
+    Expand a driver's `instances:` list into one entry per instance
+
+    Each instance inherits the driver-level settings and overrides them. It is
+    named '<driver>:<id>', where id is the instance's `id`, `i2c_address` or
+    `unit` (or its position in the list).
+
+    Returns:
+        List of (name, config_dict) tuples; [(driver_name, driver_config)] without instances
+    """
+    instances = driver_config.get('instances')
+    if not instances:
+        return [(driver_name, driver_config)]
+    if not isinstance(instances, list):
+        logging.warning(f"Driver '{driver_name}' has invalid instances, expected a list")
+        return []
+
+    base = {key: value for key, value in driver_config.items() if key != 'instances'}
+    expanded = []
+    seen = set()
+    for index, instance in enumerate(instances):
+        if not isinstance(instance, dict):
+            logging.warning(f"Driver '{driver_name}' instance {index} is not a mapping, skipping")
+            continue
+        config_dict = dict(base, **instance)
+        if instance.get('id') is not None:
+            ident = str(instance['id'])
+        elif instance.get('i2c_address') is not None:
+            ident = f"0x{int(str(instance['i2c_address']), 0):02x}"
+        elif instance.get('unit') is not None:
+            ident = str(instance['unit'])
+        else:
+            ident = str(index)
+        if ident in seen:
+            ident = f'{ident}-{index}'
+        seen.add(ident)
+        expanded.append((f'{driver_name}:{ident}', config_dict))
+    return expanded
+
+
+def _same_setting(configured, detected):
+    """True if a configured i2c_bus/i2c_address is unset or names the detected one"""
+    if configured is None:
+        return True
+    try:
+        return int(str(configured), 0) == int(str(detected), 0)
+    except ValueError:
+        return False
+
 
 class DriverLoader:
     """Load and manage sensor drivers"""
 
-    def __init__(self, drivers_path='drivers', config_file='drivers_config.yaml'):
+    def __init__(self, drivers_path='drivers', config_file='drivers_config.yaml', settings=None):
         self.drivers_path = Path(__file__).parent / drivers_path
         self.config_file = Path(__file__).parent / config_file
+        self.settings = settings or {}
         self.loaded_drivers = {}
+        self.load_times = {}
+        self.handles = {}
         self.config = self.load_config()
 
+        self.default_timeout = float(self.settings.get('default_timeout_sec', DEFAULT_TIMEOUT_SEC))
+        self.pool_sizes = dict(DEFAULT_POOL_SIZES)
+        self.pool_sizes.update(self.settings.get('pools') or {})
+        self.pools = {}
+        self.stats = {}
+        self.default_cache_ttl = float(self.settings.get('cache_ttl_sec', 0))
+        self.cache = {}
+        self.health = {}
+        self._last_errors = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.supervisor = None
+        # Process-wide pool, shared with drivers that run without a handle from here
+        self.buses = _i2c.pool
+        self.i2c_batching = bool(self.settings.get('i2c_batching', True))
+
     def load_config(self):
         """Load driver configuration from YAML file"""
         if not self.config_file.exists():
@@ -25,20 +179,94 @@ class DriverLoader:
             return {}
 
         try:
+            import yaml
             with open(self.config_file, 'r') as f:
                 config = yaml.safe_load(f) or {}
             logging.info(f"Loaded config for {len(config)} drivers")
-            return config
         except Exception as e:
             logging.error(f"Error loading config: {e}")
             return {}
+        return self.apply_hardware_probe(config)
+
+    def apply_hardware_probe(self, config):
+        """
+        Enable, configure or skip drivers based on the hardware actually present
+
+        Runs when runtime.probe_hardware is set or a driver has `enabled: auto`.
+        Drivers with `enabled: auto` are enabled when their device is found,
+        enabled drivers whose device is missing are skipped, and found drivers
+        get i2c_bus/i2c_address filled in unless they are set already. Drivers
+        the probe cannot see (GPIO, serial, network) are left as configured.
+        """
+        auto = [name for name, cfg in config.items() if isinstance(cfg, dict) and cfg.get('enabled') == 'auto']
+        if not auto and not self.settings.get('probe_hardware'):
+            return config
+
+        from hardware_probe import DEFAULT_PROBE_TTL_SEC, PROBED_DRIVERS, detected_drivers, load_probe
+        try:
+            ttl = float(self.settings.get('probe_ttl_sec', DEFAULT_PROBE_TTL_SEC))
+            detected, unknown = detected_drivers(load_probe(self.config_file.parent / 'hardware_probe.json', ttl))
+        except Exception as e:
+            logging.error(f"Hardware probe failed: {e}")
+            detected, unknown = {}, set(PROBED_DRIVERS)
+
+        for name, cfg in config.items():
+            if not isinstance(cfg, dict) or not cfg.get('enabled'):
+                continue
+            auto_enabled = cfg['enabled'] == 'auto'
+            # w1_kernel on a DS2482 bridge only gets its 1-Wire bus once it has set the bridge up
+            device = 'ds2482' if name.startswith('w1_kernel') and cfg.get('ds2482') else name
+            if device not in PROBED_DRIVERS or device in unknown:
+                if auto_enabled:
+                    logging.info(f"Driver '{name}' left disabled: its hardware cannot be detected")
+                    cfg['enabled'] = False
+                continue
+
+            def matching(settings):
+                return [
+                    loc for loc in detected.get(device, [])
+                    if all(_same_setting(settings.get(key), value) for key, value in loc.items())
+                ]
+
+            if isinstance(cfg.get('instances'), list):
+                # Keep the instances whose device is there and fill in where it was found
+                instances = []
+                for instance in cfg['instances']:
+                    locations = matching(dict(cfg, **instance)) if isinstance(instance, dict) else []
+                    if not locations:
+                        logging.info(f"Skipping instance {instance} of driver '{name}': no hardware detected")
+                        continue
+                    if device == name:
+                        for key, value in locations[0].items():
+                            instance.setdefault(key, value)
+                    instances.append(instance)
+                cfg['instances'] = instances
+                locations = [{}] if instances else []
+            else:
+                locations = matching(cfg)
+                if device == name and len(locations) > 1:
+                    # Several devices of this kind (e.g. BME280 at 0x76 and 0x77): one instance each
+                    cfg['instances'] = [dict(loc) for loc in locations]
+                elif device == name and locations:
+                    for key, value in locations[0].items():
+                        cfg.setdefault(key, value)
+
+            if not locations:
+                logging.info(f"Skipping driver '{name}': no hardware detected")
+                cfg['enabled'] = False
+                continue
+            if auto_enabled:
+                where = '; '.join(', '.join(f'{key}={value}' for key, value in loc.items()) for loc in locations)
+                logging.info(f"Auto-enabled driver '{name}'" + (f" ({where})" if where.strip('; ') else ''))
+            cfg['enabled'] = True
+        return config
 
     def get_enabled_drivers(self):
         """Get list of enabled drivers from config"""
         enabled = []
         for driver_name, driver_config in self.config.items():
             if isinstance(driver_config, dict) and driver_config.get('enabled'):
-                enabled.append((driver_name, driver_config))
+                enabled.extend(expand_instances(driver_name, driver_config))
         return enabled
 
     def discover_drivers(self):
@@ -60,15 +288,25 @@ class DriverLoader:
         return drivers
 
     def load_driver(self, driver_name):
-        """Load a specific driver module"""
+        """
+        Load a specific driver module
+
+        Returns the module attribute named after the driver: either a legacy
+        function `driver_name(config_dict)` or a class-based driver with
+        open(config)/read()/close() (see drivers/_base.py). Instance names
+        ('bme280:0x77') load their driver's module.
+        """
+        driver_name = driver_module(driver_name)
         if driver_name in self.loaded_drivers:
             return self.loaded_drivers[driver_name]
 
         try:
+            start = time.monotonic()
             module = importlib.import_module(f'drivers.{driver_name}')
             driver_func = getattr(module, driver_name)
+            self.load_times[driver_name] = time.monotonic() - start
             self.loaded_drivers[driver_name] = driver_func
-            logging.info(f"Loaded driver: {driver_name}")
+            logging.info(f"Loaded driver: {driver_name} ({self.load_times[driver_name]:.2f}s)")
             return driver_func
         except ImportError as e:
             logging.error(f"Failed to import driver '{driver_name}': {e}")
@@ -77,28 +315,351 @@ class DriverLoader:
             logging.error(f"Driver function '{driver_name}' not found in module: {e}")
             return None
 
-    def run_driver(self, driver_name, config_dict):
+    def warm_up(self, drivers):
         """
-        Run a driver with given config
+        Import driver modules in parallel on a background thread
 
         Args:
-            driver_name: Name of the driver (e.g., 'dht22')
-            config_dict: Configuration dictionary for the driver
+            drivers: List of (driver_name, config_dict) tuples
+
+        Returns:
+            The background thread (already started)
+        """
+        # Isolated drivers are imported by their worker process, never here
+        names = {driver_module(name) for name, cfg in drivers if not cfg.get('isolate')}
+        names = [name for name in sorted(names) if name not in self.loaded_drivers]
+
+        def run():
+            start = time.monotonic()
+            with ThreadPoolExecutor(max_workers=max(1, min(4, len(names))), thread_name_prefix='driver-warmup') as pool:
+                list(pool.map(self.load_driver, names))
+            logging.info(f"Warmed up {len(names)} drivers in {time.monotonic() - start:.2f}s")
+
+        thread = threading.Thread(target=run, name='driver-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def get_pool_name(self, driver_name, config_dict):
+        """Return the worker pool class a driver runs on"""
+        pool = config_dict.get('pool') or DRIVER_POOLS.get(driver_module(driver_name), 'default')
+        return pool if pool in self.pool_sizes else 'default'
+
+    def get_timeout(self, config_dict):
+        """Return the execution timeout in seconds for a driver"""
+        try:
+            return float(config_dict.get('timeout_sec', self.default_timeout))
+        except (TypeError, ValueError):
+            return self.default_timeout
+
+    def get_cache_ttl(self, driver_name, config_dict):
+        """Return how many seconds a driver's last reading may be reused"""
+        if config_dict.get('cache_ttl_sec') is not None:
+            try:
+                return float(config_dict['cache_ttl_sec'])
+            except (TypeError, ValueError):
+                pass
+        return max(DEFAULT_CACHE_TTL_SEC.get(driver_module(driver_name), 0), self.default_cache_ttl)
+
+    def _get_pool(self, pool_name):
+        with self._lock:
+            pool = self.pools.get(pool_name)
+            if pool is None:
+                size = max(1, int(self.pool_sizes.get(pool_name, 1)))
+                pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f'driver-{pool_name}')
+                self.pools[pool_name] = pool
+            return pool
+
+    def _get_stats(self, driver_name):
+        stats = self.stats.get(driver_name)
+        if stats is None:
+            stats = self.stats[driver_name] = {
+                'runs': 0,
+                'errors': 0,
+                'timeouts': 0,
+                'skipped': 0,
+                'cache_hits': 0,
+                'shared': 0,
+                'backed_off': 0,
+                'last_duration': None,
+            }
+        return stats
+
+    def get_driver_stats(self):
+        """Return a snapshot of per-driver run/error/timeout counters"""
+        with self._lock:
+            snapshot = {name: dict(stats) for name, stats in self.stats.items()}
+            supervisor = self.supervisor
+        if supervisor:
+            for name, restarts in supervisor.get_restarts().items():
+                snapshot.setdefault(name, {})['restarts'] = restarts
+        return snapshot
+
+    def _get_setting(self, config_dict, key, default):
+        """Return a numeric option from the driver config, runtime settings or default"""
+        for source in (config_dict, self.settings):
+            if source.get(key) is not None:
+                try:
+                    return float(source[key])
+                except (TypeError, ValueError):
+                    pass
+        return float(default)
+
+    def in_backoff(self, driver_name):
+        """Return True if a failing driver is waiting out its backoff or quarantine"""
+        with self._lock:
+            health = self.health.get(driver_name)
+            return health is not None and time.monotonic() < health['retry_at']
+
+    def get_driver_health(self):
+        """
+        Return the state of drivers that failed on their last run
 
         Returns:
-            List of sensor readings or empty list on error
+            Dict of driver name -> {state, failures, retry_in, last_error}, where
+            state is 'retrying' (next run goes ahead), 'backoff' or 'quarantined'
         """
+        now = time.monotonic()
+        health = {}
+        with self._lock:
+            for name, h in self.health.items():
+                if h['quarantined']:
+                    state = 'quarantined'
+                elif now < h['retry_at']:
+                    state = 'backoff'
+                else:
+                    state = 'retrying'
+                health[name] = {
+                    'state': state,
+                    'failures': h['failures'],
+                    'retry_in': round(max(0, h['retry_at'] - now), 1),
+                    'last_error': h['last_error'],
+                }
+        return health
+
+    def _record_failure(self, driver_name, config_dict, started, error):
+        """Count a failed run and push the driver's next attempt back"""
+        interval = self._get_setting(config_dict, 'read_in_sec', 60)
+        backoff_max = self._get_setting(config_dict, 'backoff_max_sec', DEFAULT_BACKOFF_MAX_SEC)
+        quarantine_after = int(self._get_setting(config_dict, 'quarantine_after', DEFAULT_QUARANTINE_AFTER))
+        probe_every = self._get_setting(config_dict, 'quarantine_probe_sec', DEFAULT_QUARANTINE_PROBE_SEC)
+
+        with self._lock:
+            health = self.health.get(driver_name)
+            if health is None:
+                health = self.health[driver_name] = {'failures': 0, 'retry_at': 0, 'quarantined': False}
+            health['failures'] += 1
+            health['last_error'] = error
+            failures = health['failures']
+            newly_quarantined = False
+            if quarantine_after > 0 and failures >= quarantine_after:
+                newly_quarantined = not health['quarantined']
+                health['quarantined'] = True
+                delay = probe_every
+            else:
+                # Start times sit on the schedule grid, so a delay of k intervals skips k runs
+                delay = min(interval * (2 ** min(failures - 1, 20) - 1), backoff_max)
+            health['retry_at'] = started + delay
+
+        if newly_quarantined:
+            logging.warning(
+                f"Quarantined driver '{driver_name}' after {failures} failed runs ({error}); "
+                f"re-probing every {probe_every:g}s"
+            )
+        elif delay > 0 and not health['quarantined']:
+            logging.info(f"Driver '{driver_name}' failed {failures} runs in a row, next try in {delay:g}s")
+
+    def _get_supervisor(self):
+        with self._lock:
+            if self.supervisor is None:
+                from driver_worker import WorkerSupervisor, DEFAULT_MAX_RSS_MB
+                self.supervisor = WorkerSupervisor(self.settings.get('worker_max_rss_mb', DEFAULT_MAX_RSS_MB))
+            return self.supervisor
+
+    def _call_driver(self, driver_name, config_dict):
+        """Call a driver, holding its I2C bus lock and handing it the shared bus handle"""
+        module = driver_module(driver_name)
+        if module not in I2C_DRIVERS:
+            return self._invoke_driver(driver_name, config_dict)
+
+        bus = self.buses.resolve_bus(config_dict)
+        config_dict = dict(config_dict, i2c_bus=bus)
+        if not config_dict.get('isolate'):
+            try:
+                if module in SMBUS_DRIVERS:
+                    config_dict['_smbus'] = self.buses.get_smbus(bus)
+                elif module in BUSIO_DRIVERS:
+                    config_dict['_busio'] = self.buses.get_busio()
+            except Exception as e:
+                # Driver falls back to opening the bus itself
+                logging.debug(f"No shared I2C handle for '{driver_name}': {e}")
+
+        lock = self.buses.lock(bus)
+        if not lock.acquire(timeout=self.get_timeout(config_dict)):
+            logging.warning(f"Driver '{driver_name}' gave up waiting for i2c-{bus}")
+            with self._lock:
+                self._get_stats(driver_name)['skipped'] += 1
+            return []
+        try:
+            return self._invoke_driver(driver_name, config_dict)
+        finally:
+            lock.release()
+
+    def _invoke_driver(self, driver_name, config_dict):
+        """Load and call a driver on a pool thread (or in its worker process if isolated)"""
+        start = time.monotonic()
+
+        if config_dict.get('isolate'):
+            try:
+                return as_readings(self._get_supervisor().run(driver_name, config_dict, self.get_timeout(config_dict)))
+            except Exception as e:
+                logging.error(f"Error running isolated driver '{driver_name}': {e}")
+                with self._lock:
+                    self._get_stats(driver_name)['errors'] += 1
+                    self._last_errors[driver_name] = str(e)
+                return []
+            finally:
+                with self._lock:
+                    self._get_stats(driver_name)['last_duration'] = round(time.monotonic() - start, 3)
+
         driver_func = self.load_driver(driver_name)
 
         if not driver_func:
             return []
 
         try:
-            readings = driver_func(config_dict)
-            return readings or []
+            if is_driver_class(driver_func):
+                readings = self._get_handle(driver_name, driver_func).read(config_dict)
+            else:
+                readings = driver_func(config_dict)
+            # Legacy drivers may still return dicts
+            return as_readings(readings)
         except Exception as e:
             logging.error(f"Error running driver '{driver_name}': {e}")
+            with self._lock:
+                self._get_stats(driver_name)['errors'] += 1
+                self._last_errors[driver_name] = str(e)
             return []
+        finally:
+            with self._lock:
+                self._get_stats(driver_name)['last_duration'] = round(time.monotonic() - start, 3)
+
+    def _get_handle(self, driver_name, driver_class):
+        with self._lock:
+            handle = self.handles.get(driver_name)
+            if handle is None:
+                handle = self.handles[driver_name] = DriverHandle(driver_name, driver_class)
+            return handle
+
+    def close_drivers(self):
+        """Close all open class-based drivers; they reopen on their next read"""
+        with self._lock:
+            handles = list(self.handles.values())
+            self.handles = {}
+            self.cache = {}
+            # Config may have changed (e.g. hardware fixed), so failing drivers get a fresh start
+            self.health = {}
+        for handle in handles:
+            handle.close()
+
+    def run_driver(self, driver_name, config_dict, max_age=None):
+        """
+        Run a driver with given config
+
+        The driver executes on the worker pool for its class and is abandoned
+        after its timeout. A reading younger than max_age is returned from the
+        cache, and a caller arriving while a read is in flight waits for that
+        read instead of sampling the sensor again. A driver whose previous run
+        is stuck past its timeout is skipped instead of queueing up more work
+        behind it, and a driver that keeps failing is skipped while it backs
+        off or sits in quarantine.
+
+        Args:
+            driver_name: Name of the driver (e.g., 'dht22')
+            config_dict: Configuration dictionary for the driver
+            max_age: Oldest cached reading (seconds) the caller accepts;
+                defaults to the driver's cache_ttl_sec
+
+        Returns:
+            List of Reading objects or empty list on error
+        """
+        if max_age is None:
+            max_age = self.get_cache_ttl(driver_name, config_dict)
+        pool = self._get_pool(self.get_pool_name(driver_name, config_dict))
+        timeout = self.get_timeout(config_dict)
+        # Drivers size their waits and retries from it (drivers._base.read_budget)
+        config_dict = dict(config_dict, _timeout_sec=timeout)
+
+        with self._lock:
+            now = time.monotonic()
+            stats = self._get_stats(driver_name)
+            cached = self.cache.get(driver_name)
+            if cached is not None and max_age > 0 and now - cached[0] <= max_age:
+                stats['cache_hits'] += 1
+                return list(cached[1])
+
+            health = self.health.get(driver_name)
+            if health is not None and now < health['retry_at']:
+                stats['backed_off'] += 1
+                return []
+
+            pending = self._inflight.get(driver_name)
+            owner = pending is None or pending[0].done()
+            if owner:
+                stats['runs'] += 1
+                future = pool.submit(self._call_driver, driver_name, config_dict)
+                future.add_done_callback(lambda f: self._finish_read(driver_name, config_dict, now, f))
+                deadline = now + timeout
+                self._inflight[driver_name] = (future, deadline)
+            else:
+                future, deadline = pending
+                if now >= deadline:
+                    stats['skipped'] += 1
+                    logging.warning(f"Driver '{driver_name}' still busy from a previous run, skipping")
+                    return []
+                stats['shared'] += 1
+
+        try:
+            return list(future.result(timeout=max(0, deadline - time.monotonic())))
+        except FutureTimeout:
+            if not owner:
+                return []
+            with self._lock:
+                stats['timeouts'] += 1
+                count = stats['timeouts']
+            logging.error(f"Driver '{driver_name}' timed out after {timeout:g}s ({count} timeouts so far)")
+            return []
+
+    def _finish_read(self, driver_name, config_dict, started, future):
+        # Runs when the read finishes, even if every caller already gave up on it
+        if future.cancelled():
+            return
+        exception = future.exception()
+        readings = future.result() if exception is None else []
+        empty_ok = config_dict.get('empty_ok', driver_module(driver_name) in EMPTY_OK_DRIVERS)
+        with self._lock:
+            error = self._last_errors.pop(driver_name, None) or (exception and str(exception))
+            failed = error is not None or (not readings and not empty_ok)
+            if readings:
+                self.cache[driver_name] = (time.monotonic(), readings)
+            if not failed:
+                recovered = self.health.pop(driver_name, None)
+        if failed:
+            self._record_failure(driver_name, config_dict, started, error or 'no readings')
+        elif recovered is not None and recovered['failures'] > 1:
+            logging.info(f"Driver '{driver_name}' recovered after {recovered['failures']} failed runs")
+
+    def shutdown(self):
+        """Close drivers and stop worker pools and processes without waiting for stuck drivers"""
+        self.close_drivers()
+        with self._lock:
+            pools = list(self.pools.values())
+            self.pools = {}
+            supervisor, self.supervisor = self.supervisor, None
+        for pool in pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if supervisor:
+            supervisor.shutdown()
+        self.buses.close()
 
     def load_drivers_from_config(self, config):
         """
@@ -110,6 +671,9 @@ class DriverLoader:
             "system": {"enabled": true, "read_in_sec": 30}
         }
 
+        A driver with an `instances:` list yields one entry per instance (see
+        expand_instances), each on its own read_in_sec if it sets one.
+
         Returns:
             List of (driver_name, config_dict, interval) tuples for enabled drivers
         """
@@ -122,20 +686,48 @@ class DriverLoader:
             if not driver_config.get('enabled'):
                 continue
 
-            # Default to 60 seconds if not provided in config
-            read_in_sec = driver_config.get('read_in_sec', 60)
-            if not isinstance(read_in_sec, int):
-                try:
-                    read_in_sec = int(read_in_sec)
-                except Exception:
-                    logging.warning(f"Driver '{driver_name}' has invalid read_in_sec, skipping")
-                    continue
+            for name, instance_config in expand_instances(driver_name, driver_config):
+                # Default to 60 seconds if not provided in config; instances may override it
+                read_in_sec = instance_config.get('read_in_sec', 60)
+                if not isinstance(read_in_sec, int):
+                    try:
+                        read_in_sec = int(read_in_sec)
+                    except Exception:
+                        logging.warning(f"Driver '{name}' has invalid read_in_sec, skipping")
+                        continue
 
-            enabled_drivers.append((driver_name, driver_config, read_in_sec))
-            logging.info(f"Enabled driver: {driver_name} (interval: {read_in_sec}s)")
+                enabled_drivers.append((name, instance_config, read_in_sec))
+                logging.info(f"Enabled driver: {name} (interval: {read_in_sec}s)")
 
         return enabled_drivers
 
+    def get_driver_jobs(self, config):
+        """
+        Group enabled drivers into scheduler jobs
+
+        I2C drivers on the same bus with the same interval share one job, so they
+        are read back-to-back over one handle and uploaded as a single batch.
+        Serial drivers (and their instances) sharing a port are grouped the
+        same way, since one port can only serve one request at a time.
+
+        Returns:
+            List of (job_id, [(driver_name, config_dict), ...], interval) tuples
+        """
+        jobs = {}
+
+        for driver_name, driver_config, interval in self.load_drivers_from_config(config):
+            module = driver_module(driver_name)
+            if self.i2c_batching and module in I2C_DRIVERS and driver_config.get('batch', True):
+                bus = self.buses.resolve_bus(driver_config)
+                job_id = f'i2c-{bus}@{interval}s'
+            elif module in SERIAL_DRIVERS and driver_config.get('port') and driver_config.get('batch', True):
+                job_id = f"serial-{os.path.basename(str(driver_config['port']))}@{interval}s"
+            else:
+                job_id = driver_name
+            jobs.setdefault(job_id, ([], interval))[0].append((driver_name, driver_config))
+
+        return [(job_id, members, interval) for job_id, (members, interval) in jobs.items()]
+
 
 # Example usage
 if __name__ == "__main__":
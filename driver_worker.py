@@ -0,0 +1,262 @@
+"""
+Driver worker - Run selected drivers in supervised subprocesses
+
+Drivers marked `isolate: true` in drivers_config.yaml run in their own
+worker process instead of a thread. Readings come back over a pipe, and a
+watchdog kills and respawns a worker that exceeds its time or memory limit,
+so a driver wedged in native code cannot take the client down with it.
+"""
+import importlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+# Resident memory (MB) a worker may grow to before it is recycled
+DEFAULT_MAX_RSS_MB = 150
+
+# Seconds between watchdog checks
+WATCHDOG_INTERVAL = 1.0
+
+# Seconds a reader waits on the pipe between checks for a watchdog kill request
+KILL_CHECK_SEC = 0.1
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+class WorkerError(Exception):
+    """Raised when an isolated driver dies, is killed or fails"""
+
+
+def _worker_main(conn, driver_name):
+    """Worker process entry point: import the driver and serve read requests"""
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    try:
+        from drivers._base import DriverHandle, is_driver_class
+        # Instances ('bme280:0x77') run their driver's module
+        module_name = driver_name.split(':', 1)[0]
+        module = importlib.import_module(f'drivers.{module_name}')
+        driver_func = getattr(module, module_name)
+    except Exception as e:
+        conn.send(('error', f'load failed: {e}'))
+        return
+
+    handle = None
+    if is_driver_class(driver_func):
+        handle = DriverHandle(driver_name, driver_func)
+        driver_func = handle.read
+
+    try:
+        while True:
+            try:
+                config_dict = conn.recv()
+            except (EOFError, OSError):
+                break
+            if config_dict is None:
+                break
+            try:
+                conn.send(('ok', driver_func(config_dict) or []))
+            except Exception as e:
+                conn.send(('error', str(e)))
+    finally:
+        # Release the driver's hardware before the process exits on stop or parent EOF
+        if handle is not None:
+            handle.close()
+
+
+def read_rss_mb(pid):
+    """Return resident memory of a process in MB (0 if unknown)"""
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / (1024 * 1024)
+    except Exception:
+        return 0
+
+
+class DriverWorker:
+    """One worker process owned by a single driver"""
+
+    def __init__(self, ctx, driver_name):
+        self.ctx = ctx
+        self.driver_name = driver_name
+        self.process = None
+        self.conn = None
+        self.busy_since = None
+        self.timeout = None
+        self.max_rss_mb = DEFAULT_MAX_RSS_MB
+        self.restarts = 0
+        # Set by the watchdog when a read holds the lock; the reader does the kill
+        self.kill_requested = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        parent_conn, child_conn = self.ctx.Pipe()
+        self.process = self.ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.driver_name),
+            name=f'driver-{self.driver_name}',
+            daemon=True
+        )
+        self.process.start()
+        # Only the child keeps its end open, so a dead child shows up as EOF here
+        child_conn.close()
+        self.conn = parent_conn
+        logging.info(f"Started worker for '{self.driver_name}' (pid {self.process.pid})")
+
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def request_kill(self, reason, respawn=False):
+        """
+        Kill the worker from another thread (the watchdog)
+
+        An idle worker is killed here, and respawned if asked. During a read the
+        reader holds the lock, so the kill is left to it: it checks
+        kill_requested while waiting for the reply.
+        """
+        if not self.lock.acquire(blocking=False):
+            self.kill_requested = reason
+            return
+        try:
+            self._kill(reason)
+            if respawn:
+                self._reset()
+                self.start()
+        finally:
+            self.lock.release()
+
+    def _kill(self, reason):
+        # Called with self.lock held; the next call respawns the worker
+        process = self.process
+        if process is None or not process.is_alive():
+            return
+        logging.warning(f"Killing worker for '{self.driver_name}' (pid {process.pid}): {reason}")
+        try:
+            process.kill()
+            process.join(1)
+        except Exception:
+            pass
+        self.restarts += 1
+
+    def _reset(self):
+        # Called with self.lock held, so no reader is blocked on the pipe
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+        self.process = None
+        self.conn = None
+
+    def stop(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+            self.process.join(1)
+        except Exception:
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self._reset()
+
+    def call(self, config_dict, timeout):
+        """Send one read request and wait for the readings"""
+        with self.lock:
+            if not self.alive():
+                self._reset()
+                self.start()
+            conn = self.conn
+            self.timeout = timeout
+            # A request left from an earlier read; the watchdog repeats it if still due
+            self.kill_requested = None
+            self.busy_since = time.monotonic()
+            # The watchdog asks for a kill on timeout; this deadline only matters if it is not running
+            deadline = self.busy_since + timeout + 2 * WATCHDOG_INTERVAL
+            try:
+                conn.send(config_dict)
+                while not conn.poll(KILL_CHECK_SEC):
+                    reason = self.kill_requested
+                    if reason is not None:
+                        self._kill(reason)
+                        raise WorkerError(f'worker killed: {reason}')
+                    if time.monotonic() > deadline:
+                        self._kill('no reply')
+                        raise WorkerError('no reply from worker')
+                status, payload = conn.recv()
+            except (EOFError, OSError) as e:
+                raise WorkerError(f'worker died: {e}')
+            finally:
+                self.busy_since = None
+
+        if status != 'ok':
+            raise WorkerError(payload)
+        return payload
+
+
+class WorkerSupervisor:
+    """Own the worker processes and run the watchdog that recycles them"""
+
+    def __init__(self, max_rss_mb=DEFAULT_MAX_RSS_MB):
+        # spawn keeps the child free of the parent's threads and held locks
+        self.ctx = multiprocessing.get_context('spawn')
+        self.default_max_rss_mb = float(max_rss_mb)
+        self.workers = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watchdog = None
+
+    def _get_worker(self, driver_name):
+        with self._lock:
+            worker = self.workers.get(driver_name)
+            if worker is None:
+                worker = self.workers[driver_name] = DriverWorker(self.ctx, driver_name)
+            if self._watchdog is None:
+                self._watchdog = threading.Thread(target=self._watch, name='driver-watchdog', daemon=True)
+                self._watchdog.start()
+            return worker
+
+    def run(self, driver_name, config_dict, timeout):
+        """
+        Run a driver in its worker process
+
+        Returns:
+            List of readings
+
+        Raises:
+            WorkerError if the worker failed, timed out or was recycled mid-read
+        """
+        worker = self._get_worker(driver_name)
+        worker.max_rss_mb = float(config_dict.get('max_rss_mb', self.default_max_rss_mb))
+        return worker.call(config_dict, timeout)
+
+    def get_restarts(self):
+        """Return number of watchdog kills per driver"""
+        with self._lock:
+            return {name: w.restarts for name, w in self.workers.items()}
+
+    def _watch(self):
+        while not self._stop.wait(WATCHDOG_INTERVAL):
+            with self._lock:
+                workers = list(self.workers.values())
+            now = time.monotonic()
+            for worker in workers:
+                process = worker.process
+                if process is None or not process.is_alive():
+                    continue
+                busy_since = worker.busy_since
+                if busy_since is not None and worker.timeout and now - busy_since > worker.timeout:
+                    worker.request_kill(f'exceeded {worker.timeout:g}s')
+                    continue
+                rss = read_rss_mb(process.pid)
+                if worker.max_rss_mb and rss > worker.max_rss_mb:
+                    # Respawn idle workers straight away so the next read is not delayed
+                    worker.request_kill(f'RSS {rss:.0f}MB over {worker.max_rss_mb:g}MB', respawn=busy_since is None)
+
+    def shutdown(self):
+        self._stop.set()
+        with self._lock:
+            workers = list(self.workers.values())
+        for worker in workers:
+            worker.stop()
@@ -0,0 +1,285 @@
+"""
+Shared ADXL343/ADXL345 accelerometer driver for adxl343 and adxl345
+
+The default (single) mode reads one acceleration sample and the motion flag
+per interval. For vibration monitoring set `mode: capture`: the sensor then
+samples continuously at `rate_hz` into its 32-entry FIFO (stream mode), and a
+background thread drains the FIFO in bursts into a preallocated ring buffer
+holding the last `window_sec` of samples. read() computes features of that
+window per axis: RMS and peak of the vibration (the mean, e.g. gravity,
+removed), crest factor, and the dominant frequency when NumPy is installed.
+Only these features are uploaded.
+
+The I2C handle comes from the shared bus pool (drivers/_i2c.py), opened in
+open() rather than at import. The capture thread is a ContinuousSampler: each
+drain holds the pool's bus lock, so it never interleaves with other drivers on
+the bus. The chip pops one FIFO entry per read of its data registers, so a
+drain is one block read per entry; each also returns FIFO_STATUS, so samples
+arriving during the drain are picked up in the same pass.
+
+Config options:
+    - i2c_address: (default 0x53) I2C address
+    - mode: (default single) single or capture
+    - rate_hz: (default 400) capture sample rate: 25, 50, 100, 200, 400, 800, 1600 or 3200
+    - window_sec: (default 1) length of the window the features are computed over
+"""
+import array
+import logging
+import math
+import threading
+import time
+
+from drivers import _i2c
+from drivers._base import Driver, read_budget
+from reading import Reading
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_ADDRESS = 0x53
+
+REG_BW_RATE = 0x2C
+REG_POWER_CTL = 0x2D
+REG_DATA_FORMAT = 0x31
+REG_DATAX0 = 0x32
+REG_FIFO_CTL = 0x38
+REG_FIFO_STATUS = 0x39
+
+POWER_MEASURE = 0x08
+# Full resolution (4 mg/LSB at every range), +-16 g
+DATA_FORMAT_FULL_RES_16G = 0x0B
+FIFO_BYPASS = 0x00
+FIFO_STREAM = 0x80
+FIFO_SIZE = 32
+
+# Output data rate (Hz) -> BW_RATE code
+RATES = {25: 0x08, 50: 0x09, 100: 0x0A, 200: 0x0B, 400: 0x0C, 800: 0x0D, 1600: 0x0E, 3200: 0x0F}
+
+MS2_PER_LSB = 0.004 * 9.80665
+
+# Drain the FIFO when it is about half full, leaving room for scheduling delays
+DRAIN_FRACTION = 0.5
+
+# DATAX0..DATAZ1, FIFO_CTL, FIFO_STATUS: one entry plus the entries left after it
+ENTRY_READ_LEN = REG_FIFO_STATUS - REG_DATAX0 + 1
+
+
+class Capture:
+    """Background FIFO drain into a ring buffer of the last `size` samples"""
+
+    def __init__(self, i2c, address, rate, size, bus):
+        self.i2c = i2c
+        self.address = address
+        self.rate = rate
+        self.size = size
+        self.bus = bus
+        # x, y, z raw counts interleaved, preallocated
+        self.ring = array.array('h', bytes(6 * size))
+        self.count = 0
+        self.overruns = 0
+        self.lock = threading.Lock()
+        self.filled = threading.Event()
+        self.sampler = None
+        self._cmd = bytearray(1)
+        self._status = bytearray(1)
+        self._entry = bytearray(ENTRY_READ_LEN)
+
+    @property
+    def errors(self):
+        return self.sampler.errors if self.sampler is not None else 0
+
+    def _write(self, register, value):
+        self.i2c.writeto(self.address, bytes((register, value)))
+
+    def _read_into(self, register, buf):
+        self._cmd[0] = register
+        self.i2c.writeto_then_readfrom(self.address, self._cmd, buf)
+
+    def start(self):
+        bus_lock = _i2c.pool.lock(self.bus)
+        with bus_lock:
+            self._write(REG_POWER_CTL, 0)
+            self._write(REG_BW_RATE, RATES[self.rate])
+            self._write(REG_DATA_FORMAT, DATA_FORMAT_FULL_RES_16G)
+            # Bypass then stream empties the FIFO
+            self._write(REG_FIFO_CTL, FIFO_BYPASS)
+            self._write(REG_FIFO_CTL, FIFO_STREAM)
+            self._write(REG_POWER_CTL, POWER_MEASURE)
+        interval = FIFO_SIZE * DRAIN_FRACTION / self.rate
+        self.sampler = _i2c.ContinuousSampler(f'adxl34x-{self.address:02x}', self.bus, self._drain, interval)
+        self.sampler.start()
+
+    def stop(self):
+        if self.sampler is not None:
+            self.sampler.stop()
+        try:
+            with _i2c.pool.lock(self.bus):
+                self._write(REG_POWER_CTL, 0)
+        except OSError:
+            pass
+
+    def wait_filled(self, timeout):
+        """
+        Wait up to timeout for a full window, draining on this thread: a caller
+        holding the bus lock (the loader during a read) keeps the sampler off the bus
+        """
+        deadline = time.monotonic() + timeout
+        while not self.filled.is_set() and time.monotonic() < deadline:
+            try:
+                with _i2c.pool.lock(self.bus):
+                    self._drain()
+            except OSError as e:
+                logging.debug(f"adxl34x 0x{self.address:02x}: FIFO read failed: {e}")
+                return
+            self.filled.wait(self.sampler.interval)
+
+    def _drain(self):
+        """Move every sample in the FIFO to the ring buffer (call with the bus lock held)"""
+        self._read_into(REG_FIFO_STATUS, self._status)
+        entries = self._status[0] & 0x3F
+        if entries >= FIFO_SIZE:
+            # Full FIFO: samples may have been dropped since the last drain
+            self.overruns += 1
+        entry = self._entry
+        ring = self.ring
+        size = self.size
+        # Bounded, so a fast FIFO can't keep the bus to itself
+        budget = 2 * FIFO_SIZE
+        while entries and budget:
+            # Each block read of the data registers pops one FIFO entry
+            self._read_into(REG_DATAX0, entry)
+            x, y, z = ((entry[i + 1] << 8 | entry[i]) for i in (0, 2, 4))
+            with self.lock:
+                pos = 3 * (self.count % size)
+                ring[pos] = x - 65536 if x > 32767 else x
+                ring[pos + 1] = y - 65536 if y > 32767 else y
+                ring[pos + 2] = z - 65536 if z > 32767 else z
+                self.count += 1
+            entries = entry[-1] & 0x3F
+            budget -= 1
+        if self.count >= size:
+            self.filled.set()
+        # Nothing for the sampler's window: the samples live in the ring
+        return None
+
+    def window(self):
+        """Return (count, list of axis sample lists in m/s^2) of the last window, oldest first"""
+        with self.lock:
+            count = self.count
+            n = min(count, self.size)
+            start = 3 * (count % self.size) if count >= self.size else 0
+            raw = self.ring[start:] + self.ring[:start] if start else self.ring[:3 * n]
+        return count, [[v * MS2_PER_LSB for v in raw[axis::3]] for axis in range(3)]
+
+
+def features(samples, rate):
+    """RMS, peak and crest factor of one axis with the mean removed, and the dominant frequency (or None)"""
+    if numpy is not None:
+        ac = numpy.asarray(samples, dtype=float)
+        ac -= ac.mean()
+        rms = float(numpy.sqrt(numpy.mean(ac * ac)))
+        peak = float(numpy.max(numpy.abs(ac)))
+        spectrum = numpy.abs(numpy.fft.rfft(ac * numpy.hanning(len(ac))))
+        # Skip the DC bin
+        bin_ = int(numpy.argmax(spectrum[1:])) + 1 if len(spectrum) > 1 else 0
+        frequency = bin_ * rate / len(ac) if rms > 0 else 0.0
+    else:
+        mean = sum(samples) / len(samples)
+        ac = [v - mean for v in samples]
+        rms = math.sqrt(sum(v * v for v in ac) / len(ac))
+        peak = max(abs(v) for v in ac)
+        frequency = None
+    crest = peak / rms if rms > 0 else 0.0
+    return rms, peak, crest, frequency
+
+
+class ADXL34xDriver(Driver):
+    """ADXL34x accelerometer: one sample per read, or vibration features from a FIFO capture"""
+
+    # adafruit_adxl34x class name, set by subclasses
+    model = None
+
+    def open(self, config):
+        super().open(config)
+        self.address = int(str(config.get('i2c_address', DEFAULT_ADDRESS)), 0)
+        self.name = self.model.lower()
+        self.rom_prefix = f'_i2c_{self.address:02x}'
+        self.i2c = _i2c.busio_for(config)
+        self.capture = None
+        self.accelerometer = None
+        try:
+            if config.get('mode', 'single') == 'capture':
+                self._open_capture(config)
+            else:
+                import adafruit_adxl34x
+                self.accelerometer = getattr(adafruit_adxl34x, self.model)(self.i2c, address=self.address)
+                self.accelerometer.enable_motion_detection()
+        except Exception:
+            self.close()
+            raise
+
+    def _open_capture(self, config):
+        self.rate = int(config.get('rate_hz', 400))
+        if self.rate not in RATES:
+            raise ValueError(f"{self.name}: rate_hz must be one of {', '.join(map(str, RATES))}")
+        window = max(2, int(float(config.get('window_sec', 1)) * self.rate))
+        self.capture = Capture(self.i2c, self.address, self.rate, window, _i2c.pool.resolve_bus(config))
+        self.capture.start()
+        self.last_count = 0
+        self.first_wait = min(window / self.rate + 0.5, read_budget(config))
+
+    def read(self):
+        if self.capture is not None:
+            return self._read_features()
+
+        if self.accelerometer.events["motion"] == True:
+            motion = 1
+        else:
+            motion = 0
+
+        data = self.accelerometer.acceleration
+        x = round(data[0], 2)
+        y = round(data[1], 2)
+        z = round(data[2], 2)
+
+        data = []
+        for axis, value in (('x', x), ('y', y), ('z', z)):
+            data.append(Reading(f'{self.rom_prefix}_acce_{axis}', 'accel', value, f'{self.name}_{axis}'))
+        data.append(Reading(f'{self.rom_prefix}_moti', 'motion', round(motion, 2), f'{self.name}_motion'))
+        return data
+
+    def _read_features(self):
+        capture = self.capture
+        if self.first_wait:
+            capture.wait_filled(self.first_wait)
+            self.first_wait = 0
+        count, axes = capture.window()
+        # Nothing new since the last read: the capture thread is failing
+        if count == self.last_count or len(axes[0]) < 2:
+            logging.warning(f"{self.name} 0x{self.address:02x}: no new samples "
+                            f"({capture.errors} FIFO read errors)")
+            return []
+        self.last_count = count
+        if capture.overruns:
+            logging.info(f"{self.name} 0x{self.address:02x}: FIFO overran {capture.overruns} times, "
+                         f"samples were dropped (lower rate_hz?)")
+            capture.overruns = 0
+
+        data = []
+        for axis, samples in zip('xyz', axes):
+            rms, peak, crest, frequency = features(samples, self.rate)
+            prefix = f'{self.rom_prefix}_vib_{axis}'
+            name = f'{self.name}_{axis}'
+            data.append(Reading(prefix + '_rms', 'accel', round(rms, 3), name + '_rms', 'm/s2'))
+            data.append(Reading(prefix + '_peak', 'accel', round(peak, 3), name + '_peak', 'm/s2'))
+            data.append(Reading(prefix + '_crest', 'accel', round(crest, 2), name + '_crest'))
+            if frequency is not None:
+                data.append(Reading(prefix + '_freq', 'freq', round(frequency, 1), name + '_freq', 'Hz'))
+        return data
+
+    def close(self):
+        if self.capture is not None:
+            self.capture.stop()
+            self.capture = None
@@ -0,0 +1,102 @@
+"""
+Base class for stateful (class-based) drivers
+
+A legacy driver is a function `driver_name(config_dict)` called cold every
+interval. A class-based driver keeps its device open between reads instead:
+
+    class MySensorDriver(Driver):
+        def open(self, config):
+            self.device = open_device(config)
+
+        def read(self):
+            return [{"rom": "_my_sensor", "type": "temp", "value": self.device.read(), "name": "My Sensor"}]
+
+        def close(self):
+            self.device.close()
+
+    my_sensor = MySensorDriver   # expose the class under the driver's name
+"""
+import logging
+import threading
+
+# The loader's timeout when it doesn't say (a driver run outside it, e.g. from a script)
+DEFAULT_TIMEOUT_SEC = 30
+
+# Share of the loader's timeout a driver may spend waiting or retrying in one read
+READ_BUDGET_SHARE = 0.8
+
+
+class Driver:
+    """Stateful sensor driver: open(config) once, read() every interval, close() at the end"""
+
+    def open(self, config):
+        """Open devices and read anything that doesn't change between samples"""
+        self.config = config
+
+    def read(self):
+        """Take one measurement and return a list of readings"""
+        raise NotImplementedError
+
+    def close(self):
+        """Release devices opened in open()"""
+
+
+def read_budget(config, share=READ_BUDGET_SHARE):
+    """
+    Seconds a driver may spend in one read before the loader abandons it, times share
+
+    The loader passes its effective timeout (per-driver timeout_sec, else
+    runtime.default_timeout_sec) as `_timeout_sec`.
+    """
+    timeout = config.get('_timeout_sec')
+    if timeout is None:
+        timeout = config.get('timeout_sec', DEFAULT_TIMEOUT_SEC)
+    try:
+        return float(timeout) * share
+    except (TypeError, ValueError):
+        return DEFAULT_TIMEOUT_SEC * share
+
+
+def is_driver_class(obj):
+    return isinstance(obj, type)
+
+
+class DriverHandle:
+    """One open instance of a class-based driver, reopened when its config changes"""
+
+    def __init__(self, name, driver_class):
+        self.name = name
+        self.driver_class = driver_class
+        self.instance = None
+        self.config = None
+        self.lock = threading.Lock()
+
+    def read(self, config):
+        with self.lock:
+            if self.instance is not None and config != self.config:
+                self._close()
+            if self.instance is None:
+                instance = self.driver_class()
+                instance.open(config)
+                self.instance = instance
+                self.config = dict(config)
+            try:
+                return self.instance.read()
+            except Exception:
+                # Start from a fresh open() next time, e.g. to reconnect a dropped device
+                self._close()
+                raise
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def _close(self):
+        if self.instance is None:
+            return
+        try:
+            self.instance.close()
+        except Exception as e:
+            logging.warning(f"Error closing driver '{self.name}': {e}")
+        self.instance = None
+        self.config = None
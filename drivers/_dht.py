@@ -0,0 +1,110 @@
+"""
+Shared DHT11/DHT22 sampling for dht11 and dht22
+
+DHT reads fail often (checksum and timing errors are routine on a busy Pi), so
+a read makes up to `attempts` tries instead of giving up after one. The sensor
+needs 2 s between measurements, and the library silently returns the previous
+values when called sooner, so tries are spaced MIN_SPACING_SEC apart. The
+read reports the median of the successful samples (up to `samples` of them)
+and the share of recent tries that succeeded; a read with no successful
+sample returns nothing.
+
+Config options:
+    - gpio_pin: GPIO number the data line is connected to
+    - attempts: (default 3) most tries per read
+    - samples: (default 1) successful samples to take the median of
+    - success_rate: (default true) also report the % of the last 100 tries that succeeded
+"""
+import collections
+import logging
+import statistics
+import time
+
+import adafruit_dht
+import board
+
+from drivers._base import Driver, read_budget
+from reading import Reading
+
+# A little over the 2 s the sensor (and adafruit_dht) needs between measurements
+MIN_SPACING_SEC = 2.1
+
+DEFAULT_ATTEMPTS = 3
+DEFAULT_SAMPLES = 1
+
+# Tries the success rate is computed over
+SUCCESS_WINDOW = 100
+
+
+class DHTDriver(Driver):
+    """DHT sensor kept open between reads, sampled within a bounded retry budget"""
+
+    # adafruit_dht class name, set by subclasses
+    model = None
+
+    def open(self, config):
+        super().open(config)
+        self.pin = "D" + str(config.get("gpio_pin"))
+        self.device = getattr(adafruit_dht, self.model)(getattr(board, self.pin))
+        self.prefix = '_' + self.model.lower()
+        self.attempts = max(1, int(config.get('attempts', DEFAULT_ATTEMPTS)))
+        self.samples = max(1, min(int(config.get('samples', DEFAULT_SAMPLES)), self.attempts))
+        self.report_rate = config.get('success_rate', True)
+        # Stop trying well before the loader abandons the read
+        self.budget_sec = read_budget(config)
+        self.last_try = None
+        self.history = collections.deque(maxlen=SUCCESS_WINDOW)
+
+    def _try(self):
+        """One measurement, spaced from the previous one; (temperature, humidity) or None"""
+        if self.last_try is not None:
+            wait = self.last_try + MIN_SPACING_SEC - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+        self.last_try = time.monotonic()
+        try:
+            temperature = self.device.temperature
+            humidity = self.device.humidity
+        except RuntimeError as e:
+            logging.debug(f"{self.model} on {self.pin}: {e}")
+            return None
+        if temperature is None or humidity is None:
+            return None
+        return temperature, humidity
+
+    def read(self):
+        deadline = time.monotonic() + self.budget_sec
+        samples = []
+        tries = 0
+        while tries < self.attempts and len(samples) < self.samples:
+            if tries and self.last_try + MIN_SPACING_SEC > deadline:
+                break
+            sample = self._try()
+            tries += 1
+            self.history.append(sample is not None)
+            if sample is not None:
+                samples.append(sample)
+
+        if not samples:
+            # Nothing to report, so the loader's failure backoff still applies
+            logging.warning(f"No {self.model} reading on {self.pin} after {tries} tries")
+            return []
+
+        data = []
+        temperature = statistics.median(s[0] for s in samples)
+        humidity = statistics.median(s[1] for s in samples)
+
+        rom = self.prefix + '_temp_gpio_' + self.pin
+        data.append(Reading(rom, 'temp', round(temperature, 1), rom))
+
+        rom = self.prefix + '_humid_gpio_' + self.pin
+        data.append(Reading(rom, 'humid', round(humidity, 1), rom))
+
+        if self.report_rate:
+            rate = 100.0 * sum(self.history) / len(self.history)
+            rom = self.prefix + '_success_gpio_' + self.pin
+            data.append(Reading(rom, 'system', round(rate, 1), rom, '%'))
+        return data
+
+    def close(self):
+        self.device.exit()
@@ -0,0 +1,308 @@
+"""
+Shared I2C buses for the drivers
+
+One process-wide pool (`pool`) resolves bus numbers, keeps one open
+smbus.SMBus per bus and one busio.I2C on the board's default SCL/SDA, and
+holds a lock per bus. The driver loader hands the pooled handles to drivers as
+`_smbus`/`_busio` and holds the bus lock around each read; a driver called
+without them (an isolated worker, a script) gets the same pooled handles from
+smbus_for()/busio_for(). Drivers never close pooled handles: pool.close()
+does, when the loader shuts down.
+
+Drivers that sample continuously use ContinuousSampler, which takes the same
+per-bus lock for every sample.
+"""
+import collections
+import logging
+import os
+import statistics
+import threading
+import time
+
+from drivers import _paths
+
+
+class I2CBusManager:
+    """Shared I2C handles and per-bus locks for drivers on the same bus"""
+
+    def __init__(self):
+        self.default_bus = None
+        self.locks = {}
+        self.smbus_handles = {}
+        self.busio_handle = None
+        self._lock = threading.Lock()
+
+    def resolve_bus(self, config_dict):
+        """Return the bus number from config, or the first /dev/i2c-N present"""
+        if config_dict.get('i2c_bus') is not None:
+            return int(config_dict['i2c_bus'])
+        if self.default_bus is None:
+            self.default_bus = next((n for n in range(4) if os.path.exists(os.path.join(_paths.DEV_ROOT, f'i2c-{n}'))), 1)
+        return self.default_bus
+
+    def lock(self, bus):
+        """Lock of a bus; reentrant, so a driver's close() can take it whether or not the loader holds it"""
+        with self._lock:
+            return self.locks.setdefault(bus, threading.RLock())
+
+    def get_smbus(self, bus):
+        """Return an open smbus.SMBus for the bus, opened once"""
+        with self._lock:
+            handle = self.smbus_handles.get(bus)
+            if handle is None:
+                import smbus
+                handle = self.smbus_handles[bus] = smbus.SMBus(bus)
+            return handle
+
+    def get_busio(self):
+        """Return the board's default busio.I2C, created once"""
+        with self._lock:
+            if self.busio_handle is None:
+                import board
+                import busio
+                self.busio_handle = busio.I2C(board.SCL, board.SDA)
+            return self.busio_handle
+
+    def close(self):
+        """Close every pooled handle; the next request opens the bus again"""
+        with self._lock:
+            handles = list(self.smbus_handles.values())
+            busio_handle = self.busio_handle
+            self.smbus_handles = {}
+            self.busio_handle = None
+            self.default_bus = None
+        for handle in handles:
+            try:
+                handle.close()
+            except Exception:
+                pass
+        if busio_handle is not None:
+            try:
+                busio_handle.deinit()
+            except Exception:
+                pass
+
+
+pool = I2CBusManager()
+
+
+def smbus_for(config):
+    """Return the smbus handle for a driver config: the loader's `_smbus`, else the pooled one"""
+    bus = config.get('_smbus')
+    return bus if bus is not None else pool.get_smbus(pool.resolve_bus(config))
+
+
+def busio_for(config):
+    """Return the busio.I2C for a driver config: the loader's `_busio`, else the pooled one"""
+    i2c = config.get('_busio')
+    return i2c if i2c is not None else pool.get_busio()
+
+
+class Device(object):
+    """Class for communicating with an I2C device using the adafruit-pureio pure
+    python smbus library, or other smbus compatible I2C interface. Allows reading
+    and writing 8-bit, 16-bit, and byte array values to registers
+    on the device."""
+    def __init__(self, address, busnum, i2c_interface=None, bus=None):
+        """Create an instance of the I2C device at the specified address on the
+        specified I2C bus number.  An already open smbus compatible `bus` is
+        used as-is instead of opening a new one."""
+        self._address = address
+        self._busnum = busnum
+        if bus is not None:
+            self._bus = bus
+        elif i2c_interface is None:
+            # Use pure python I2C interface if none is specified.
+            import Adafruit_PureIO.smbus
+            self._bus = Adafruit_PureIO.smbus.SMBus(busnum)
+        else:
+            # Otherwise use the provided class to create an smbus interface.
+            self._bus = i2c_interface(busnum)
+        self._logger = logging.getLogger('Adafruit_I2C.Device.Bus.{0}.Address.{1:#0X}' \
+                                .format(busnum, address))
+
+    def writeRaw8(self, value):
+        """Write an 8-bit value on the bus (without register)."""
+        value = value & 0xFF
+        self._bus.write_byte(self._address, value)
+        self._logger.debug("Wrote 0x%02X",
+                     value)
+
+    def write8(self, register, value):
+        """Write an 8-bit value to the specified register."""
+        value = value & 0xFF
+        self._bus.write_byte_data(self._address, register, value)
+        self._logger.debug("Wrote 0x%02X to register 0x%02X",
+                     value, register)
+
+    def write16(self, register, value):
+        """Write a 16-bit value to the specified register."""
+        value = value & 0xFFFF
+        self._bus.write_word_data(self._address, register, value)
+        self._logger.debug("Wrote 0x%04X to register pair 0x%02X, 0x%02X",
+                     value, register, register+1)
+
+    def writeList(self, register, data):
+        """Write bytes to the specified register."""
+        self._bus.write_i2c_block_data(self._address, register, data)
+        self._logger.debug("Wrote to register 0x%02X: %s",
+                     register, data)
+
+    def readList(self, register, length):
+        """Read a length number of bytes from the specified register.  Results
+        will be returned as a bytearray."""
+        results = self._bus.read_i2c_block_data(self._address, register, length)
+        self._logger.debug("Read the following from register 0x%02X: %s",
+                     register, results)
+        return results
+
+    def readRaw8(self):
+        """Read an 8-bit value on the bus (without register)."""
+        result = self._bus.read_byte(self._address) & 0xFF
+        self._logger.debug("Read 0x%02X",
+                    result)
+        return result
+
+    def readU8(self, register):
+        """Read an unsigned byte from the specified register."""
+        result = self._bus.read_byte_data(self._address, register) & 0xFF
+        self._logger.debug("Read 0x%02X from register 0x%02X",
+                     result, register)
+        return result
+
+    def readS8(self, register):
+        """Read a signed byte from the specified register."""
+        result = self.readU8(register)
+        if result > 127:
+            result -= 256
+        return result
+
+    def readU16(self, register, little_endian=True):
+        """Read an unsigned 16-bit value from the specified register, with the
+        specified endianness (default little endian, or least significant byte
+        first)."""
+        result = self._bus.read_word_data(self._address,register) & 0xFFFF
+        self._logger.debug("Read 0x%04X from register pair 0x%02X, 0x%02X",
+                           result, register, register+1)
+        # Swap bytes if using big endian because read_word_data assumes little
+        # endian on ARM (little endian) systems.
+        if not little_endian:
+            result = ((result << 8) & 0xFF00) + (result >> 8)
+        return result
+
+    def readS16(self, register, little_endian=True):
+        """Read a signed 16-bit value from the specified register, with the
+        specified endianness (default little endian, or least significant byte
+        first)."""
+        result = self.readU16(register, little_endian)
+        if result > 32767:
+            result -= 65536
+        return result
+
+    def readU16LE(self, register):
+        """Read an unsigned 16-bit value from the specified register, in little
+        endian byte order."""
+        return self.readU16(register, little_endian=True)
+
+    def readU16BE(self, register):
+        """Read an unsigned 16-bit value from the specified register, in big
+        endian byte order."""
+        return self.readU16(register, little_endian=False)
+
+    def readS16LE(self, register):
+        """Read a signed 16-bit value from the specified register, in little
+        endian byte order."""
+        return self.readS16(register, little_endian=True)
+
+    def readS16BE(self, register):
+        """Read a signed 16-bit value from the specified register, in big
+        endian byte order."""
+        return self.readS16(register, little_endian=False)
+
+
+class PooledI2C:
+    """
+    Stand-in for the Adafruit_GPIO.I2C module that Adafruit_* libraries take as
+    `i2c=`: their devices talk over an already open smbus handle
+    """
+
+    def __init__(self, bus, busnum):
+        self.bus = bus
+        self.busnum = busnum
+
+    def get_i2c_device(self, address, busnum=None, **kwargs):
+        return Device(address, self.busnum if busnum is None else busnum, bus=self.bus)
+
+
+class ContinuousSampler:
+    """
+    Background sampling of one sensor into a rolling window
+
+    A thread calls sample() every `interval` seconds while holding the pool's
+    lock for `bus`, so it never interleaves with other drivers on the bus.
+    sample() returns a value, or None when the sensor has nothing new yet.
+    read() then takes median() of the window instead of waiting for the sensor.
+
+    The loader holds the bus lock while a driver opens and reads, so a driver
+    must not wait for the thread there: take the first sample in open() and
+    add() it before start().
+    """
+
+    # Pause after a failed sample before trying again
+    ERROR_BACKOFF_SEC = 1.0
+    LOCK_POLL_SEC = 0.1
+
+    def __init__(self, name, bus, sample, interval, window=5):
+        self.name = name
+        self.lock = pool.lock(bus)
+        self.sample = sample
+        self.interval = interval
+        self.values = collections.deque(maxlen=max(1, int(window)))
+        self.timestamp = None
+        self.errors = 0
+        self.stopping = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f'sampler-{name}', daemon=True)
+
+    def add(self, value):
+        self.values.append(value)
+        self.timestamp = time.time()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        if self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        next_due = time.monotonic() + self.interval
+        self.stopping.wait(self.interval)
+        while not self.stopping.is_set():
+            # Give up the wait now and then so stop() isn't held up by whoever holds the bus
+            if not self.lock.acquire(timeout=self.LOCK_POLL_SEC):
+                continue
+            try:
+                value = self.sample()
+            except Exception as e:
+                self.errors += 1
+                logging.debug(f"{self.name}: sample failed: {e}")
+                next_due = time.monotonic() + max(self.interval, self.ERROR_BACKOFF_SEC)
+            else:
+                if value is not None:
+                    self.add(value)
+                next_due += self.interval
+                now = time.monotonic()
+                if next_due <= now:
+                    next_due = now + self.interval
+            finally:
+                self.lock.release()
+            self.stopping.wait(max(0.0, next_due - time.monotonic()))
+
+    def median(self, max_age):
+        """Median of the window and the time of its newest sample, or None if nothing newer than max_age seconds"""
+        values = list(self.values)
+        if not values or self.timestamp is None or time.time() - self.timestamp > max_age:
+            return None
+        return statistics.median(values), self.timestamp
@@ -0,0 +1,32 @@
+"""
+Locations of the kernel interfaces and tools drivers read from
+
+Read these as module attributes at call time (`_paths.W1_DEVICES_DIR`), not
+copied at import, so the simulation layer (simulation.py) can point drivers
+at a fake sysfs tree. The environment variables carry the same override into
+worker processes.
+"""
+import os
+
+SYSFS_ROOT = os.environ.get('NETTEMP_SYSFS_ROOT', '/sys')
+DEV_ROOT = os.environ.get('NETTEMP_DEV_ROOT', '/dev')
+W1_DEVICES_DIR = os.path.join(SYSFS_ROOT, 'bus', 'w1', 'devices')
+HWMON_DIR = os.path.join(SYSFS_ROOT, 'class', 'hwmon')
+SENSORS_BIN = os.environ.get('NETTEMP_SENSORS_BIN', '/usr/bin/sensors')
+# Where drivers keep small state files (e.g. persisted sensor names); defaults to the client directory
+STATE_DIR = os.environ.get('NETTEMP_STATE_DIR', os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def set_roots(sysfs_root=None, dev_root=None, sensors_bin=None, state_dir=None):
+    """Repoint the paths above (used by the simulation layer)"""
+    global SYSFS_ROOT, DEV_ROOT, W1_DEVICES_DIR, HWMON_DIR, SENSORS_BIN, STATE_DIR
+    if sysfs_root is not None:
+        SYSFS_ROOT = sysfs_root
+        W1_DEVICES_DIR = os.path.join(SYSFS_ROOT, 'bus', 'w1', 'devices')
+        HWMON_DIR = os.path.join(SYSFS_ROOT, 'class', 'hwmon')
+    if dev_root is not None:
+        DEV_ROOT = dev_root
+    if sensors_bin is not None:
+        SENSORS_BIN = sensors_bin
+    if state_dir is not None:
+        STATE_DIR = state_dir
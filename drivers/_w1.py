@@ -0,0 +1,261 @@
+"""
+Shared 1-Wire temperature reading for w1_kernel and w1_kernel_gpio
+
+Reading DS18B20s one by one waits for a ~750 ms conversion per sensor. Where
+the kernel supports it (w1_therm, Linux 5.9+), one write of "trigger" to a bus
+master's therm_bulk_read starts a conversion on every sensor of that bus at
+once; afterwards each sensor's `temperature` file returns the converted value
+without converting again. Without bulk support the sensors are read through
+w1thermsensor in parallel, so a cycle still takes about one conversion time
+whatever the number of sensors.
+
+The list of sensors is cached and re-enumerated every ENUM_REFRESH_SEC, when
+the devices directory changes, or when a cached sensor disappears. Sensor
+names are derived from the ROM id once and persisted in w1_names.json, where
+they can be edited.
+"""
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from drivers import _paths
+
+# 1-Wire family codes of the temperature sensors w1_therm handles
+W1_THERM_FAMILIES = ('10-', '22-', '28-', '3b-', '42-')
+
+# Longest a bulk conversion may take (12-bit conversion is 750 ms)
+BULK_TIMEOUT_SEC = 1.5
+BULK_POLL_SEC = 0.05
+
+# Threads reading sensors at the same time when bulk conversion is unavailable
+PARALLEL_READS = 16
+
+# Seconds between re-enumerations of the 1-Wire buses (sooner if the directory changes)
+ENUM_REFRESH_SEC = 300
+
+NAMES_FILE = 'w1_names.json'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Enumeration cache: key (devices dir, mtime), monotonic time, {master: [slaves]}, w1thermsensor objects
+_enum = {'key': None, 'time': 0.0, 'slaves': None, 'sensors': None}
+_enum_lock = threading.Lock()
+
+# Persisted names: file path they were loaded from, {ROM serial: name}
+_names = {'path': None, 'names': {}}
+_names_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=PARALLEL_READS, thread_name_prefix='w1')
+        return _executor
+
+
+def bus_masters():
+    """Return the sysfs directories of all 1-Wire bus masters"""
+    return sorted(glob.glob(os.path.join(_paths.W1_DEVICES_DIR, 'w1_bus_master*')))
+
+
+def _enum_key():
+    try:
+        mtime = os.stat(_paths.W1_DEVICES_DIR).st_mtime
+    except OSError:
+        mtime = None
+    return _paths.W1_DEVICES_DIR, mtime
+
+
+def _enum_fresh():
+    """Drop the cached enumeration if it is old or the devices directory changed (call with _enum_lock)"""
+    key = _enum_key()
+    if _enum['key'] != key or time.monotonic() - _enum['time'] >= ENUM_REFRESH_SEC:
+        _enum.update(key=key, time=time.monotonic(), slaves=None, sensors=None)
+
+
+def invalidate():
+    """Re-enumerate on the next read, e.g. after a sensor vanished"""
+    with _enum_lock:
+        _enum['key'] = None
+
+
+def therm_slaves():
+    """Return {bus master directory: [sensor ids]}, cached"""
+    with _enum_lock:
+        _enum_fresh()
+        if _enum['slaves'] is None:
+            _enum['slaves'] = {master: master_slaves(master) for master in bus_masters()}
+        return _enum['slaves']
+
+
+def available_sensors(sensor_class):
+    """Return sensor_class.get_available_sensors() (w1thermsensor), cached"""
+    with _enum_lock:
+        _enum_fresh()
+        if _enum['sensors'] is None:
+            _enum['sensors'] = sensor_class.get_available_sensors()
+        return _enum['sensors']
+
+
+def _names_path():
+    return os.path.join(_paths.STATE_DIR, NAMES_FILE)
+
+
+def _save_names(path, names):
+    tmp = path + '.tmp'
+    try:
+        with open(tmp, 'w') as f:
+            json.dump(names, f, indent=2, sort_keys=True)
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.warning(f"Cannot save 1-Wire sensor names to {path}: {e}")
+
+
+def sensor_name(slave, prefix='DS18B20'):
+    """
+    Return the persisted name of a sensor, assigning one on first sight
+
+    Args:
+        slave: Sensor id with or without family code (28-000007165506 or 000007165506)
+        prefix: Name prefix for new sensors; the last 6 hex digits of the serial follow it
+    """
+    serial = slave.split('-', 1)[-1]
+    path = _names_path()
+    with _names_lock:
+        if _names['path'] != path:
+            try:
+                with open(path, 'r') as f:
+                    names = json.load(f)
+            except (OSError, ValueError):
+                names = {}
+            _names.update(path=path, names=names if isinstance(names, dict) else {})
+        names = _names['names']
+        name = names.get(serial)
+        if name is None:
+            name = names[serial] = f'{prefix}-{serial[-6:]}'
+            _save_names(path, names)
+        return name
+
+
+def master_slaves(master):
+    """Return the temperature sensor ids (e.g. 28-000007165506) on one bus master"""
+    try:
+        with open(os.path.join(master, 'w1_master_slaves'), 'r') as f:
+            slaves = f.read().split()
+    except OSError:
+        return []
+    return [s for s in slaves if s.startswith(W1_THERM_FAMILIES)]
+
+
+def _bulk_trigger(master):
+    """Start a conversion on every sensor of a bus master; False if the kernel can't"""
+    try:
+        with open(os.path.join(master, 'therm_bulk_read'), 'w') as f:
+            f.write('trigger\n')
+        return True
+    except OSError as e:
+        logging.debug(f"w1 bulk conversion not available on {os.path.basename(master)}: {e}")
+        return False
+
+
+def _bulk_wait(master, deadline):
+    """Wait until a triggered bulk conversion is done (therm_bulk_read stops reading -1)"""
+    while True:
+        try:
+            with open(os.path.join(master, 'therm_bulk_read'), 'r') as f:
+                state = int(f.read().strip())
+        except (OSError, ValueError):
+            return
+        if state != -1 or time.monotonic() >= deadline:
+            return
+        time.sleep(BULK_POLL_SEC)
+
+
+def read_converted(slave):
+    """Read a sensor's last converted temperature (C) from sysfs without a new conversion"""
+    path = os.path.join(_paths.W1_DEVICES_DIR, slave)
+    try:
+        with open(os.path.join(path, 'temperature'), 'r') as f:
+            return int(f.read().strip()) / 1000.0
+    except FileNotFoundError:
+        pass
+    # Kernels without the temperature attribute: parse w1_slave instead
+    with open(os.path.join(path, 'w1_slave'), 'r') as f:
+        lines = f.read().splitlines()
+    if len(lines) < 2 or not lines[0].strip().endswith('YES') or 't=' not in lines[1]:
+        raise ValueError(f'CRC check failed for {slave}')
+    return int(lines[1].split('t=')[1]) / 1000.0
+
+
+def read_bulk():
+    """
+    Read all sensors with one simultaneous conversion per bus master
+
+    Sensors on a master that refuses the bulk trigger are read one by one (in
+    parallel) instead.
+
+    Returns:
+        List of (slave id, temperature) or None if no bus master supports bulk
+        conversion (then use read_parallel)
+    """
+    triggered = []
+    single = []
+    for master, slaves in therm_slaves().items():
+        if not slaves:
+            continue
+        if _bulk_trigger(master):
+            triggered.append((master, slaves))
+        else:
+            single.extend(slaves)
+    if not triggered:
+        return None
+
+    # Their conversions run while the bulk conversions do
+    pending = _submit(single, read_converted)
+    deadline = time.monotonic() + BULK_TIMEOUT_SEC
+    results = []
+    for master, slaves in triggered:
+        _bulk_wait(master, deadline)
+        for slave in slaves:
+            try:
+                results.append((slave, read_converted(slave)))
+            except FileNotFoundError:
+                logging.info(f"w1 sensor {slave} is gone, re-enumerating")
+                invalidate()
+            except (OSError, ValueError) as e:
+                logging.warning(f"w1 read error for sensor {slave}: {e}")
+    return results + _collect(pending, str)
+
+
+def _submit(items, read):
+    return [(item, _get_executor().submit(read, item)) for item in items]
+
+
+def _collect(futures, label):
+    """Results of _submit() as (item, temperature) in order, skipping failed reads"""
+    results = []
+    for item, future in futures:
+        try:
+            results.append((item, future.result()))
+        except FileNotFoundError:
+            logging.info(f"w1 sensor {label(item)} is gone, re-enumerating")
+            invalidate()
+        except Exception as e:
+            logging.warning(f"w1 read error for sensor {label(item)}: {e}")
+    return results
+
+
+def read_parallel(sensors):
+    """
+    Read w1thermsensor sensors concurrently (each does its own conversion)
+
+    Returns:
+        List of (sensor, temperature) in the order given, skipping failed sensors
+    """
+    return _collect(_submit(sensors, lambda sensor: sensor.get_temperature()), lambda sensor: getattr(sensor, 'id', None))
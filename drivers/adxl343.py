@@ -1,50 +1,10 @@
-import time
-import board
-import busio
-import adafruit_adxl34x
-import sys
-import os.path, socket
-i2c = busio.I2C(board.SCL, board.SDA)
+from drivers._adxl34x import ADXL34xDriver
 
-def adxl343(config_dict):
-    try:
-        accelerometer = adafruit_adxl34x.ADXL343(i2c)
-        accelerometer.enable_motion_detection()
 
-        if accelerometer.events["motion"]==True:
-            motion=1
-        else:
-            motion=0
+class ADXL343Driver(ADXL34xDriver):
+    """ADXL343 accelerometer, single samples or FIFO vibration capture (see drivers/_adxl34x.py)"""
 
-        #print("Motion detected: %s" % accelerometer.events["motion"])
-        #print(accelerometer.acceleration)
+    model = 'ADXL343'
 
-        data = accelerometer.acceleration
-        x = '{0:0.2f}'.format(data[0])
-        y = '{0:0.2f}'.format(data[1])
-        z = '{0:0.2f}'.format(data[2])
 
-
-
-        rom = "i2c_53_acce_x"
-        value = x
-        name = 'adxl343_x'
-        type = 'accel'
-
-        rom = "i2c_53_acce_y"
-        value = y
-        name = 'adxl343_y'
-        type = 'accel'
-
-        rom = "i2c_53_acce_z"
-        value = z
-        name = 'adxl343_z'
-        type = 'accel'
-
-        rom = "i2c_53_moti"
-        value = '{0:0.2f}'.format(motion)
-        name = 'adxl343_motion'
-        type = 'motion'
-        return [{"rom":rom,"type":type, "value":value,"name":name}]
-    except:
-        print ("No ADXL34x")
+adxl343 = ADXL343Driver
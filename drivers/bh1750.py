@@ -1,8 +1,10 @@
 #!/usr/bin/python
-import smbus
 import time
-import os.path
-import sys, socket
+import socket
+
+from drivers import _i2c
+from drivers._base import Driver
+from reading import Reading
 
 
 # Define some constants from the datasheet
@@ -29,40 +31,40 @@ ONE_TIME_HIGH_RES_MODE_2 = 0x21
 # Device is automatically set to Power Down after measurement.
 ONE_TIME_LOW_RES_MODE = 0x23
 
-def bh1750(config_dict):
-	try:
-		if len(sys.argv) > 1:
-			nbus = sys.argv[1]
-		elif os.path.exists("/dev/i2c-0"):
-			nbus = "0"
-		elif os.path.exists("/dev/i2c-1"):
-			nbus = "1"
-		elif os.path.exists("/dev/i2c-2"):
-			nbus = "2"
-		elif os.path.exists("/dev/i2c-3"):
-			nbus = "3"
+def convertToNumber(data):
+	# Simple function to convert 2 bytes of data
+	# into a decimal number
+	return ((data[1] + (256 * data[0])) / 1.2)
+
+
+class BH1750Driver(Driver):
+	"""BH1750 on the pooled bus handle"""
+
+	def open(self, config):
+		# Shared handle from the driver loader, else from the process-wide bus pool
+		self.bus = _i2c.smbus_for(config)
+		self.addr = int(str(config.get('i2c_address', DEVICE)), 0)
 
-		bus = smbus.SMBus(int(nbus))
+	def readLight(self, addr=DEVICE):
+		data = self.bus.read_i2c_block_data(addr,ONE_TIME_HIGH_RES_MODE_1)
+		return convertToNumber(data)
 
-		def convertToNumber(data):
-			# Simple function to convert 2 bytes of data
-			# into a decimal number
-			return ((data[1] + (256 * data[0])) / 1.2)
+	def read(self):
+		try:
+			rom = f"_i2c_{self.addr:02x}_lux"
+			value = round(self.readLight(self.addr), 2)
+			name = 'bh1750_lux'
+			type = 'lux'
 
-		def readLight(addr=DEVICE):
-			data = bus.read_i2c_block_data(addr,ONE_TIME_HIGH_RES_MODE_1)
-			return convertToNumber(data)
+			return [Reading(rom, type, value, name)]
 
-		#print(readLight())
+		except OSError:
+			print("No bh1750")
+			return []
 
-		rom = "_i2c_23_lux"
-		value = '{0:0.2f}'.format(readLight())
-		name = 'bh1750_lux'
-		type = 'lux'
+	def close(self):
+		# The bus handle belongs to the pool
+		pass
 
-		return [{"rom":rom,"type":type, "value":value,"name":name}]
-	
-	except Exception:
-		print("No bh1750")
-		return []
 
+bh1750 = BH1750Driver
@@ -1,13 +1,35 @@
 #!/usr/bin/python
+"""
+BME280 temperature, pressure and humidity over I2C
+
+Calibration is read once per process (two block reads, cached per bus and
+address) and a sample is one forced-mode trigger plus one 8-byte block read of
+the data registers 0xF7-0xFE, so the sensor sleeps between samples. With
+`mode: normal` the sensor measures continuously and a sample is the block read
+alone.
+
+Config options:
+    - i2c_address: (default 0x76) I2C address
+    - oversampling: (default 8) 1, 2, 4, 8 or 16, for all three measurements
+    - mode: (default forced) forced (one measurement per read) or normal
+"""
+import functools
 import sys
 import socket
 import logging
+import platform
+import struct
 import time
 import os
 import subprocess
 
 import re
 
+from drivers import _i2c
+from drivers._base import Driver
+from drivers._i2c import Device
+from reading import Reading
+
 # Platform identification constants.
 UNKNOWN          = 0
 RASPBERRY_PI     = 1
@@ -15,6 +37,7 @@ BEAGLEBONE_BLACK = 2
 MINNOWBOARD      = 3
 JETSON_NANO       = 4
 
+@functools.lru_cache(maxsize=None)
 def platform_detect():
     """Detect if running on the Raspberry Pi or Beaglebone Black and return the
     platform type.  Will return RASPBERRY_PI, BEAGLEBONE_BLACK, or UNKNOWN."""
@@ -49,6 +72,7 @@ def platform_detect():
     return UNKNOWN
 
 
+@functools.lru_cache(maxsize=None)
 def pi_revision():
     """Detect the revision number of a Raspberry Pi, useful for changing
     functionality like default I2C bus based on revision."""
@@ -145,8 +169,8 @@ def require_repeated_start():
     this function.  See this thread for more details:
       http://www.raspberrypi.org/forums/viewtopic.php?f=44&t=15840
     """
-    plat = Platform.platform_detect()
-    if plat == Platform.RASPBERRY_PI and os.path.exists('/sys/module/i2c_bcm2708/parameters/combined'):
+    plat = platform_detect()
+    if plat == RASPBERRY_PI and os.path.exists('/sys/module/i2c_bcm2708/parameters/combined'):
         # On the Raspberry Pi there is a bug where register reads don't send a
         # repeated start condition like the kernel smbus I2C driver functions
         # define.  As a workaround this bit in the BCM2708 driver sysfs tree can
@@ -157,124 +181,6 @@ def require_repeated_start():
     # behavior and send repeated starts.
 
 
-class Device(object):
-    """Class for communicating with an I2C device using the adafruit-pureio pure
-    python smbus library, or other smbus compatible I2C interface. Allows reading
-    and writing 8-bit, 16-bit, and byte array values to registers
-    on the device."""
-    def __init__(self, address, busnum, i2c_interface=None):
-        """Create an instance of the I2C device at the specified address on the
-        specified I2C bus number."""
-        self._address = address
-        if i2c_interface is None:
-            # Use pure python I2C interface if none is specified.
-            import Adafruit_PureIO.smbus
-            self._bus = Adafruit_PureIO.smbus.SMBus(busnum)
-        else:
-            # Otherwise use the provided class to create an smbus interface.
-            self._bus = i2c_interface(busnum)
-        self._logger = logging.getLogger('Adafruit_I2C.Device.Bus.{0}.Address.{1:#0X}' \
-                                .format(busnum, address))
-
-    def writeRaw8(self, value):
-        """Write an 8-bit value on the bus (without register)."""
-        value = value & 0xFF
-        self._bus.write_byte(self._address, value)
-        self._logger.debug("Wrote 0x%02X",
-                     value)
-
-    def write8(self, register, value):
-        """Write an 8-bit value to the specified register."""
-        value = value & 0xFF
-        self._bus.write_byte_data(self._address, register, value)
-        self._logger.debug("Wrote 0x%02X to register 0x%02X",
-                     value, register)
-
-    def write16(self, register, value):
-        """Write a 16-bit value to the specified register."""
-        value = value & 0xFFFF
-        self._bus.write_word_data(self._address, register, value)
-        self._logger.debug("Wrote 0x%04X to register pair 0x%02X, 0x%02X",
-                     value, register, register+1)
-
-    def writeList(self, register, data):
-        """Write bytes to the specified register."""
-        self._bus.write_i2c_block_data(self._address, register, data)
-        self._logger.debug("Wrote to register 0x%02X: %s",
-                     register, data)
-
-    def readList(self, register, length):
-        """Read a length number of bytes from the specified register.  Results
-        will be returned as a bytearray."""
-        results = self._bus.read_i2c_block_data(self._address, register, length)
-        self._logger.debug("Read the following from register 0x%02X: %s",
-                     register, results)
-        return results
-
-    def readRaw8(self):
-        """Read an 8-bit value on the bus (without register)."""
-        result = self._bus.read_byte(self._address) & 0xFF
-        self._logger.debug("Read 0x%02X",
-                    result)
-        return result
-
-    def readU8(self, register):
-        """Read an unsigned byte from the specified register."""
-        result = self._bus.read_byte_data(self._address, register) & 0xFF
-        self._logger.debug("Read 0x%02X from register 0x%02X",
-                     result, register)
-        return result
-
-    def readS8(self, register):
-        """Read a signed byte from the specified register."""
-        result = self.readU8(register)
-        if result > 127:
-            result -= 256
-        return result
-
-    def readU16(self, register, little_endian=True):
-        """Read an unsigned 16-bit value from the specified register, with the
-        specified endianness (default little endian, or least significant byte
-        first)."""
-        result = self._bus.read_word_data(self._address,register) & 0xFFFF
-        self._logger.debug("Read 0x%04X from register pair 0x%02X, 0x%02X",
-                           result, register, register+1)
-        # Swap bytes if using big endian because read_word_data assumes little
-        # endian on ARM (little endian) systems.
-        if not little_endian:
-            result = ((result << 8) & 0xFF00) + (result >> 8)
-        return result
-
-    def readS16(self, register, little_endian=True):
-        """Read a signed 16-bit value from the specified register, with the
-        specified endianness (default little endian, or least significant byte
-        first)."""
-        result = self.readU16(register, little_endian)
-        if result > 32767:
-            result -= 65536
-        return result
-
-    def readU16LE(self, register):
-        """Read an unsigned 16-bit value from the specified register, in little
-        endian byte order."""
-        return self.readU16(register, little_endian=True)
-
-    def readU16BE(self, register):
-        """Read an unsigned 16-bit value from the specified register, in big
-        endian byte order."""
-        return self.readU16(register, little_endian=False)
-
-    def readS16LE(self, register):
-        """Read a signed 16-bit value from the specified register, in little
-        endian byte order."""
-        return self.readS16(register, little_endian=True)
-
-    def readS16BE(self, register):
-        """Read a signed 16-bit value from the specified register, in big
-        endian byte order."""
-        return self.readS16(register, little_endian=False)
-
-
 # BME280 default address.
 BME280_I2CADDR = 0x76
 
@@ -285,6 +191,18 @@ BME280_OSAMPLE_4 = 3
 BME280_OSAMPLE_8 = 4
 BME280_OSAMPLE_16 = 5
 
+# oversampling factor -> register value
+BME280_OSAMPLE = {1: BME280_OSAMPLE_1, 2: BME280_OSAMPLE_2, 4: BME280_OSAMPLE_4,
+                  8: BME280_OSAMPLE_8, 16: BME280_OSAMPLE_16}
+
+# Power modes (ctrl_meas bits 1:0)
+BME280_MODE_SLEEP = 0
+BME280_MODE_FORCED = 1
+BME280_MODE_NORMAL = 3
+
+# Standby between normal mode measurements: 1000 ms (config bits 7:5)
+BME280_STANDBY_1000MS = 5
+
 # BME280 Registers
 
 BME280_REGISTER_DIG_T1 = 0x88  # Trimming parameter registers
@@ -314,6 +232,7 @@ BME280_REGISTER_VERSION = 0xD1
 BME280_REGISTER_SOFTRESET = 0xE0
 
 BME280_REGISTER_CONTROL_HUM = 0xF2
+BME280_REGISTER_STATUS = 0xF3
 BME280_REGISTER_CONTROL = 0xF4
 BME280_REGISTER_CONFIG = 0xF5
 BME280_REGISTER_PRESSURE_DATA = 0xF7
@@ -321,107 +240,94 @@ BME280_REGISTER_TEMP_DATA = 0xFA
 BME280_REGISTER_HUMIDITY_DATA = 0xFD
 
 
+# Calibration per (bus number, address), read once per process
+_calibration = {}
+
+
 class BME280(object):
     def __init__(self, mode=BME280_OSAMPLE_1, address=BME280_I2CADDR, i2c=None,
-                 **kwargs):
+                 power_mode=BME280_MODE_FORCED, **kwargs):
         self._logger = logging.getLogger('Adafruit_BMP.BMP085')
         # Check that mode is valid.
         if mode not in [BME280_OSAMPLE_1, BME280_OSAMPLE_2, BME280_OSAMPLE_4,
                         BME280_OSAMPLE_8, BME280_OSAMPLE_16]:
             raise ValueError(
                 'Unexpected mode value {0}.  Set mode to one of BME280_ULTRALOWPOWER, BME280_STANDARD, BME280_HIGHRES, or BME280_ULTRAHIGHRES'.format(mode))
+        if power_mode not in (BME280_MODE_FORCED, BME280_MODE_NORMAL):
+            raise ValueError('Unexpected power mode {0}.  Use BME280_MODE_FORCED or BME280_MODE_NORMAL'.format(power_mode))
         self._mode = mode
-        # Create I2C device.
-        #if i2c is None:
-            #import Adafruit_GPIO.I2C as I2C
-            #i2c = I2C
+        self._power_mode = power_mode
         self._device = get_i2c_device(address, **kwargs)
         # Load calibration values.
         self._load_calibration()
-        self._device.write8(BME280_REGISTER_CONTROL, 0x3F)
+        # Worst case measurement time (datasheet 9.1) with the same oversampling for all three
+        oversampling = 1 << (mode - 1)
+        self._measure_time = (1.25 + 2.3 * oversampling + 2 * (2.3 * oversampling + 0.575)) / 1000.0
+        self._ctrl_meas = mode << 5 | mode << 2
+        # ctrl_hum only takes effect with the next ctrl_meas write; config only in sleep mode
+        self._device.write8(BME280_REGISTER_CONTROL_HUM, mode)
+        self._device.write8(BME280_REGISTER_CONTROL, self._ctrl_meas | BME280_MODE_SLEEP)
+        if power_mode == BME280_MODE_NORMAL:
+            self._device.write8(BME280_REGISTER_CONFIG, BME280_STANDBY_1000MS << 5)
+            self._device.write8(BME280_REGISTER_CONTROL, self._ctrl_meas | BME280_MODE_NORMAL)
+            time.sleep(self._measure_time)
+        self._raw = None
         self.t_fine = 0.0
 
     def _load_calibration(self):
-
-        self.dig_T1 = self._device.readU16LE(BME280_REGISTER_DIG_T1)
-        self.dig_T2 = self._device.readS16LE(BME280_REGISTER_DIG_T2)
-        self.dig_T3 = self._device.readS16LE(BME280_REGISTER_DIG_T3)
-
-        self.dig_P1 = self._device.readU16LE(BME280_REGISTER_DIG_P1)
-        self.dig_P2 = self._device.readS16LE(BME280_REGISTER_DIG_P2)
-        self.dig_P3 = self._device.readS16LE(BME280_REGISTER_DIG_P3)
-        self.dig_P4 = self._device.readS16LE(BME280_REGISTER_DIG_P4)
-        self.dig_P5 = self._device.readS16LE(BME280_REGISTER_DIG_P5)
-        self.dig_P6 = self._device.readS16LE(BME280_REGISTER_DIG_P6)
-        self.dig_P7 = self._device.readS16LE(BME280_REGISTER_DIG_P7)
-        self.dig_P8 = self._device.readS16LE(BME280_REGISTER_DIG_P8)
-        self.dig_P9 = self._device.readS16LE(BME280_REGISTER_DIG_P9)
-
-        self.dig_H1 = self._device.readU8(BME280_REGISTER_DIG_H1)
-        self.dig_H2 = self._device.readS16LE(BME280_REGISTER_DIG_H2)
-        self.dig_H3 = self._device.readU8(BME280_REGISTER_DIG_H3)
-        self.dig_H6 = self._device.readS8(BME280_REGISTER_DIG_H7)
-
-        h4 = self._device.readS8(BME280_REGISTER_DIG_H4)
-        h4 = (h4 << 24) >> 20
-        self.dig_H4 = h4 | (self._device.readU8(BME280_REGISTER_DIG_H5) & 0x0F)
-
-        h5 = self._device.readS8(BME280_REGISTER_DIG_H6)
-        h5 = (h5 << 24) >> 20
-        self.dig_H5 = h5 | (
-        self._device.readU8(BME280_REGISTER_DIG_H5) >> 4 & 0x0F)
-
-        '''
-        print '0xE4 = {0:2x}'.format (self._device.readU8 (BME280_REGISTER_DIG_H4))
-        print '0xE5 = {0:2x}'.format (self._device.readU8 (BME280_REGISTER_DIG_H5))
-        print '0xE6 = {0:2x}'.format (self._device.readU8 (BME280_REGISTER_DIG_H6))
-
-        print 'dig_H1 = {0:d}'.format (self.dig_H1)
-        print 'dig_H2 = {0:d}'.format (self.dig_H2)
-        print 'dig_H3 = {0:d}'.format (self.dig_H3)
-        print 'dig_H4 = {0:d}'.format (self.dig_H4)
-        print 'dig_H5 = {0:d}'.format (self.dig_H5)
-        print 'dig_H6 = {0:d}'.format (self.dig_H6)
-        '''
+        """Read the trimming parameters with two block reads, or take them from the process cache"""
+        key = (self._device._busnum, self._device._address)
+        cal = _calibration.get(key)
+        if cal is None:
+            # 0x88-0xA1: T1-T3, P1-P9, (0xA0 unused), H1; 0xE1-0xE7: H2-H6
+            block = bytes(self._device.readList(BME280_REGISTER_DIG_T1, 26))
+            hum = bytes(self._device.readList(BME280_REGISTER_DIG_H2, 7))
+            cal = list(struct.unpack_from('<HhhHhhhhhhhh', block))
+            h4 = struct.unpack_from('b', hum, 3)[0]
+            h5 = struct.unpack_from('b', hum, 5)[0]
+            cal += [block[25],
+                    struct.unpack_from('<h', hum)[0],
+                    hum[2],
+                    (h4 << 4) | (hum[4] & 0x0F),
+                    (h5 << 4) | (hum[4] >> 4 & 0x0F),
+                    struct.unpack_from('b', hum, 6)[0]]
+            _calibration[key] = cal
+        (self.dig_T1, self.dig_T2, self.dig_T3,
+         self.dig_P1, self.dig_P2, self.dig_P3, self.dig_P4, self.dig_P5,
+         self.dig_P6, self.dig_P7, self.dig_P8, self.dig_P9,
+         self.dig_H1, self.dig_H2, self.dig_H3, self.dig_H4, self.dig_H5, self.dig_H6) = cal
+
+    def read_raw(self):
+        """Take a sample: in forced mode trigger one measurement and wait for
+        it, then read all data registers (0xF7-0xFE) in one block transfer.
+        Returns the raw (temperature, pressure, humidity)."""
+        if self._power_mode == BME280_MODE_FORCED:
+            self._device.write8(BME280_REGISTER_CONTROL, self._ctrl_meas | BME280_MODE_FORCED)
+            time.sleep(self._measure_time)  # Wait the required time
+        data = self._device.readList(BME280_REGISTER_PRESSURE_DATA, 8)
+        pressure = (data[0] << 12) | (data[1] << 4) | (data[2] >> 4)
+        temp = (data[3] << 12) | (data[4] << 4) | (data[5] >> 4)
+        humidity = (data[6] << 8) | data[7]
+        self._raw = (temp, pressure, humidity)
+        return self._raw
 
     def read_raw_temp(self):
         """Reads the raw (uncompensated) temperature from the sensor."""
-        meas = self._mode
-        self._device.write8(BME280_REGISTER_CONTROL_HUM, meas)
-        meas = self._mode << 5 | self._mode << 2 | 1
-        self._device.write8(BME280_REGISTER_CONTROL, meas)
-        sleep_time = 0.00125 + 0.0023 * (1 << self._mode)
-        sleep_time = sleep_time + 0.0023 * (1 << self._mode) + 0.000575
-        sleep_time = sleep_time + 0.0023 * (1 << self._mode) + 0.000575
-        time.sleep(sleep_time)  # Wait the required time
-        msb = self._device.readU8(BME280_REGISTER_TEMP_DATA)
-        lsb = self._device.readU8(BME280_REGISTER_TEMP_DATA + 1)
-        xlsb = self._device.readU8(BME280_REGISTER_TEMP_DATA + 2)
-        raw = ((msb << 16) | (lsb << 8) | xlsb) >> 4
-        return raw
+        return self.read_raw()[0]
 
     def read_raw_pressure(self):
         """Reads the raw (uncompensated) pressure level from the sensor."""
         """Assumes that the temperature has already been read """
         """i.e. that enough delay has been provided"""
-        msb = self._device.readU8(BME280_REGISTER_PRESSURE_DATA)
-        lsb = self._device.readU8(BME280_REGISTER_PRESSURE_DATA + 1)
-        xlsb = self._device.readU8(BME280_REGISTER_PRESSURE_DATA + 2)
-        raw = ((msb << 16) | (lsb << 8) | xlsb) >> 4
-        return raw
+        return (self._raw or self.read_raw())[1]
 
     def read_raw_humidity(self):
         """Assumes that the temperature has already been read """
         """i.e. that enough delay has been provided"""
-        msb = self._device.readU8(BME280_REGISTER_HUMIDITY_DATA)
-        lsb = self._device.readU8(BME280_REGISTER_HUMIDITY_DATA + 1)
-        raw = (msb << 8) | lsb
-        return raw
+        return (self._raw or self.read_raw())[2]
 
-    def read_temperature(self):
-        """Gets the compensated temperature in degrees celsius."""
-        # float in Python is double precision
-        UT = float(self.read_raw_temp())
+    def _compensate_temperature(self, adc):
+        UT = float(adc)
         var1 = (UT / 16384.0 - self.dig_T1 / 1024.0) * float(self.dig_T2)
         var2 = ((UT / 131072.0 - self.dig_T1 / 8192.0) * (
         UT / 131072.0 - self.dig_T1 / 8192.0)) * float(self.dig_T3)
@@ -429,9 +335,7 @@ class BME280(object):
         temp = (var1 + var2) / 5120.0
         return temp
 
-    def read_pressure(self):
-        """Gets the compensated pressure in Pascals."""
-        adc = self.read_raw_pressure()
+    def _compensate_pressure(self, adc):
         var1 = self.t_fine / 2.0 - 64000.0
         var2 = var1 * var1 * self.dig_P6 / 32768.0
         var2 = var2 + var1 * self.dig_P5 * 2.0
@@ -448,9 +352,7 @@ class BME280(object):
         p = p + (var1 + var2 + self.dig_P7) / 16.0
         return p
 
-    def read_humidity(self):
-        adc = self.read_raw_humidity()
-        # print 'Raw humidity = {0:d}'.format (adc)
+    def _compensate_humidity(self, adc):
         h = self.t_fine - 76800.0
         h = (adc - (self.dig_H4 * 64.0 + self.dig_H5 / 16384.8 * h)) * (
         self.dig_H2 / 65536.0 * (1.0 + self.dig_H6 / 67108864.0 * h * (
@@ -462,49 +364,71 @@ class BME280(object):
             h = 0
         return h
 
+    def read_all(self):
+        """Take one sample and return (degrees C, pascals, % relative humidity)."""
+        temp, pressure, humidity = self.read_raw()
+        degrees = self._compensate_temperature(temp)
+        return degrees, self._compensate_pressure(pressure), self._compensate_humidity(humidity)
+
+    def read_temperature(self):
+        """Gets the compensated temperature in degrees celsius."""
+        return self._compensate_temperature(self.read_raw_temp())
+
+    def read_pressure(self):
+        """Gets the compensated pressure in Pascals."""
+        return self._compensate_pressure(self.read_raw_pressure())
+
+    def read_humidity(self):
+        return self._compensate_humidity(self.read_raw_humidity())
+
 
-def bme280(config_dict):
-    try:
-        if sys.argv[2]:
-            addr = int('0x'+sys.argv[2], 16)
-    except:
-        addr = 0x76
+class BME280Driver(Driver):
+    """BME280 with cached calibration and one block read per sample"""
 
-    try:
-        sensor = BME280(mode=BME280_OSAMPLE_8, address=addr)
+    def open(self, config):
+        # i2c_address may be given as "0x76" or as a number
+        self.addr = int(str(config.get('i2c_address', BME280_I2CADDR)), 0)
+        oversampling = int(config.get('oversampling', 8))
+        if oversampling not in BME280_OSAMPLE:
+            raise ValueError(f"bme280: oversampling must be one of {', '.join(map(str, BME280_OSAMPLE))}")
+        power_mode = BME280_MODE_NORMAL if config.get('mode') == 'normal' else BME280_MODE_FORCED
+        self.sensor = BME280(mode=BME280_OSAMPLE[oversampling], address=self.addr, power_mode=power_mode,
+                             busnum=_i2c.pool.resolve_bus(config), bus=_i2c.smbus_for(config))
 
-        degrees = sensor.read_temperature()
-        pascals = sensor.read_pressure()
+    def read(self):
+        degrees, pascals, humidity = self.sensor.read_all()
         hectopascals = pascals / 100
-        humidity = sensor.read_humidity()
 
-        temp = '{0:0.2f}'.format(degrees)
-        press = '{0:0.2f}'.format(hectopascals)
-        humid = '{0:0.2f}'.format(humidity)
+        temp = round(degrees, 2)
+        press = round(hectopascals, 2)
+        humid = round(humidity, 2)
 
-        
+        addr = '{0:02x}'.format(self.addr)
         data = []
 
-        rom = "_i2c_76_temp"
+        rom = "_i2c_" + addr + "_temp"
         value = temp
         name = 'bme280_temp'
         type = 'temp'
-        data.append({"rom":rom,"type":type, "value":value,"name":name})
+        data.append(Reading(rom, type, value, name))
 
-        rom = "_i2c_76_press"
+        rom = "_i2c_" + addr + "_press"
         value = press
         name = 'bme280_press'
         type = 'press'
-        data.append({"rom":rom,"type":type, "value":value,"name":name})
+        data.append(Reading(rom, type, value, name))
 
-        rom = "i2c_76_humid"
+        rom = "i2c_" + addr + "_humid"
         value = humid
         name = 'bme280_humid'
         type = 'humid'
-        data.append({"rom":rom,"type":type, "value":value,"name":name})
+        data.append(Reading(rom, type, value, name))
 
         return data
 
-    except: 
-        print("No BME280")
+    def close(self):
+        # The bus handle belongs to the pool
+        pass
+
 
+bme280 = BME280Driver
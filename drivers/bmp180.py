@@ -25,7 +25,10 @@
 #logging.basicConfig(level=logging.DEBUG)
 
 import Adafruit_BMP.BMP085 as BMP085
-import socket, sys, os
+import socket
+
+from drivers import _i2c
+from reading import Reading
 
 # Default constructor will pick a default I2C bus.
 #
@@ -36,16 +39,7 @@ import socket, sys, os
 # For the Beaglebone Black the library will assume bus 1 by default, which is
 # exposed with SCL = P9_19 and SDA = P9_20.
 def bmp180(config_dict):
-    if len(sys.argv) > 1:
-        nbus = sys.argv[1]
-    elif  os.path.exists("/dev/i2c-0"):
-        nbus = "0"
-    elif os.path.exists("/dev/i2c-1"):
-        nbus = "1"
-    elif os.path.exists("/dev/i2c-2"):
-        nbus = "2"
-    elif os.path.exists("/dev/i2c-3"):
-        nbus = "3"
+    nbus = _i2c.pool.resolve_bus(config_dict)
 
     #sensor = BMP085.BMP085(busnum=int(nbus))
 
@@ -64,21 +58,22 @@ def bmp180(config_dict):
     #print '{0:0.2f}'.format(sensor.read_sealevel_pressure())
 
     try:
-        sensor = BMP085.BMP085(busnum=int(nbus))
+        # Talk over the pooled bus handle instead of opening the bus on every read
+        sensor = BMP085.BMP085(busnum=nbus, i2c=_i2c.PooledI2C(_i2c.smbus_for(config_dict), nbus))
         
         data = []
 
         rom = "_i2c_77_temp"
-        value = '{0:0.2f}'.format(sensor.read_temperature())
+        value = round(sensor.read_temperature(), 2)
         name = 'bmp180_temp'
         type = 'temp'
-        data.append({"rom":rom,"type":type, "value":value,"name":name})
+        data.append(Reading(rom, type, value, name))
 
         rom = "_i2c_77_press"
-        value = '{0:0.2f}'.format(sensor.read_pressure()*0.01)
+        value = round(sensor.read_pressure()*0.01, 2)
         name = 'bmp180_press'
         type = 'press'
-        data.append({"rom":rom,"type":type, "value":value,"name":name})
+        data.append(Reading(rom, type, value, name))
 
         return data
     except:
@@ -1,36 +1,10 @@
-import time, socket
-import board
-import adafruit_dht
+from drivers._dht import DHTDriver
 
 
-def dht11(config_dict):
-  try:
-    pin = str(config_dict.get("gpio_pin"))
-    pin = "D"+pin
-    print(pin)
-    dht_device = adafruit_dht.DHT11(getattr(board,pin))
-    temperature = dht_device.temperature
-    humidity = dht_device.humidity
-    dht_device.exit()
-    print(temperature)
-    print(humidity)
-    
-    data = []
+class DHT11Driver(DHTDriver):
+  """DHT11 kept open between reads, sampled within a retry budget (see drivers/_dht.py)"""
 
-    if humidity is not None and temperature is not None:
-      value = '{0:0.1f}'.format(temperature)
-      rom = '_dht11_temp_gpio_'+pin
-      type = 'temp'
-      name = rom
-      data.append({"rom":rom,"type":type, "value":value,"name":name})
-    
-      value = '{0:0.1f}'.format(humidity)
-      rom = '_dht11_humid_gpio_'+pin
-      type = 'humid'
-      name = rom
-      data.append({"rom":rom,"type":type, "value":value,"name":name})
+  model = 'DHT11'
 
-    return data
 
-  except:
-    print("No DHT11")
\ No newline at end of file
+dht11 = DHT11Driver
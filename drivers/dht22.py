@@ -1,36 +1,10 @@
-import time, socket
-import board
-import adafruit_dht
+from drivers._dht import DHTDriver
 
 
-def dht22(config_dict):
-  try:
-    pin = str(config_dict.get("gpio_pin"))
-    pin = "D"+pin
-    print(pin)
-    dht_device = adafruit_dht.DHT22(getattr(board,pin))
-    temperature = dht_device.temperature
-    humidity = dht_device.humidity
-    dht_device.exit()
-    print(temperature)
-    print(humidity)
-    
-    data = []
+class DHT22Driver(DHTDriver):
+  """DHT22 kept open between reads, sampled within a retry budget (see drivers/_dht.py)"""
 
-    if humidity is not None and temperature is not None:
-      value = '{0:0.1f}'.format(temperature)
-      rom = '_dht22_temp_gpio_'+pin
-      type = 'temp'
-      name = rom
-      data.append({"rom":rom,"type":type, "value":value,"name":name})
-    
-      value = '{0:0.1f}'.format(humidity)
-      rom = '_dht22_humid_gpio_'+pin
-      type = 'humid'
-      name = rom
-      data.append({"rom":rom,"type":type, "value":value,"name":name})
+  model = 'DHT22'
 
-    return data
 
-  except:
-    print("No DHT22")
\ No newline at end of file
+dht22 = DHT22Driver
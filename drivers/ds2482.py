@@ -1,84 +1,168 @@
 """
 DS2482 - 1-Wire to I2C Bridge Driver
 Initializes DS2482 hardware for use with w1_kernel driver
+
+Bring-up touches only what is missing: kernel modules are loaded only if they
+aren't already, bridges already registered on the I2C bus are skipped, and the
+sysfs nodes are written directly (through `sudo -n tee` only if the client
+isn't allowed to). Instead of fixed sleeps it polls until the new
+w1_bus_master entries appear, up to `init_timeout_sec`, so startup takes as
+long as the hardware needs.
 """
-import subprocess
 import os
+import subprocess
 import time
 import logging
 
+from drivers import _paths
+from drivers import _w1
+
+DEFAULT_ADDRESSES = ['0x18', '0x19', '0x1a', '0x1b']
+MODULES = ['ds2482', 'w1_therm']
+
+# Longest wait for the 1-Wire bus masters of newly registered bridges
+INIT_TIMEOUT_SEC = 10
+POLL_SEC = 0.05
+
+
 def find_i2c_bus():
     """Find the first available I2C bus"""
     for i in range(6):
-        if os.path.exists(f'/dev/i2c-{i}'):
+        if os.path.exists(os.path.join(_paths.DEV_ROOT, f'i2c-{i}')):
             return f"i2c-{i}"
     return None
 
+
+def _module_loaded(module):
+    return os.path.isdir(os.path.join(_paths.SYSFS_ROOT, 'module', module))
+
+
 def load_kernel_modules():
-    """Load necessary kernel modules for DS2482"""
-    try:
-        subprocess.run(['sudo', 'modprobe', 'ds2482'], check=True)
-        subprocess.run(['sudo', 'modprobe', 'w1-therm'], check=True)
-        logging.info("Loaded ds2482 and w1-therm kernel modules")
-    except subprocess.CalledProcessError as e:
-        logging.error(f"Failed to load kernel modules: {e}")
-        raise
+    """Load the kernel modules DS2482 needs, skipping those already loaded"""
+    for module in MODULES:
+        if _module_loaded(module):
+            continue
+        cmd = ['modprobe', module] if os.geteuid() == 0 else ['sudo', '-n', 'modprobe', module]
+        try:
+            subprocess.run(cmd, check=True, capture_output=True)
+            logging.info(f"Loaded kernel module {module}")
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.error(f"Failed to load kernel module {module}: {e}")
+            raise
+
 
 def write_to_sysfs(device_path, content):
-    """Write to /sys filesystem"""
-    cmd = f'echo {content} | sudo tee {device_path}'
+    """Write to /sys, through `sudo -n tee` only if a direct write isn't permitted"""
+    try:
+        with open(device_path, 'w') as f:
+            f.write(content)
+        return
+    except PermissionError:
+        pass
     try:
-        subprocess.run(cmd, shell=True, check=True, capture_output=True)
-    except subprocess.CalledProcessError as e:
+        subprocess.run(['sudo', '-n', 'tee', device_path], input=content.encode(), check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    except (OSError, subprocess.CalledProcessError) as e:
         logging.error(f"Failed to write to {device_path}: {e}")
         raise
 
+
+def _client_dir(bus_number, address):
+    """sysfs directory of an I2C client, e.g. /sys/bus/i2c/devices/1-0018"""
+    return os.path.join(_paths.SYSFS_ROOT, 'bus', 'i2c', 'devices', f'{bus_number}-{address:04x}')
+
+
+def _wait_for_masters(count, deadline):
+    """Poll until at least `count` 1-Wire bus masters exist or the deadline passes"""
+    while True:
+        masters = _w1.bus_masters()
+        if len(masters) >= count or time.monotonic() >= deadline:
+            return masters
+        time.sleep(POLL_SEC)
+
+
 def ds2482_init(config_dict=None):
     """
     Initialize DS2482 I2C to 1-Wire bridge
     This function is called once at startup if ds2482 is enabled
 
     Args:
-        config_dict: Optional configuration dictionary
+        config_dict: Optional configuration dictionary: `addresses` (default
+            0x18-0x1b, or the probed `i2c_address`), `i2c_bus` and
+            `init_timeout_sec`
 
     Returns:
         True if initialization successful, False otherwise
     """
+    config_dict = config_dict or {}
     logging.info("Initializing DS2482 1-Wire bridge...")
 
     # Find I2C bus
-    i2c_bus = find_i2c_bus()
+    if config_dict.get('i2c_bus') is not None:
+        i2c_bus = f"i2c-{int(config_dict['i2c_bus'])}"
+    else:
+        i2c_bus = find_i2c_bus()
     if not i2c_bus:
         logging.error("No I2C bus found (/dev/i2c-* not available)")
         return False
+    bus_number = int(i2c_bus.split('-')[1])
 
     logging.info(f"Found I2C bus: {i2c_bus}")
 
     try:
         # Load kernel modules
         load_kernel_modules()
-        time.sleep(3)  # Give time for modules to load
 
         # Get I2C addresses from config or use defaults
-        addresses = config_dict.get('addresses', ['0x18', '0x19', '0x1a', '0x1b']) if config_dict else ['0x18', '0x19', '0x1a', '0x1b']
-
+        addresses = config_dict.get('addresses')
+        if not addresses:
+            probed = config_dict.get('i2c_address')
+            addresses = [probed] if probed is not None else DEFAULT_ADDRESSES
+        addresses = [int(str(a), 0) for a in addresses]
+
+        start = time.monotonic()
+        before = set(_w1.bus_masters())
+        registered = 0
+        new_device = os.path.join(_paths.SYSFS_ROOT, 'bus', 'i2c', 'devices', i2c_bus, 'new_device')
         # Register DS2482 devices on I2C bus
         for address in addresses:
+            client = _client_dir(bus_number, address)
+            if os.path.exists(client):
+                logging.info(f"DS2482 at 0x{address:02x} already registered")
+                continue
             try:
-                write_to_sysfs(f'/sys/bus/i2c/devices/{i2c_bus}/new_device', f'ds2482 {address}')
-                logging.info(f"Registered DS2482 device at {address}")
-                time.sleep(3)
+                write_to_sysfs(new_device, f'ds2482 0x{address:02x}')
             except Exception as e:
-                logging.warning(f"Failed to register DS2482 at {address}: {e}")
-
-        # Disable pullup on w1 bus master
-        try:
-            write_to_sysfs('/sys/bus/w1/devices/w1_bus_master1/w1_master_pullup', '0')
-            logging.info("Disabled w1_master_pullup")
-        except Exception as e:
-            logging.warning(f"Failed to set w1_master_pullup: {e}")
+                logging.warning(f"Failed to register DS2482 at 0x{address:02x}: {e}")
+                continue
+            # The kernel probes the chip while registering it; no driver link means no chip there
+            if os.path.exists(os.path.join(client, 'driver')):
+                logging.info(f"Registered DS2482 device at 0x{address:02x}")
+                registered += 1
+            else:
+                logging.info(f"No DS2482 answered at 0x{address:02x}, unregistering")
+                try:
+                    write_to_sysfs(os.path.join(os.path.dirname(new_device), 'delete_device'), f'0x{address:02x}')
+                except Exception:
+                    pass
+
+        deadline = start + float(config_dict.get('init_timeout_sec', INIT_TIMEOUT_SEC))
+        masters = _wait_for_masters(len(before) + registered, deadline)
+        new_masters = sorted(set(masters) - before)
+        if len(new_masters) < registered:
+            logging.warning(f"Only {len(new_masters)} of {registered} DS2482 bus masters appeared "
+                            f"within {deadline - start:.0f}s")
+        _w1.invalidate()
+
+        # Disable pullup on the new w1 bus masters
+        for master in new_masters:
+            try:
+                write_to_sysfs(os.path.join(master, 'w1_master_pullup'), '0')
+                logging.info(f"Disabled w1_master_pullup on {os.path.basename(master)}")
+            except Exception as e:
+                logging.warning(f"Failed to set w1_master_pullup: {e}")
 
-        logging.info("DS2482 initialization complete")
+        logging.info(f"DS2482 initialization complete in {time.monotonic() - start:.2f}s")
         return True
 
     except Exception as e:
@@ -95,4 +179,4 @@ def ds2482(config_dict=None):
     """
     _ = config_dict  # Unused but required for driver interface
     logging.info("DS2482 driver called - this driver only initializes hardware, use w1_kernel to read sensors")
-    return []
\ No newline at end of file
+    return []
@@ -1,15 +1,16 @@
-import smbus
-import os.path
-import sys, socket
+import socket
 from datetime import datetime
 
+from drivers import _i2c
+from reading import Reading
+
 
 __all__ = ['HIH6130']
 
 
 class HIH6130:
 	''' HIH6130() returns an instance of the RHT sensor with default address of 0x27. '''
-	def __init__(self, address = 0x27):
+	def __init__(self, address = 0x27, bus = None, busnum = None):
 		self.address = address
 		self.status = None
 		self.rh = None
@@ -17,23 +18,13 @@ class HIH6130:
 		self._buffer = None
 		self.timestamp = None
 
-		if len(sys.argv) > 1:
-			nbus = sys.argv[1]
-		elif  os.path.exists("/dev/i2c-0"):
-			nbus = "0"
-		elif os.path.exists("/dev/i2c-1"):
-			nbus = "1"
-		elif os.path.exists("/dev/i2c-2"):
-			nbus = "2"
-		elif os.path.exists("/dev/i2c-3"):
-			nbus = "3"
-
-		try:
-			self.i2c = smbus.SMBus(int(nbus))
-		except:
-			raise IOError("Could not find i2c device.")
-
-		return
+		if bus is None:
+			# Pooled handle of the given (or first present) bus
+			try:
+				bus = _i2c.pool.get_smbus(_i2c.pool.resolve_bus({'i2c_bus': busnum}))
+			except:
+				raise IOError("Could not find i2c device.")
+		self.i2c = bus
 
 	def read(self):
 		''' updates rh, t, and timestamp for the HIH6130 instance '''
@@ -51,22 +42,22 @@ class HIH6130:
 
 def hih6130(config_dict):
 	try:
-		rht = HIH6130()
+		rht = HIH6130(bus=_i2c.smbus_for(config_dict))
 		rht.read()
 		#print ("{0}\n{1}".format(rht.rh, rht.t))
 		data = []
 
 		rom = "_i2c_27_temp"
-		value = '{0:0.2f}'.format(rht.t)
+		value = round(rht.t, 2)
 		name = 'hih6130_temp'
 		type = 'temp'
-		data.append({"rom":rom,"type":type, "value":value,"name":name})
+		data.append(Reading(rom, type, value, name))
 	
 		rom = "_i2c_27_humid"
-		value = '{0:0.2f}'.format(rht.rh)
+		value = round(rht.rh, 2)
 		name = 'hih6130_humid'
 		type = 'humid'
-		data.append({"rom":rom,"type":type, "value":value,"name":name})
+		data.append(Reading(rom, type, value, name))
 	   
 		return data
 	
@@ -1,28 +1,29 @@
 import time
-import board
-import busio
 from adafruit_htu21d import HTU21D
 import sys, os, socket
 
+from drivers import _i2c
+from reading import Reading
+
 def htu21d(config_dict):
   try:
     # Create library object using our Bus I2C port
-    i2c = busio.I2C(board.SCL, board.SDA)
+    i2c = _i2c.busio_for(config_dict)
     
     data = []
 
     sensor = HTU21D(i2c)
     rom = "_i2c_40_temp"
-    value = '{0:0.2f}'.format(sensor.temperature)
+    value = round(sensor.temperature, 2)
     name = 'htu21d_temp'
     type = 'temp'
-    data.append({"rom":rom,"type":type, "value":value,"name":name})
+    data.append(Reading(rom, type, value, name))
 
     rom = "_i2c_40_humid"
-    value = '{0:0.2f}'.format(sensor.relative_humidity)
+    value = round(sensor.relative_humidity, 2)
     name = 'htu21d_humid'
     type = 'humid'
-    data.append({"rom":rom,"type":type, "value":value,"name":name})
+    data.append(Reading(rom, type, value, name))
 
     return data
   except:
@@ -1,28 +1,155 @@
+"""
+Hardware monitoring chips (lm-sensors) read straight from hwmon sysfs
 
-import subprocess, json, socket
+open() walks /sys/class/hwmon/hwmon*, resolves each chip's lm-sensors name
+(e.g. coretemp-isa-0000) and each channel's label once, and keeps the
+*_input files open; read() is then one pread() per channel, with no fork/exec
+and no JSON. If no hwmon channels are found it falls back to `sensors -j`.
 
-def lm_sensors(config_dict):
-  try:
-    output = subprocess.check_output("/usr/bin/sensors -j", shell=True)
-    output = output.decode("utf-8")
-    lmdata = json.loads(output)
-    
-    data = []
-    for item in lmdata:
-        for name in lmdata[item]:
-            for sens in lmdata[item][name]:
-                if name != "Adapter" and sens == "temp1_input":
-                    print(item, name, lmdata[item][name][sens])
-                    value = '{0:0.1f}'.format(lmdata[item][name][sens])
-                    rom = '_'+item+'_'+name
-                    type = 'temp'
-                    name = item+'_'+name
-                    data.append({"rom":rom,"type":type, "value":value,"name":name})
+Readings keep the names `sensors -j` produced: rom `_<chip>_<label>`, where
+the label is the channel's label file or the channel name (temp1).
 
-    return data
+Config options:
+    - channels: (default [temp, fan, in, power]) channel types to report
+    - source: (default auto) auto, sysfs or sensors
+"""
+import glob
+import json
+import logging
+import os
+import re
+import subprocess
 
-  except:
-     print("NO LM-SENSORS")
+from drivers import _paths
+from drivers._base import Driver
+from reading import Reading
 
+# hwmon channel prefix -> (reading type, divisor from the sysfs unit)
+CHANNEL_TYPES = {
+    'temp': ('temp', 1000.0),   # millidegree C
+    'fan': ('fan', 1.0),        # RPM
+    'in': ('volt', 1000.0),     # mV
+    'power': ('watt', 1e6),     # uW
+}
 
+_CHANNEL = re.compile(r'^(temp|fan|in|power)(\d+)_input$')
 
+
+def chip_name(hwmon_path, name):
+    """Return the chip name the way libsensors prints it, e.g. coretemp-isa-0000"""
+    device = os.path.join(hwmon_path, 'device')
+    if not os.path.exists(device):
+        return f'{name}-virtual-0'
+    dev_name = os.path.basename(os.path.realpath(device))
+    subsystem = os.path.basename(os.path.realpath(os.path.join(device, 'subsystem')))
+    try:
+        if subsystem == 'i2c':
+            bus, addr = dev_name.split('-')
+            return f'{name}-i2c-{int(bus)}-{int(addr, 16):02x}'
+        if subsystem == 'pci':
+            domain, bus, slot_fn = dev_name.split(':')
+            slot, fn = slot_fn.split('.')
+            addr = (int(domain, 16) << 16) + (int(bus, 16) << 8) + (int(slot, 16) << 3) + int(fn, 16)
+            return f'{name}-pci-{addr:04x}'
+        if subsystem == 'platform':
+            suffix = dev_name.rsplit('.', 1)
+            addr = int(suffix[1]) if len(suffix) == 2 and suffix[1].isdigit() else 0
+            return f'{name}-isa-{addr:04x}'
+        if subsystem == 'acpi':
+            return f'{name}-acpi-0'
+    except ValueError:
+        pass
+    return f'{name}-virtual-0'
+
+
+def _read_text(path):
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class LMSensorsDriver(Driver):
+    """hwmon channels opened once and read with pread()"""
+
+    def open(self, config):
+        super().open(config)
+        self.kinds = set(config.get('channels') or CHANNEL_TYPES)
+        self.channels = []
+        source = config.get('source', 'auto')
+        if source in ('auto', 'sysfs'):
+            self._open_sysfs()
+        self.use_sensors = not self.channels and source in ('auto', 'sensors')
+        if self.use_sensors:
+            logging.info("lm_sensors: no hwmon channels in sysfs, using `sensors -j`")
+
+    def _open_sysfs(self):
+        for path in sorted(glob.glob(os.path.join(_paths.HWMON_DIR, 'hwmon*')),
+                           key=lambda p: int(re.sub(r'\D', '', os.path.basename(p)) or 0)):
+            # Older drivers put the attributes in the device directory
+            attrs = path if os.path.exists(os.path.join(path, 'name')) else os.path.join(path, 'device')
+            name = _read_text(os.path.join(attrs, 'name'))
+            if not name:
+                continue
+            chip = chip_name(path, name)
+            inputs = []
+            for entry in os.listdir(attrs):
+                m = _CHANNEL.match(entry)
+                if m and m.group(1) in self.kinds:
+                    inputs.append((m.group(1), int(m.group(2)), entry))
+            for kind, index, entry in sorted(inputs):
+                label = _read_text(os.path.join(attrs, f'{kind}{index}_label')) or f'{kind}{index}'
+                try:
+                    fd = os.open(os.path.join(attrs, entry), os.O_RDONLY)
+                except OSError as e:
+                    logging.warning(f"lm_sensors: cannot open {attrs}/{entry}: {e}")
+                    continue
+                type_, divisor = CHANNEL_TYPES[kind]
+                self.channels.append((fd, '_' + chip + '_' + label, type_, chip + '_' + label, divisor))
+
+    def read(self):
+        if self.use_sensors:
+            return self._read_sensors()
+        data = []
+        for fd, rom, type_, name, divisor in self.channels:
+            try:
+                raw = os.pread(fd, 32, 0)
+                value = int(raw) / divisor
+            except (OSError, ValueError):
+                # e.g. ENODATA for a fan or probe that isn't connected
+                continue
+            data.append(Reading(rom, type_, round(value, 3 if type_ == 'volt' else 1), name))
+        return data
+
+    def _read_sensors(self):
+        try:
+            output = subprocess.check_output([_paths.SENSORS_BIN, '-j'])
+            lmdata = json.loads(output.decode("utf-8"))
+        except (OSError, subprocess.CalledProcessError, ValueError):
+            print("NO LM-SENSORS")
+            return []
+
+        data = []
+        for item in lmdata:
+            for name in lmdata[item]:
+                if name == "Adapter":
+                    continue
+                for sens, value in lmdata[item][name].items():
+                    m = _CHANNEL.match(sens)
+                    if not m or m.group(1) not in self.kinds:
+                        continue
+                    type_ = CHANNEL_TYPES[m.group(1)][0]
+                    data.append(Reading('_' + item + '_' + name, type_, round(value, 3 if type_ == 'volt' else 1), item + '_' + name))
+        return data
+
+    def close(self):
+        for channel in self.channels:
+            try:
+                os.close(channel[0])
+            except OSError:
+                pass
+        self.channels = []
+
+
+lm_sensors = LMSensorsDriver
@@ -4,14 +4,16 @@
 # This code is designed to work with the MPL3115A2_I2CS I2C Mini Module available from ControlEverything.com.
 # https://www.controleverything.com/products
 
-import smbus
 import time, socket
 
+from drivers import _i2c
+from reading import Reading
+
 
 def mpl3115a2(config_dict):
   try:
-    # Get I2C bus
-    bus = smbus.SMBus(1)
+    # Get I2C bus (shared handle from the driver loader, else from the process-wide bus pool)
+    bus = _i2c.smbus_for(config_dict)
 
     # MPL3115A2 address, 0x60(96)
     # Select control register, 0x26(38)
@@ -62,9 +64,9 @@ def mpl3115a2(config_dict):
     #print ("Temperature in Celsius  : %.2f C" %cTemp)
     #print ("Temperature in Fahrenheit  : %.2f F" %fTemp)
 
-    press = '{0:0.2f}'.format(pressure)
-    alti = '{0:0.2f}'.format(altitude)
-    temp = '{0:0.2f}'.format(cTemp)
+    press = round(pressure, 2)
+    alti = round(altitude, 2)
+    temp = round(cTemp, 2)
 
     
     data = []
@@ -73,19 +75,19 @@ def mpl3115a2(config_dict):
     value = temp
     name = 'mpl3115a2_temp'
     type = 'temp'
-    data.append({"rom":rom,"type":type, "value":value,"name":name})
+    data.append(Reading(rom, type, value, name))
 
     rom = "_i2c_60_alti"
     value = alti
     name = 'mpl3115a2_alti'
     type = 'alti'
-    data.append({"rom":rom,"type":type, "value":value,"name":name})
+    data.append(Reading(rom, type, value, name))
 
     rom = "_i2c_60_press"
     value = press
     name = 'mpl3115a2_press'
     type = 'press'
-    data.append({"rom":rom,"type":type, "value":value,"name":name})
+    data.append(Reading(rom, type, value, name))
 
     return data
   except: 
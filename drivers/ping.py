@@ -1,70 +1,326 @@
+"""
+Network probes: ICMP ping of hosts and HTTP(S) checks of URLs
+
+Probes run on an asyncio loop in a background thread that open() starts and
+close() stops, so nothing is set up again between reads. Each target is probed
+once per interval at a fixed phase derived from its name: hundreds of targets
+spread over the interval instead of firing together, and a target is always
+probed at the same point of the cycle. read() returns the latest result of
+every target.
+
+Hosts are pinged over one unprivileged ICMP datagram socket per address family
+where the kernel allows it (net.ipv4.ping_group_range), otherwise by running the
+system `ping`. URLs are fetched through a pooled requests.Session on a small
+thread pool. At most `concurrency` probes run at a time.
+
+Config options:
+    - hosts: list of host names, addresses and http(s):// URLs
+    - count: (default 3) echo requests per host and probe
+    - timeout_sec_per_ping: (default 2) seconds to wait for each echo reply
+    - url_timeout_sec: (default 5) HTTP request timeout
+    - concurrency: (default 64) probes running at the same time
+    - probe_interval_sec: (default read_in_sec) how often each target is probed
+    - method: (default auto) auto, icmp (socket only) or subprocess (system ping only)
+    - details: (default true) also report RTT min/max and packet loss per host
+"""
+import asyncio
 import logging
-import yaml
-import pingparsing
-import requests
+import re
+import socket
+import struct
+import threading
 import time
-import json
-import os
+import zlib
 from concurrent.futures import ThreadPoolExecutor
-requests.packages.urllib3.disable_warnings()
 
-def perform_ping(name):
-	ping_parser = pingparsing.PingParsing()
-	transmitter = pingparsing.PingTransmitter()
-	data = None
+from drivers._base import Driver, read_budget
+from reading import Reading
 
-	if name.startswith(('http://', 'https://')):
-		start = time.perf_counter()
-		try:
-			r = requests.get(name, verify=False, timeout=5)
-			code = r.status_code
-		except Exception:
-			code = 0
+DEFAULT_COUNT = 3
+DEFAULT_PING_TIMEOUT_SEC = 2.0
+DEFAULT_URL_TIMEOUT_SEC = 5.0
+DEFAULT_CONCURRENCY = 64
+HTTP_WORKERS = 16
+# Gap between the echo requests sent to one host (the shortest `ping -i` allows unprivileged)
+PACKET_INTERVAL_SEC = 0.2
+# Seconds a resolved address is reused
+RESOLVE_TTL_SEC = 300
+# Longest open() waits for the first result of every target
+FIRST_ROUND_WAIT_SEC = 20
 
-		request_time = time.perf_counter() - start
+_PING_SUMMARY = re.compile(r'(\d+) packets transmitted, (\d+) (?:packets )?received')
+_PING_RTT = re.compile(r'= ([\d.]+)/([\d.]+)/([\d.]+)')
 
-		if code in [200]:
-			value = '{0:0.2f}'.format(request_time)
-		else:
-			value = 0
-		type = 'url'
-
-	else:
-		transmitter.destination = name
-		transmitter.count = 3
-		result = transmitter.ping()
-		out = json.dumps(ping_parser.parse(result).as_dict(), indent=4)
-		jout = json.loads(out)
-
-		if jout['rtt_avg']:
-			value = jout['rtt_avg']
-			value = '{0:0.2f}'.format(value)
+
+class IcmpSocket:
+	"""Unprivileged ICMP echo socket shared by all probes of one address family"""
+
+	def __init__(self, loop, family):
+		self.loop = loop
+		if family == socket.AF_INET:
+			self.sock = socket.socket(family, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+			self.request_type, self.reply_type = 8, 0
 		else:
-			value = 0
-		type = 'host'
+			self.sock = socket.socket(family, socket.SOCK_DGRAM, socket.IPPROTO_ICMPV6)
+			self.request_type, self.reply_type = 128, 129
+		self.sock.setblocking(False)
+		self.seq = 0
+		# (address, sequence) -> future resolved with the receive time
+		self.pending = {}
+		loop.add_reader(self.sock.fileno(), self._on_readable)
+
+	def _on_readable(self):
+		while True:
+			try:
+				packet, addr = self.sock.recvfrom(1024)
+			except OSError:
+				return
+			# Datagram ICMP sockets deliver the ICMP header without the IP header
+			if len(packet) < 8 or packet[0] != self.reply_type:
+				continue
+			seq = struct.unpack('!H', packet[6:8])[0]
+			future = self.pending.pop((addr[0], seq), None)
+			if future is not None and not future.done():
+				future.set_result(time.perf_counter())
+
+	async def ping(self, sockaddr, timeout):
+		"""Send one echo request; return the round trip in ms, or None if no reply came"""
+		self.seq = (self.seq + 1) & 0xFFFF
+		key = (sockaddr[0], self.seq)
+		future = self.loop.create_future()
+		self.pending[key] = future
+		# The kernel fills in the identifier and checksum of datagram ICMP sockets
+		packet = struct.pack('!BBHHH', self.request_type, 0, 0, 0, self.seq) + b'nettemp'.ljust(56, b'\0')
+		sent = time.perf_counter()
+		try:
+			self.sock.sendto(packet, sockaddr)
+			received = await asyncio.wait_for(future, timeout)
+			return (received - sent) * 1000
+		except (asyncio.TimeoutError, OSError):
+			return None
+		finally:
+			self.pending.pop(key, None)
+
+	def close(self):
+		self.loop.remove_reader(self.sock.fileno())
+		self.sock.close()
+
+
+def rtt_stats(rtts, sent):
+	"""Return (min, avg, max, loss %) of round trips in ms; RTTs are None if nothing came back"""
+	loss = round((sent - len(rtts)) * 100.0 / sent, 1) if sent else 100.0
+	if not rtts:
+		return None, None, None, loss
+	return min(rtts), sum(rtts) / len(rtts), max(rtts), loss
+
+
+class PingDriver(Driver):
+	"""Probes hosts and URLs continuously on a background asyncio loop"""
+
+	def open(self, config):
+		super().open(config)
+		# Keep the order, drop duplicates
+		self.targets = list(dict.fromkeys(str(t) for t in (config.get("hosts") or [])))
+		self.count = max(1, int(config.get("count", DEFAULT_COUNT)))
+		self.timeout = float(config.get("timeout_sec_per_ping", DEFAULT_PING_TIMEOUT_SEC))
+		self.url_timeout = float(config.get("url_timeout_sec", DEFAULT_URL_TIMEOUT_SEC))
+		self.concurrency = max(1, int(config.get("concurrency", DEFAULT_CONCURRENCY)))
+		self.interval = float(config.get("probe_interval_sec") or config.get("read_in_sec") or 60)
+		self.method = config.get("method", "auto")
+		self.details = config.get("details", True)
 
-	name4r = name.replace("://", "_")
-	rom = '_' + type + '_' + name4r
+		self.results = {}
+		self.results_lock = threading.Lock()
+		self.addresses = {}
+		self.icmp = {}
+		self.tasks = []
+		self.session = None
+		self.http_pool = None
+		self.loop = None
+		if not self.targets:
+			logging.warning("[ ping ] No hosts configured")
+			return
 
-	data = {"rom": rom, "type": type, "value": value, "name": name}
+		urls = [t for t in self.targets if t.startswith(('http://', 'https://'))]
+		if urls:
+			# requests is slow to import; only load it when URLs are configured
+			import requests
+			requests.packages.urllib3.disable_warnings()
+			self.session = requests.Session()
+			adapter = requests.adapters.HTTPAdapter(pool_connections=max(10, len(urls)), pool_maxsize=HTTP_WORKERS)
+			self.session.mount('http://', adapter)
+			self.session.mount('https://', adapter)
+			self.http_pool = ThreadPoolExecutor(max_workers=HTTP_WORKERS, thread_name_prefix='ping-http')
 
-	return data
+		self.loop = asyncio.new_event_loop()
+		self.thread = threading.Thread(target=self.loop.run_forever, name='ping', daemon=True)
+		self.thread.start()
+		asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
 
-def ping(config_dict):
-	hosts = config_dict.get("hosts") or []
+	async def _start(self):
+		self.semaphore = asyncio.Semaphore(self.concurrency)
+		if self.method in ("auto", "icmp"):
+			for family in (socket.AF_INET, socket.AF_INET6):
+				try:
+					self.icmp[family] = IcmpSocket(self.loop, family)
+				except OSError as e:
+					logging.debug(f"[ ping ] ICMP socket for family {family} not available: {e}")
+			if not self.icmp:
+				logging.info("[ ping ] Unprivileged ICMP sockets not permitted (net.ipv4.ping_group_range), using the system ping")
 
-	if not hosts:
-		logging.warning("[ ping ] No hosts configured")
-		return []
+		epoch = self.loop.time()
+		first_results = []
+		for target in self.targets:
+			first = self.loop.create_future()
+			phase = zlib.crc32(target.encode()) / 2 ** 32 * self.interval
+			self.tasks.append(self.loop.create_task(self._run_target(target, epoch + phase, first)))
+			first_results.append(first)
+		wait = min(FIRST_ROUND_WAIT_SEC, read_budget(self.config))
+		await asyncio.wait(first_results, timeout=wait)
 
-	# Use ThreadPoolExecutor to perform ping in parallel
-	with ThreadPoolExecutor(max_workers=len(hosts)) as executor:
-		results = list(executor.map(perform_ping, hosts))
+	async def _run_target(self, target, next_run, first):
+		"""Probe a target now, then once per interval at its own phase"""
+		while True:
+			try:
+				async with self.semaphore:
+					readings = await self._probe(target)
+				with self.results_lock:
+					self.results[target] = readings
+			except Exception as e:
+				logging.warning(f"[ ping ] {target}: {e}")
+			if not first.done():
+				first.set_result(None)
 
-	# Filter out None results if any
-	data = [result for result in results if result is not None]
+			now = self.loop.time()
+			while next_run <= now:
+				next_run += self.interval
+			await asyncio.sleep(next_run - now)
 
-	if data:
+	async def _probe(self, target):
+		if target.startswith(('http://', 'https://')):
+			return await self.loop.run_in_executor(self.http_pool, self._fetch, target)
+
+		stats = None
+		if self.icmp:
+			stats = await self._icmp_ping(target)
+		if stats is None and self.method != "icmp":
+			stats = await self._system_ping(target)
+		if stats is None:
+			stats = rtt_stats([], self.count)
+		return self._host_readings(target, *stats)
+
+	async def _resolve(self, host):
+		cached = self.addresses.get(host)
+		if cached and time.monotonic() - cached[0] < RESOLVE_TTL_SEC:
+			return cached[1]
+		infos = await self.loop.getaddrinfo(host, None, type=socket.SOCK_DGRAM)
+		# Prefer an address family we have a socket for
+		infos.sort(key=lambda info: info[0] not in self.icmp)
+		resolved = (infos[0][0], infos[0][4])
+		self.addresses[host] = (time.monotonic(), resolved)
+		return resolved
+
+	async def _icmp_ping(self, host):
+		"""Ping over the ICMP socket; None if the host's address family has no socket"""
+		try:
+			family, sockaddr = await self._resolve(host)
+		except (OSError, UnicodeError) as e:
+			logging.warning(f"[ ping ] Cannot resolve {host}: {e}")
+			return rtt_stats([], self.count)
+		icmp = self.icmp.get(family)
+		if icmp is None:
+			return None
+		rtts = []
+		for i in range(self.count):
+			if i:
+				await asyncio.sleep(PACKET_INTERVAL_SEC)
+			rtt = await icmp.ping(sockaddr, self.timeout)
+			if rtt is not None:
+				rtts.append(rtt)
+		return rtt_stats(rtts, self.count)
+
+	async def _system_ping(self, host):
+		"""Run the system ping and parse its summary lines"""
+		cmd = ['ping', '-n', '-q', '-c', str(self.count), '-i', str(PACKET_INTERVAL_SEC)]
+		cmd += ['-W', str(max(1, int(round(self.timeout)))), host]
+		proc = None
+		try:
+			proc = await asyncio.create_subprocess_exec(
+				*cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+			out, _ = await asyncio.wait_for(proc.communicate(), self.count * (self.timeout + PACKET_INTERVAL_SEC) + 2)
+		except (OSError, asyncio.TimeoutError) as e:
+			if proc is not None and proc.returncode is None:
+				proc.kill()
+				await proc.wait()
+			logging.warning(f"[ ping ] System ping of {host} failed: {e!r}")
+			return rtt_stats([], self.count)
+
+		text = out.decode(errors='replace')
+		summary = _PING_SUMMARY.search(text)
+		if not summary:
+			return rtt_stats([], self.count)
+		sent, received = int(summary.group(1)), int(summary.group(2))
+		loss = round((sent - received) * 100.0 / sent, 1) if sent else 100.0
+		rtt = _PING_RTT.search(text)
+		if not rtt or not received:
+			return None, None, None, loss
+		return float(rtt.group(1)), float(rtt.group(2)), float(rtt.group(3)), loss
+
+	def _host_readings(self, host, rtt_min, rtt_avg, rtt_max, loss):
+		rom = '_host_' + host.replace("://", "_")
+		data = [Reading(rom, 'host', round(rtt_avg, 2) if rtt_avg is not None else 0, host)]
+		if self.details:
+			if rtt_avg is not None:
+				data.append(Reading(rom + '_min', 'host', round(rtt_min, 2), host + ' min'))
+				data.append(Reading(rom + '_max', 'host', round(rtt_max, 2), host + ' max'))
+			data.append(Reading(rom + '_loss', 'loss', loss, host + ' loss', '%'))
 		return data
 
-	return []
+	def _fetch(self, url):
+		"""GET a URL on the HTTP thread pool; value is the response time in s, 0 if not 200"""
+		start = time.perf_counter()
+		try:
+			r = self.session.get(url, verify=False, timeout=self.url_timeout)
+			code = r.status_code
+		except Exception:
+			code = 0
+		request_time = time.perf_counter() - start
+
+		value = round(request_time, 2) if code == 200 else 0
+		return [Reading('_url_' + url.replace("://", "_"), 'url', value, url)]
+
+	def read(self):
+		# Results older than a few intervals mean the target's probes are stuck
+		oldest = time.time() - 3 * self.interval - self.count * self.timeout
+		data = []
+		with self.results_lock:
+			for target in self.targets:
+				readings = self.results.get(target)
+				if readings and readings[0].timestamp >= oldest:
+					data.extend(readings)
+		return data
+
+	def close(self):
+		if self.loop is not None:
+			async def stop():
+				for task in self.tasks:
+					task.cancel()
+				await asyncio.gather(*self.tasks, return_exceptions=True)
+				for icmp in self.icmp.values():
+					icmp.close()
+
+			try:
+				asyncio.run_coroutine_threadsafe(stop(), self.loop).result(timeout=5)
+			finally:
+				self.loop.call_soon_threadsafe(self.loop.stop)
+				self.thread.join(timeout=5)
+				if not self.thread.is_alive():
+					self.loop.close()
+			self.loop = None
+		if self.http_pool is not None:
+			self.http_pool.shutdown(wait=False)
+		if self.session is not None:
+			self.session.close()
+
+
+ping = PingDriver
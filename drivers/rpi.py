@@ -1,5 +1,7 @@
 import io, sys, os, socket
 
+from reading import Reading
+
 
 
 def rpi(config_dict):
@@ -13,7 +15,7 @@ def rpi(config_dict):
 		type = 'temp'
 		name = 'raspberrypi'
 
-		data.append({"rom":rom,"type":type, "value":value,"name":name})
+		data.append(Reading(rom, type, value, name))
 		return data
 	except Exception as e:
 		print("\n[WARN] Error \n\tArgs: '%s'" % (str(e.args)))
@@ -1,47 +1,254 @@
 #!/usr/bin/env python3
+"""
+Eastron SDM energy meters over Modbus RTU
 
-import argparse
-import json
-import sdm_modbus
-import socket, random, os, yaml
+Every serial port gets one long-lived poller: a thread owning the port's
+Modbus client that polls the meters (units) on the line in turn, each once per
+its interval. A poll reads all of a meter's configured registers in one block
+transfer (more only if they are far apart), so one meter costs one round trip
+instead of one per value. read() returns the latest values of its meter.
+
+A meter that stops answering is retried once per poll and polled less and
+less often (up to BACKOFF_MAX_SEC), so a dead unit doesn't eat the line's time.
+
+Config options:
+    - port: serial device, e.g. /dev/ttyUSB0
+    - unit: Modbus unit id (several meters: list them under `instances`)
+    - model: (default SDM120) SDM72, SDM72V2, SDM120, SDM230 or SDM630
+    - registers: (optional) sdm_modbus register names to report, e.g. [voltage, frequency]
+    - baud, parity, stopbits: (optional) serial settings, taken from the first unit on a port
+    - unit_timeout_sec: (default 1) reply timeout for this unit
+    - poll_interval_sec: (default read_in_sec) how often this unit is polled
+"""
 import logging
+import threading
+import time
+
+import sdm_modbus
+
+from drivers._base import Driver, read_budget
+from reading import Reading
+
+# Registers reported when `registers` is not configured
+DEFAULT_REGISTERS = {
+    "SDM120": ["voltage", "current", "power_active"],
+    "SDM230": ["voltage", "current", "power_active"],
+    "SDM72": ["l1_voltage", "l1_current", "total_power"],
+    "SDM72V2": ["l1_voltage", "l1_current", "total_power"],
+    "SDM630": ["l1_voltage", "l1_current", "total_power_active"],
+}
+
+# Reading types of the classic SDM120 values; other registers use their name
+REGISTER_TYPES = {"voltage": "volt", "current": "amps", "power_active": "watt"}
+
+# Largest block read: Modbus allows 125 registers per request
+MAX_BLOCK_REGISTERS = 120
+DEFAULT_UNIT_TIMEOUT_SEC = 1.0
+RETRIES = 2
+BACKOFF_MAX_SEC = 600
+
+# One poller per serial port, shared by every meter (instance) on that line
+_ports = {}
+_ports_lock = threading.Lock()
+
+
+def _set_timeout(client, seconds):
+    """Set the reply timeout of the pymodbus client (pymodbus 3.5/3.6, as pinned in requirements.txt)"""
+    client.comm_params.timeout_connect = seconds
+
+
+def block_plan(registers, keys):
+    """Group input registers into as few block reads as possible, each sorted by address"""
+    wanted = sorted(((registers[k][0], k) for k in keys), key=lambda item: item[0])
+    blocks = []
+    for address, key in wanted:
+        end = address + registers[key][1]
+        if blocks and end - blocks[-1]["start"] <= MAX_BLOCK_REGISTERS:
+            blocks[-1]["registers"][key] = registers[key]
+        else:
+            blocks.append({"start": address, "registers": {key: registers[key]}})
+    return [block["registers"] for block in blocks]
+
+
+class MeterUnit:
+    """One meter on a line: what to read, how often, and its latest values"""
+
+    def __init__(self, meter, config):
+        self.meter = meter
+        self.unit = meter.unit
+        self.model = getattr(meter, "model", "SDM")
+        keys = config.get("registers") or DEFAULT_REGISTERS.get(self.model, ["voltage", "current", "power_active"])
+        registers = {k: v for k, v in meter.registers.items() if v[2] == sdm_modbus.registerType.INPUT}
+        missing = [k for k in keys if k not in registers]
+        if missing:
+            logging.warning(f"{self.model} unit {self.unit}: unknown registers {', '.join(missing)}")
+        self.keys = [k for k in keys if k in registers]
+        self.plan = block_plan(registers, self.keys)
+        self.timeout = float(config.get("unit_timeout_sec", DEFAULT_UNIT_TIMEOUT_SEC))
+        self.interval = float(config.get("poll_interval_sec") or config.get("read_in_sec") or 60)
+        self.next_due = time.monotonic()
+        self.values = None
+        self.timestamp = None
+        self.failures = 0
+
+    def poll(self):
+        """Read all registers of this meter (called on the poller thread only)"""
+        _set_timeout(self.meter.client, self.timeout)
+        # A meter that didn't answer last time gets a single try
+        self.meter.retries = 1 if self.failures else RETRIES
+        values = {}
+        error = None
+        try:
+            # Block read of sdm_modbus 0.7.0 (pinned; decodes each register by its data type)
+            for block in self.plan:
+                values.update(self.meter._read_all(block, sdm_modbus.registerType.INPUT))
+        except Exception as e:
+            error = e
+
+        now = time.monotonic()
+        if self.keys and all(k in values for k in self.keys):
+            if self.failures > 1:
+                logging.info(f"{self.model} unit {self.unit} answering again after {self.failures} failed polls")
+            self.values = values
+            self.timestamp = time.time()
+            self.failures = 0
+            self.next_due += self.interval
+            if self.next_due <= now:
+                self.next_due = now + self.interval
+        else:
+            self.failures += 1
+            self.next_due = now + min(self.interval * 2 ** (self.failures - 1), max(BACKOFF_MAX_SEC, self.interval))
+            # An exception here is usually the library, not the meter (e.g. an unpinned upgrade)
+            reason = f"poll failed: {type(error).__name__}: {error}" if error is not None else "no reply"
+            logging.warning(f"{self.model} unit {self.unit} on {self.meter.device}: {reason} "
+                            f"({self.failures} in a row), next try in {self.next_due - now:.0f}s")
+
+
+class PortPoller:
+    """Long-lived Modbus client for one serial line, polling its meters round-robin"""
+
+    def __init__(self, port):
+        self.port = port
+        self.client_meter = None
+        self.units = []
+        self.cursor = 0
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.thread = None
+
+    def add(self, config):
+        model = config.get("model", "SDM120")
+        meter_class = getattr(sdm_modbus, model)
+        with self.cond:
+            if self.client_meter is None:
+                kwargs = {"device": self.port, "timeout": float(config.get("unit_timeout_sec", DEFAULT_UNIT_TIMEOUT_SEC)),
+                          "parity": config.get("parity", "N"), "unit": config.get("unit")}
+                for key in ("baud", "stopbits"):
+                    if config.get(key):
+                        kwargs[key] = config[key]
+                meter = self.client_meter = meter_class(**kwargs)
+            else:
+                # Further units on the same RS485 line reuse the first meter's client
+                meter = meter_class(parent=self.client_meter, unit=config.get("unit"))
+            unit = MeterUnit(meter, config)
+            self.units.append(unit)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name=f"sdm-{self.port}", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+        return unit
+
+    def remove(self, unit):
+        """Drop a unit; returns how many units are left"""
+        with self.cond:
+            if unit in self.units:
+                self.units.remove(unit)
+            return len(self.units)
+
+    def stop(self):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify_all()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join(timeout=10)
+        if self.client_meter is not None:
+            self.client_meter.disconnect()
+
+    def _pick(self):
+        """Return the next due unit in round-robin order, or the seconds until one is due"""
+        now = time.monotonic()
+        count = len(self.units)
+        for i in range(count):
+            unit = self.units[(self.cursor + i) % count]
+            if unit.next_due <= now:
+                self.cursor = (self.cursor + i + 1) % count
+                return unit, None
+        return None, min((u.next_due - now for u in self.units), default=None)
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while True:
+                    if self.stopping:
+                        return
+                    unit, wait = self._pick()
+                    if unit is not None:
+                        break
+                    self.cond.wait(wait)
+            unit.poll()
+            with self.cond:
+                self.cond.notify_all()
+
+    def wait_first(self, unit, timeout):
+        """Wait until a unit has been polled once (values or a failure)"""
+        with self.cond:
+            self.cond.wait_for(lambda: unit.timestamp is not None or unit.failures, timeout)
+
+
+class SDM120Driver(Driver):
+    """SDM meter read from its port's shared poller"""
+
+    def open(self, config):
+        super().open(config)
+        self.port = config.get("port")
+        with _ports_lock:
+            poller = _ports.get(self.port)
+            if poller is None:
+                poller = _ports[self.port] = PortPoller(self.port)
+            self.poller = poller
+            self.unit = poller.add(config)
+        self.model = self.unit.model
+        # First read: give the poller time to reach this unit
+        wait = min(read_budget(config), (self.unit.timeout * RETRIES + 0.5) * len(poller.units))
+        poller.wait_first(self.unit, wait)
+
+    def read(self):
+        unit = self.unit
+        values, timestamp = unit.values, unit.timestamp
+        if values is None:
+            return []
+        # Older than a couple of polls means the meter stopped answering
+        if time.time() - timestamp > 2 * unit.interval + unit.timeout * RETRIES * len(self.poller.units):
+            return []
 
-def sdm120(config_dict):
-    try:
-        model = "SDM120"
-        
-        port = config_dict.get("port")
-        unit = config_dict.get("unit")
-         
-        meter = sdm_modbus.SDM120(
-            device=port,
-            timeout=1,
-            parity="N",
-            unit=unit
-        )
         data = []
-        
-        v = meter.read("voltage")
-        c =  meter.read("current")
-        pa = meter.read("power_active")
-
-      
-        v = f"{v:.2f}"
-        c = f"{c:.2f}"
-        pa = f"{pa:.2f}"
-
-        logging.info(f"SDM120 {v}V {c}A {pa}W")
-        
-        for type, value in {"volt":v, "amps":c, "watt":pa}.items():
-            value = value
-            rom = f"_{model}_{unit}_{type}"
-            type = f"{type}"
-            name = f"{model} {type}"
-            data.append({"rom":rom,"type":type, "value":value,"name":name})
-        
-        meter.disconnect()
+        for key in unit.keys:
+            type = REGISTER_TYPES.get(key, key)
+            value = round(values[key], 2)
+            rom = f"_{self.model}_{unit.unit}_{type}"
+            name = f"{self.model} {type}"
+            data.append(Reading(rom, type, value, name, timestamp=timestamp))
 
+        logging.info(f"{self.model} unit {unit.unit}: " + ", ".join(f"{r.type}={r.value}" for r in data))
         return data
-        
-    except:
-        logging.info("sdm 120 error")
+
+    def close(self):
+        with _ports_lock:
+            if self.poller.remove(self.unit) > 0:
+                return
+            if _ports.get(self.port) is self.poller:
+                del _ports[self.port]
+        self.poller.stop()
+
+
+sdm120 = SDM120Driver
@@ -1,24 +1,215 @@
-import psutil, socket
+"""
+System metrics read from /proc
+
+open() opens the /proc files the selected metrics need and read() takes one
+pread() per file, without sleeping: rates (CPU %, disk and network I/O) come
+from the counters stored at the previous read. CPU % on the first read is the
+average since boot; disk and network rates start from the second read.
+Process metrics (fds, threads, rss) are of the process running the driver.
+
+Config options:
+    - metrics: (default [cpu, mem]) any of
+        cpu        total CPU %
+        cpu_cores  CPU % per core
+        load       load average 1/5/15 min
+        mem, swap  memory / swap used %
+        disk       read/write kB/s per disk
+        net        rx/tx kB/s per network interface
+        temp       CPU temperature (thermal_zone0)
+        fds, threads, rss   open files, threads and resident MB of this process
+    - disks: (optional) disks to report, e.g. [mmcblk0]; default all except loop/ram/zram devices and partitions
+    - interfaces: (optional) interfaces to report, e.g. [eth0, wlan0]; default all except lo
+"""
 import logging
+import os
+import time
+
+from drivers import _paths
+from drivers._base import Driver
+from reading import Reading
+
+PROC = '/proc'
+
+METRICS = ('cpu', 'cpu_cores', 'load', 'mem', 'swap', 'disk', 'net', 'temp', 'fds', 'threads', 'rss')
+DEFAULT_METRICS = ['cpu', 'mem']
+
+# /proc file each metric parses
+METRIC_FILES = {
+	'cpu': 'stat', 'cpu_cores': 'stat', 'load': 'loadavg', 'mem': 'meminfo', 'swap': 'meminfo',
+	'disk': 'diskstats', 'net': 'net/dev', 'threads': 'self/status', 'rss': 'self/statm',
+}
+
+SKIP_DISK_PREFIXES = ('loop', 'ram', 'zram')
+SECTOR_BYTES = 512
+
+
+def _pread_text(fd):
+	"""Read a whole /proc file from a kept-open descriptor"""
+	data = os.pread(fd, 65536, 0)
+	while len(data) % 65536 == 0 and data:
+		chunk = os.pread(fd, 65536, len(data))
+		if not chunk:
+			break
+		data += chunk
+	return data.decode('ascii', 'replace')
+
+
+class SystemDriver(Driver):
+	"""Selected /proc metrics; files opened once, rates from the previous read's counters"""
+
+	def open(self, config):
+		super().open(config)
+		self.metrics = list(config.get('metrics') or DEFAULT_METRICS)
+		for metric in self.metrics:
+			if metric not in METRICS:
+				logging.warning(f"system: unknown metric '{metric}', choose from {', '.join(METRICS)}")
+		self.disks = config.get('disks')
+		self.interfaces = config.get('interfaces')
+		self.page_size = os.sysconf('SC_PAGE_SIZE')
+		# counter key -> (value, monotonic time) of the previous read
+		self.previous = {}
+		self.partitions = {}
+
+		self.fds = {}
+		paths = {METRIC_FILES[m]: os.path.join(PROC, METRIC_FILES[m]) for m in self.metrics if m in METRIC_FILES}
+		if 'temp' in self.metrics:
+			paths['temp'] = os.path.join(_paths.SYSFS_ROOT, 'class', 'thermal', 'thermal_zone0', 'temp')
+		for key, path in paths.items():
+			try:
+				self.fds[key] = os.open(path, os.O_RDONLY)
+			except OSError as e:
+				logging.warning(f"system: cannot open {path}: {e}")
+
+	def _rate(self, key, value, now):
+		"""Per-second change of a counter since the previous read; None on the first read"""
+		previous = self.previous.get(key)
+		self.previous[key] = (value, now)
+		if previous is None or now <= previous[1] or value < previous[0]:
+			return None
+		return (value - previous[0]) / (now - previous[1])
+
+	def _cpu_percent(self, key, fields):
+		# user nice system idle iowait irq softirq steal (guest time is already in user)
+		values = [int(v) for v in fields[:8]]
+		total = sum(values)
+		idle = values[3] + values[4]
+		prev_total, prev_idle = self.previous.get(key, (0, 0))
+		self.previous[key] = (total, idle)
+		if total <= prev_total:
+			return None
+		return round(100.0 * (1 - (idle - prev_idle) / (total - prev_total)), 1)
+
+	def _is_partition(self, dev):
+		if dev not in self.partitions:
+			self.partitions[dev] = os.path.exists(os.path.join(_paths.SYSFS_ROOT, 'class', 'block', dev, 'partition'))
+		return self.partitions[dev]
+
+	def read(self):
+		data = []
+		now = time.monotonic()
+		text = {key: _pread_text(fd) for key, fd in self.fds.items()}
+
+		for metric in self.metrics:
+			key = METRIC_FILES.get(metric, metric)
+			if key not in text:
+				continue
+
+			if metric in ('cpu', 'cpu_cores'):
+				for line in text[key].splitlines():
+					if not line.startswith('cpu'):
+						break
+					fields = line.split()
+					core = fields[0][3:]
+					if (metric == 'cpu') != (core == ''):
+						continue
+					value = self._cpu_percent(fields[0], fields[1:])
+					if value is not None:
+						data.append(Reading('_system_' + fields[0], 'system', value, 'CPU' + core))
+
+			elif metric == 'load':
+				for minutes, value in zip((1, 5, 15), text[key].split()[:3]):
+					data.append(Reading(f'_system_load{minutes}', 'system', float(value), f'Load {minutes}m'))
+
+			elif metric in ('mem', 'swap'):
+				info = {}
+				for line in text[key].splitlines():
+					name, _, rest = line.partition(':')
+					info[name] = int(rest.split()[0]) if rest.split() else 0
+				if metric == 'mem' and info.get('MemTotal'):
+					available = info.get('MemAvailable', info.get('MemFree', 0))
+					value = round(100.0 * (info['MemTotal'] - available) / info['MemTotal'], 1)
+					data.append(Reading('_system_mem', 'system', value, 'Memory'))
+				elif metric == 'swap' and info.get('SwapTotal'):
+					value = round(100.0 * (info['SwapTotal'] - info.get('SwapFree', 0)) / info['SwapTotal'], 1)
+					data.append(Reading('_system_swap', 'system', value, 'Swap'))
+
+			elif metric == 'disk':
+				for line in text[key].splitlines():
+					fields = line.split()
+					if len(fields) < 10:
+						continue
+					dev = fields[2]
+					if self.disks is not None:
+						if dev not in self.disks:
+							continue
+					elif dev.startswith(SKIP_DISK_PREFIXES) or self._is_partition(dev):
+						continue
+					for direction, sectors in (('read', fields[5]), ('write', fields[9])):
+						rate = self._rate(f'disk_{dev}_{direction}', int(sectors) * SECTOR_BYTES, now)
+						if rate is not None:
+							rom = f'_system_disk_{dev}_{direction}'
+							data.append(Reading(rom, 'system', round(rate / 1024, 1), f'{dev} {direction}', 'kB/s'))
+
+			elif metric == 'net':
+				for line in text[key].splitlines()[2:]:
+					iface, _, counters = line.partition(':')
+					iface = iface.strip()
+					fields = counters.split()
+					if len(fields) < 9:
+						continue
+					if self.interfaces is not None:
+						if iface not in self.interfaces:
+							continue
+					elif iface == 'lo':
+						continue
+					for direction, count in (('rx', fields[0]), ('tx', fields[8])):
+						rate = self._rate(f'net_{iface}_{direction}', int(count), now)
+						if rate is not None:
+							rom = f'_system_net_{iface}_{direction}'
+							data.append(Reading(rom, 'system', round(rate / 1024, 1), f'{iface} {direction}', 'kB/s'))
+
+			elif metric == 'temp':
+				try:
+					data.append(Reading('_system_temp', 'temp', round(int(text[key]) / 1000.0, 1), 'CPU temperature'))
+				except ValueError:
+					pass
+
+			elif metric == 'threads':
+				for line in text[key].splitlines():
+					if line.startswith('Threads:'):
+						data.append(Reading('_system_threads', 'system', int(line.split()[1]), 'Threads'))
 
-logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+			elif metric == 'rss':
+				resident = int(text[key].split()[1]) * self.page_size
+				data.append(Reading('_system_rss', 'system', round(resident / 1048576.0, 1), 'RSS', 'MB'))
 
-def system(config_dict):
-	data = []
+		if 'fds' in self.metrics:
+			try:
+				# minus the descriptor listdir itself holds open
+				count = len(os.listdir(os.path.join(PROC, 'self', 'fd'))) - 1
+				data.append(Reading('_system_fds', 'system', count, 'Open files'))
+			except OSError:
+				pass
 
-	cpu = psutil.cpu_percent()
-	mem = psutil.virtual_memory().percent
+		return data
 
-	rom = '_system_cpu'
-	type = 'system'
-	value = cpu
-	name = 'CPU'
-	data.append({"rom":rom,"type":type, "value":value,"name":name})
+	def close(self):
+		for fd in self.fds.values():
+			try:
+				os.close(fd)
+			except OSError:
+				pass
+		self.fds = {}
 
-	rom = '_system_mem'
-	type = 'system'
-	value = mem
-	name = 'Memory'
-	data.append({"rom":rom,"type":type, "value":value,"name":name})
 
-	return data
+system = SystemDriver
@@ -1,39 +1,105 @@
-import time, socket
-import board
-import busio
+"""
+TSL2561 light sensor
+
+The sensor is configured once in open(). In the default (single) mode each
+read powers it up, waits one integration time and powers it down again. With
+`mode: continuous` it stays powered and integrating: a background sampler
+reads every `sample_interval_sec` (default: the integration time) into a
+rolling window, and read() returns the window's median at once.
+
+Config options:
+    - i2c_address: (default 0x39) I2C address
+    - gain: (default 0) 0 = 1x, 1 = 16x
+    - integration_time: (default 1) 0 = 13.7 ms, 1 = 101 ms, 2 = 402 ms
+    - mode: (default single) single or continuous
+    - sample_interval_sec: (continuous) seconds between samples
+    - window: (default 5) samples the continuous median is taken over
+"""
+import logging
+import time
 import adafruit_tsl2561
 
-def tsl2561(config_dict):
-	try:
-		i2c = busio.I2C(board.SCL, board.SDA)
-		tsl = adafruit_tsl2561.TSL2561(i2c)
+from drivers import _i2c
+from drivers._base import Driver
+from reading import Reading
+
+# Integration time setting -> seconds
+INTEGRATION_SEC = {0: 0.0137, 1: 0.101, 2: 0.402}
+
+# Margin over one integration time before the first value is complete
+SETTLE_MARGIN = 1.1
+
+
+class TSL2561Driver(Driver):
+	"""TSL2561 configured once, read per interval or sampled continuously"""
 
-		# Enable the light sensor
-		tsl.enabled = True
-		time.sleep(1)
+	def open(self, config):
+		super().open(config)
+		self.addr = int(str(config.get('i2c_address', 0x39)), 0)
+		self.bus = _i2c.pool.resolve_bus(config)
+		self.tsl = adafruit_tsl2561.TSL2561(_i2c.busio_for(config), address=self.addr)
 
 		# Set gain 0=1x, 1=16x
-		tsl.gain = 0
+		self.tsl.gain = int(config.get('gain', 0))
 
-		# Set integration time (0=13.7ms, 1=101ms, 2=402ms, or 3=manual)
-		tsl.integration_time = 1
+		# Set integration time (0=13.7ms, 1=101ms, 2=402ms)
+		self.integration = int(config.get('integration_time', 1))
+		self.tsl.integration_time = self.integration
+		self.settle_sec = INTEGRATION_SEC.get(self.integration, 0.402) * SETTLE_MARGIN
 
-		# Get computed lux value (tsl.lux can return None or a float)
-		lux = tsl.lux
+		self.sampler = None
+		if config.get('mode', 'single') == 'continuous':
+			interval = float(config.get('sample_interval_sec') or INTEGRATION_SEC.get(self.integration, 0.402))
+			self.tsl.enabled = True
+			# First integration; later samples never wait
+			time.sleep(self.settle_sec)
+			self.sampler = _i2c.ContinuousSampler(f'tsl2561-{self.addr:02x}', self.bus,
+				self._lux, interval, config.get('window', 5))
+			value = self._lux()
+			if value is not None:
+				self.sampler.add(value)
+			self.sampler.start()
+			self.max_age = max(3 * interval, 5.0)
 
-		rom = "_i2c_39_lux"
+	def _lux(self):
+		# tsl.lux is None when a channel is saturated
+		return self.tsl.lux
+
+	def read(self):
+		if self.sampler is not None:
+			result = self.sampler.median(self.max_age)
+			if result is None:
+				logging.warning(f"tsl2561 0x{self.addr:02x}: no recent samples ({self.sampler.errors} errors)")
+				return []
+			lux, timestamp = result
+		else:
+			timestamp = None
+			self.tsl.enabled = True
+			try:
+				time.sleep(self.settle_sec)
+				lux = self._lux()
+			finally:
+				self.tsl.enabled = False
+
+		rom = f"_i2c_{self.addr:02x}_lux"
 		if lux:
-			value = '{0:0.2f}'.format(lux)
+			value = round(lux, 2)
 		else:
 			value = 0
 		name = 'tsl2561_lux'
 		type = 'lux'
-		return [{"rom":rom,"type":type, "value":value,"name":name}]
-	except Exception:
-		print("No TSL2561")
-		return []
-	finally:
+		return [Reading(rom, type, value, name, timestamp=timestamp)]
+
+	def close(self):
+		if self.sampler is not None:
+			self.sampler.stop()
+			self.sampler = None
 		try:
-			tsl.enabled = False
+			# Reentrant: close() may run with the loader already holding the bus
+			with _i2c.pool.lock(self.bus):
+				self.tsl.enabled = False
 		except Exception:
 			pass
+
+
+tsl2561 = TSL2561Driver
@@ -1,21 +1,85 @@
-import board
-import busio
+"""
+VL53L0X time-of-flight distance sensor
+
+The sensor is initialised once in open() (its calibration sequence is slow)
+instead of on every read. In the default (single) mode each read takes one
+ranging measurement. With `mode: continuous` the sensor ranges back-to-back:
+a background sampler collects each new measurement into a rolling window and
+read() returns the window's median at once.
+
+Config options:
+    - i2c_address: (default 0x29) I2C address
+    - timing_budget_ms: (optional) time per ranging, e.g. 20 (fast) to 200 (accurate); default 33
+    - mode: (default single) single or continuous
+    - sample_interval_sec: (continuous) seconds between samples; default the timing budget
+    - window: (default 5) samples the continuous median is taken over
+"""
+import logging
 import adafruit_vl53l0x
-import socket
 
-def vl53l0x(config_dict):
-	try:
-		i2c = busio.I2C(board.SCL, board.SDA)
-		sensor = adafruit_vl53l0x.VL53L0X(i2c)
+from drivers import _i2c
+from drivers._base import Driver
+from reading import Reading
+
+DEFAULT_TIMING_BUDGET_MS = 33
+
+
+class VL53L0XDriver(Driver):
+	"""VL53L0X initialised once, ranging per read or continuously"""
 
-		#print('Range: {}mm'.format(sensor.range))
-		rom = "_i2c_29_dist"
-		value = '{0:0.2f}'.format(sensor.range/10) #cm
+	def open(self, config):
+		super().open(config)
+		self.addr = int(str(config.get('i2c_address', 0x29)), 0)
+		self.bus = _i2c.pool.resolve_bus(config)
+		self.sensor = adafruit_vl53l0x.VL53L0X(_i2c.busio_for(config), address=self.addr)
+		budget_ms = float(config.get('timing_budget_ms', DEFAULT_TIMING_BUDGET_MS))
+		if config.get('timing_budget_ms'):
+			self.sensor.measurement_timing_budget = int(budget_ms * 1000)
+
+		self.sampler = None
+		if config.get('mode', 'single') == 'continuous':
+			interval = float(config.get('sample_interval_sec') or budget_ms / 1000.0)
+			self.sensor.start_continuous()
+			# Older library versions can't tell whether a measurement is ready
+			self.has_data_ready = hasattr(type(self.sensor), 'data_ready')
+			self.sampler = _i2c.ContinuousSampler(f'vl53l0x-{self.addr:02x}', self.bus,
+				self._sample, interval, config.get('window', 5))
+			# First measurement (waits for it once); later samples never wait
+			self.sampler.add(self.sensor.range)
+			self.sampler.start()
+			self.max_age = max(3 * interval, 5.0)
+
+	def _sample(self):
+		if self.has_data_ready and not self.sensor.data_ready:
+			return None
+		return self.sensor.range
+
+	def read(self):
+		if self.sampler is not None:
+			result = self.sampler.median(self.max_age)
+			if result is None:
+				logging.warning(f"vl53l0x 0x{self.addr:02x}: no recent samples ({self.sampler.errors} errors)")
+				return []
+			distance, timestamp = result
+		else:
+			distance, timestamp = self.sensor.range, None
+
+		rom = f"_i2c_{self.addr:02x}_dist"
+		value = round(distance/10, 2) #cm
 		name = 'vl53l0x_dist'
 		type = 'dist'
-		return [{"rom":rom,"type":type, "value":value,"name":name}]
-	except Exception:
-		print("No vl53l0x")
-		return []
+		return [Reading(rom, type, value, name, timestamp=timestamp)]
+
+	def close(self):
+		if self.sampler is not None:
+			self.sampler.stop()
+			self.sampler = None
+			try:
+				# Reentrant: close() may run with the loader already holding the bus
+				with _i2c.pool.lock(self.bus):
+					self.sensor.stop_continuous()
+			except Exception:
+				pass
 
 
+vl53l0x = VL53L0XDriver
@@ -1,17 +1,26 @@
-import random
 import logging
 
+from reading import Reading
+from drivers import _w1
+
 # Track whether DS2482 has been initialized
 _ds2482_initialized = False
 
 def w1_kernel(config_dict):
     """Read DS18B20 sensors via w1thermsensor.
 
-    Returns a list of dicts: {rom, type, value, name}.
+    Returns a list of Reading objects (rom '_28_<serial>', type 'temp').
 
     Config options:
         - ds2482: (optional, default: false) If true, initializes DS2482 I2C-to-1Wire bridge
                   on first call. If false or omitted, uses standard kernel GPIO 1-Wire.
+        - addresses, init_timeout_sec: (optional) DS2482 bridges to register and the longest
+                  wait for their bus masters, see drivers/ds2482.py
+        - names: (optional) {serial: name} overriding the names persisted in w1_names.json,
+                 e.g. {'000007165506': 'Boiler'}
+        - bulk: (optional, default: true) Convert all sensors of a bus at once through the
+                kernel's therm_bulk_read. Falls back to reading the sensors in parallel when
+                the kernel (or file permissions) don't allow it.
     """
     global _ds2482_initialized
 
@@ -28,6 +37,17 @@ def w1_kernel(config_dict):
         except Exception as e:
             logging.error(f"DS2482 initialization error: {e}")
 
+    names = {str(k): v for k, v in (config_dict.get('names') or {}).items()}
+    data = []
+    if config_dict.get('bulk', True):
+        results = _w1.read_bulk()
+        if results is not None:
+            for slave, value in results:
+                serial = slave.split('-', 1)[1]
+                name = names.get(serial) or _w1.sensor_name(serial)
+                data.append(Reading('_28_' + serial, 'temp', value, name))
+            return data
+
     try:
         from w1thermsensor import W1ThermSensor
     except Exception as e:
@@ -35,19 +55,13 @@ def w1_kernel(config_dict):
         print("No w1_kernel (w1thermsensor import failed):", e)
         return []
 
-    data = []
     try:
-        for sensor in W1ThermSensor.get_available_sensors():
-            r = random.randint(10000, 99999)
-            try:
-                value = sensor.get_temperature()
-            except Exception as e:
-                print("w1 read error for sensor", getattr(sensor, 'id', None), e)
-                continue
+        sensors = _w1.available_sensors(W1ThermSensor)
+        for sensor, value in _w1.read_parallel(sensors):
             rom = '_28_' + str(sensor.id)
             type_ = 'temp'
-            name = 'DS18B20-' + str(r)
-            data.append({"rom": rom, "type": type_, "value": value, "name": name})
+            name = names.get(str(sensor.id)) or _w1.sensor_name(str(sensor.id))
+            data.append(Reading(rom, type_, value, name))
     except Exception as e:
         print("w1_kernel iteration error:", e)
 
@@ -1,4 +1,7 @@
-import socket, random
+import socket
+
+from reading import Reading
+from drivers import _w1
 
 def w1_kernel_gpio(config_dict):
     print("w1_kernel_gpio")
@@ -7,13 +10,13 @@ def w1_kernel_gpio(config_dict):
 
         data = []
 
-        for sensor in W1ThermSensor.get_available_sensors():
-            r = random.randint(10000,99999)
-            value = sensor.get_temperature()
+        names = {str(k): v for k, v in (config_dict.get('names') or {}).items()}
+
+        for sensor, value in _w1.read_parallel(_w1.available_sensors(W1ThermSensor)):
             rom = '_28_'+sensor.id
             type = 'temp'
-            name = 'DS18b20-'+str(r)
-            data.append({"rom":rom,"type":type, "value":value,"name":name})
+            name = names.get(sensor.id) or _w1.sensor_name(sensor.id)
+            data.append(Reading(rom, type, value, name))
 
         return data
 
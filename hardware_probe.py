@@ -0,0 +1,266 @@
+"""
+Hardware probe - Detect which sensors are physically present
+
+Scans each /dev/i2c-* bus at the addresses of the supported I2C sensors
+(checking ID registers where the chips have them, and counting addresses a
+kernel driver already owns as present; a device that isn't a supported chip
+is reported as unknown and enables nothing), lists
+1-Wire slaves and hwmon chips, and caches the result in a small JSON file so
+the scan runs once per TTL rather than on every start. DriverLoader uses it to
+enable `enabled: auto` drivers, fill in their bus and address, and skip
+drivers whose hardware is missing.
+"""
+import errno
+import glob
+import json
+import logging
+import os
+import re
+import time
+
+from drivers import _paths
+
+# Seconds a saved probe result stays valid
+DEFAULT_PROBE_TTL_SEC = 86400
+
+# Addresses of supported I2C devices -> driver, or None where an ID register decides
+I2C_ADDRESSES = {
+    0x18: 'ds2482', 0x19: 'ds2482', 0x1a: 'ds2482', 0x1b: 'ds2482',
+    0x1d: None, 0x53: None,
+    0x23: 'bh1750', 0x5c: 'bh1750',
+    0x27: 'hih6130',
+    0x29: None, 0x39: None,
+    0x40: None,
+    0x48: None, 0x49: None, 0x4a: None, 0x4b: None,
+    0x60: None,
+    0x76: None, 0x77: None,
+}
+
+# Reported for a device at a known address that is none of the supported chips;
+# no driver is enabled for it
+UNKNOWN = 'unknown'
+
+# Drivers found through another driver's device (same chip family)
+ALIASES = {
+    'adxl343': 'adxl345',
+}
+
+# 1-Wire family codes of the temperature sensors w1thermsensor reads
+W1_THERM_FAMILIES = ('10-', '22-', '28-', '3b-', '42-')
+
+# Drivers whose hardware the probe can see; all others are left alone
+PROBED_DRIVERS = set(d for d in I2C_ADDRESSES.values() if d) | {
+    'adxl343', 'adxl345', 'bme280', 'bmp180', 'htu21d', 'mpl3115a2', 'tmp102', 'tsl2561', 'vl53l0x',
+    'w1_kernel', 'w1_kernel_gpio', 'lm_sensors',
+}
+
+
+def _is_tsl2561(bus, addr):
+    # ID register (command bit set): part number 0001 (TSL2561) or 0101 (TSL2560)
+    return bus.read_byte_data(addr, 0x8A) >> 4 in (0x1, 0x5)
+
+
+def _is_tmp102(bus, addr):
+    # No ID register: the configuration register's resolution bits read 11, and
+    # the 12-bit temperature leaves the low nibble clear
+    config = bus.read_i2c_block_data(addr, 0x01, 2)
+    temperature = bus.read_i2c_block_data(addr, 0x00, 2)
+    return config[0] & 0x60 == 0x60 and temperature[1] & 0x0F == 0
+
+
+def _identify(bus, addr):
+    """Return the driver for a device at an address ID registers decide, or UNKNOWN"""
+    try:
+        if addr in (0x76, 0x77):
+            chip_id = bus.read_byte_data(addr, 0xD0)
+            return {0x60: 'bme280', 0x55: 'bmp180'}.get(chip_id, UNKNOWN)
+        if addr == 0x60:
+            # MPL3115A2 WHO_AM_I
+            return 'mpl3115a2' if bus.read_byte_data(addr, 0x0C) == 0xC4 else UNKNOWN
+        if addr in (0x1d, 0x53):
+            # ADXL34x DEVID (0x53 is also where many EEPROMs sit)
+            return 'adxl345' if bus.read_byte_data(addr, 0x00) == 0xE5 else UNKNOWN
+        if addr == 0x40:
+            # HTU21D user register: 0x02 after reset; only resolution, battery and heater bits change
+            return 'htu21d' if bus.read_byte_data(addr, 0xE7) & 0x3A == 0x02 else UNKNOWN
+        if addr == 0x29:
+            # VL53L0X model ID, otherwise maybe a TSL2561 at its alternative address
+            if bus.read_byte_data(addr, 0xC0) == 0xEE:
+                return 'vl53l0x'
+            return 'tsl2561' if _is_tsl2561(bus, addr) else UNKNOWN
+        if addr == 0x39:
+            return 'tsl2561' if _is_tsl2561(bus, addr) else UNKNOWN
+        if addr == 0x49:
+            if _is_tsl2561(bus, addr):
+                return 'tsl2561'
+            return 'tmp102' if _is_tmp102(bus, addr) else UNKNOWN
+        if addr in (0x48, 0x4a, 0x4b):
+            return 'tmp102' if _is_tmp102(bus, addr) else UNKNOWN
+    except OSError:
+        return UNKNOWN
+    return UNKNOWN
+
+
+def _kernel_client(busnum, addr):
+    """sysfs directory of the kernel's I2C client at an address (e.g. a DS2482 after ds2482_init), or None"""
+    path = os.path.join(_paths.SYSFS_ROOT, 'bus', 'i2c', 'devices', f'{busnum}-{addr:04x}')
+    return path if os.path.isdir(path) else None
+
+
+def _kernel_client_driver(client):
+    """Driver for a kernel-bound client, from the chip name the kernel registered it with"""
+    try:
+        with open(os.path.join(client, 'name'), 'r') as f:
+            name = f.read().strip()
+    except OSError:
+        return None
+    return name if name in PROBED_DRIVERS else None
+
+
+def _present(bus, addr):
+    """Presence check the way i2cdetect does it by default"""
+    try:
+        if 0x30 <= addr <= 0x37 or 0x50 <= addr <= 0x5f:
+            # Quick writes can corrupt EEPROMs and some sensors; read a byte instead
+            bus.read_byte(addr)
+        else:
+            bus.write_quick(addr)
+        return True
+    except OSError as e:
+        # EBUSY: a kernel driver owns the address, so something is there
+        return e.errno == errno.EBUSY
+
+
+def scan_i2c():
+    """
+    Scan every /dev/i2c-N at the known sensor addresses
+
+    Returns:
+        Dict of bus number (as str) -> {address ('0x76'): driver, or 'unknown'
+        for a device that isn't a supported chip}, or None if the buses could
+        not be scanned (no smbus module)
+    """
+    pattern = os.path.join(_paths.DEV_ROOT, 'i2c-*')
+    buses = sorted(int(m.group(1)) for m in (re.search(r'i2c-(\d+)$', p) for p in glob.glob(pattern)) if m)
+    if not buses:
+        return {}
+    try:
+        import smbus
+    except ImportError:
+        logging.warning('Hardware probe: smbus not installed, I2C not scanned')
+        return None
+
+    found = {}
+    for busnum in buses:
+        try:
+            bus = smbus.SMBus(busnum)
+        except OSError as e:
+            logging.warning(f'Hardware probe: cannot open i2c-{busnum}: {e}')
+            continue
+        devices = found[str(busnum)] = {}
+        try:
+            for addr, driver in sorted(I2C_ADDRESSES.items()):
+                # Addresses bound by a kernel driver refuse userspace access (EBUSY)
+                client = _kernel_client(busnum, addr)
+                if client is None and not _present(bus, addr):
+                    continue
+                driver = driver or (client and _kernel_client_driver(client)) or _identify(bus, addr)
+                devices[f'0x{addr:02x}'] = driver
+        finally:
+            bus.close()
+    return found
+
+
+def scan_w1():
+    """Return (bus masters, slave ids) registered with the kernel 1-Wire subsystem"""
+    names = sorted(os.path.basename(p) for p in glob.glob(os.path.join(_paths.W1_DEVICES_DIR, '*')))
+    masters = [n for n in names if n.startswith('w1_bus_master')]
+    slaves = [n for n in names if not n.startswith('w1_bus_master')]
+    return masters, slaves
+
+
+def scan_hwmon():
+    """Return the names of hwmon chips that expose temperatures"""
+    chips = []
+    for path in sorted(glob.glob(os.path.join(_paths.HWMON_DIR, 'hwmon*'))):
+        if not glob.glob(os.path.join(path, 'temp*_input')):
+            continue
+        try:
+            with open(os.path.join(path, 'name'), 'r') as f:
+                chips.append(f.read().strip())
+        except OSError:
+            chips.append(os.path.basename(path))
+    return chips
+
+
+def probe_hardware():
+    """Run all scans and return a JSON-serialisable result"""
+    start = time.monotonic()
+    masters, slaves = scan_w1()
+    result = {
+        'time': time.time(),
+        'i2c': scan_i2c(),
+        'w1_masters': masters,
+        'w1_slaves': slaves,
+        'hwmon': scan_hwmon(),
+    }
+    logging.info(f'Hardware probe took {time.monotonic() - start:.2f}s')
+    return result
+
+
+def load_probe(cache_file, ttl=DEFAULT_PROBE_TTL_SEC):
+    """Return the saved probe result if younger than ttl, otherwise probe and save"""
+    try:
+        with open(cache_file, 'r') as f:
+            result = json.load(f)
+        if time.time() - result.get('time', 0) < ttl:
+            return result
+    except (OSError, ValueError):
+        pass
+
+    result = probe_hardware()
+    try:
+        with open(cache_file, 'w') as f:
+            json.dump(result, f, indent=2)
+    except OSError as e:
+        logging.warning(f'Cannot save hardware probe to {cache_file}: {e}')
+    return result
+
+
+def detected_drivers(result):
+    """
+    Map a probe result to drivers whose hardware is present
+
+    Returns:
+        Dict of driver name -> list of locations (dicts with i2c_bus and
+        i2c_address for I2C devices, empty for 1-Wire and hwmon), and the set
+        of driver names the result can say nothing about
+    """
+    detected = {}
+    unknown = set()
+
+    i2c = result.get('i2c')
+    if i2c is None:
+        unknown |= {d for d in PROBED_DRIVERS if d not in ('w1_kernel', 'w1_kernel_gpio', 'lm_sensors')}
+    else:
+        for busnum, devices in sorted(i2c.items(), key=lambda item: int(item[0])):
+            for address, driver in sorted(devices.items()):
+                if driver == UNKNOWN:
+                    continue
+                detected.setdefault(driver, []).append({'i2c_bus': int(busnum), 'i2c_address': address})
+        for alias, driver in ALIASES.items():
+            if driver in detected:
+                detected[alias] = detected[driver]
+
+    if any(s.startswith(W1_THERM_FAMILIES) for s in result.get('w1_slaves', [])):
+        detected['w1_kernel'] = detected['w1_kernel_gpio'] = [{}]
+    if result.get('hwmon'):
+        detected['lm_sensors'] = [{}]
+    return detected, unknown
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    result = probe_hardware()
+    print(json.dumps(result, indent=2))
+    print(f"Detected drivers: {', '.join(sorted(detected_drivers(result)[0])) or 'none'}")
@@ -1,16 +1,17 @@
 """
 Nettemp Cloud Client - Send sensor data to cloud API
 """
-import requests
 import time
 import json
 import hashlib
 import sqlite3
 import os
 import logging
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Union
 from pathlib import Path
 
+from reading import Reading, as_readings
+
 
 class CloudClient:
     """Lightweight cloud client for Nettemp - supports multiple cloud servers"""
@@ -88,12 +89,12 @@ class CloudClient:
         except Exception as e:
             logging.error(f"Buffer init error: {e}")
 
-    def send(self, data: List[Dict]) -> bool:
+    def send(self, data: List[Union[Reading, Dict]]) -> bool:
         """
         Send data to all enabled cloud servers (works with old nettemp format)
 
         Args:
-            data: List of dicts with keys: rom, type, value, name
+            data: List of Readings (or legacy dicts with keys: rom, type, value, name)
 
         Returns:
             True if sent successfully to at least one server
@@ -161,23 +162,23 @@ class CloudClient:
 
         return sent_all
 
-    def _transform_data(self, data: List[Dict]) -> Dict:
-        """Transform old nettemp format to cloud format"""
+    def _transform_data(self, data: List[Union[Reading, Dict]]) -> Dict:
+        """Transform readings (or old nettemp dicts) to cloud format"""
         readings = []
 
-        for item in data:
+        for item in as_readings(data):
             # Parse old ROM format
-            sensor_info = self._parse_rom(item.get('rom', ''))
+            sensor_info = self._parse_rom(item.rom)
 
             readings.append({
                 'sensor_id': sensor_info['id'],
-                'sensor_type': item.get('type', ''),  # Send as-is, backend normalizes
-                'value': float(item.get('value', 0)),
-                'unit': item.get('unit', ''),  # Send unit if provided, backend fills if empty
-                'timestamp': int(time.time()),
+                'sensor_type': item.type,  # Send as-is, backend normalizes
+                'value': item.value,
+                'unit': item.unit,  # Send unit if provided, backend fills if empty
+                'timestamp': int(item.timestamp),
                 'metadata': {
-                    'name': item.get('name', ''),
-                    'original_rom': item.get('rom', '')
+                    'name': item.name,
+                    'original_rom': item.rom
                 }
             })
 
@@ -247,6 +248,8 @@ class CloudClient:
 
     def _send_to_cloud(self, data: Dict, server: Dict[str, str]) -> bool:
         """Send data to specific cloud server"""
+        import requests
+
         url = server['url']
         api_key = server['api_key']
         name = server.get('name', url)
@@ -359,11 +362,13 @@ class insert2:
     """Drop-in replacement for old nettemp.insert2 with cloud support"""
 
     def __init__(self, data):
-        self.data = data
+        # Accepts Readings or legacy dicts; dicts are parsed once here
+        self.data = as_readings(data)
         self._cloud_client = None
 
     def request(self):
         """Send to both local server and cloud"""
+        import requests
         import yaml
         import socket
         import os
@@ -384,20 +389,28 @@ class insert2:
         # can force a single canonical device_id for both local and cloud sends.
         group = os.environ.get('CLOUD_GROUP', config.get('group', socket.gethostname()))
 
-        # Add group to data
-        for d in self.data:
-            d['group'] = group
+        # Prefix roms with the group. Readings may be shared with the driver
+        # loader's cache, so prefixed copies are made instead of editing them.
+        prefixed = []
+        for r in self.data:
             # Avoid double-underscores when drivers supply roms that start with '_'.
             # Normalize by stripping leading underscores from rom before joining with group.
-            rom_raw = d.get('rom', '') or ''
+            rom_raw = r.rom or ''
             if not rom_raw.startswith(group):
-                d['rom'] = f"{group}_{rom_raw.lstrip('_')}"
+                r = r.copy(rom=f"{group}_{rom_raw.lstrip('_')}")
+            prefixed.append(r)
+        self.data = prefixed
 
-        # 1. Send to old local server
+        # 1. Send to old local server (legacy dict format)
         server = config.get('server')
         server_api_key = config.get('server_api_key')
 
         if server and server_api_key:
+            legacy = []
+            for r in self.data:
+                d = r.to_dict()
+                d['group'] = group
+                legacy.append(d)
             try:
                 requests.post(
                     server,
@@ -405,7 +418,7 @@ class insert2:
                         'Content-Type': 'application/json',
                         'Authorization': f'Bearer {server_api_key}'
                     },
-                    json=self.data,
+                    json=legacy,
                     verify=False,
                     timeout=5
                 )
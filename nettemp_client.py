@@ -20,10 +20,8 @@ import argparse
 import subprocess
 from pathlib import Path
 
-try:
-    from apscheduler.schedulers.background import BackgroundScheduler
-except Exception:
-    BackgroundScheduler = None
+# Reference point for the startup profile logged after the first upload
+PROCESS_START = time.monotonic()
 
 sys.path.insert(0, str(Path(__file__).parent))
 
@@ -31,12 +29,19 @@ from nettemp import CloudClient, insert2
 from driver_loader import DriverLoader
 from bridge import HTTPBridge
 
+IMPORTS_DONE = time.monotonic()
+
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
 # Quiet down APScheduler noise (job executed/run messages)
 logging.getLogger('apscheduler').setLevel(logging.WARNING)
 
 PIDFILE = Path(__file__).parent / '.nettemp_client.pid'
 
+# How late (seconds) a driver job may start before the run is dropped
+DEFAULT_MISFIRE_GRACE_SEC = 30
+# How often (seconds) driver timeout/error counters are written to the log
+DEFAULT_STATS_LOG_SEC = 600
+
 
 def is_process_running(pid: int) -> bool:
     try:
@@ -70,53 +75,162 @@ def remove_pidfile():
         logging.debug(f'Failed to remove pidfile: {e}')
 
 
+def create_scheduler(backend: str | None = None, max_workers: int | None = None):
+    """
+    Create the job scheduler.
+
+    backend: 'apscheduler', 'builtin', or None to use APScheduler when it is
+    installed and fall back to the built-in scheduler otherwise.
+    max_workers: threads running jobs; each job blocks one for up to its
+    drivers' timeout (default: the scheduler's own, 10 for both).
+    """
+    if backend != 'builtin':
+        try:
+            from apscheduler.schedulers.background import BackgroundScheduler
+            if max_workers is None:
+                return BackgroundScheduler()
+            from apscheduler.executors.pool import ThreadPoolExecutor
+            return BackgroundScheduler(executors={'default': ThreadPoolExecutor(max_workers)})
+        except ImportError:
+            if backend == 'apscheduler':
+                raise RuntimeError('apscheduler is required: pip install apscheduler')
+            logging.info('apscheduler not installed, using built-in scheduler')
+    from scheduler import SimpleScheduler
+    if max_workers is None:
+        return SimpleScheduler()
+    return SimpleScheduler(max_workers=max_workers)
+
+
 class NettempClient:
     def __init__(self, config_file='config.conf', drivers_config='drivers_config.yaml', bg_mode: bool = False):
-        if BackgroundScheduler is None:
-            raise RuntimeError('apscheduler is required: pip install apscheduler')
-        self.loader = DriverLoader(config_file=drivers_config)
+        init_start = time.monotonic()
         self.cloud_client = CloudClient(config_file)
+        self.runtime = self.cloud_client.config.get('runtime') or {}
+        self.loader = DriverLoader(config_file=drivers_config, settings=self.runtime)
         self.config_file = config_file
         self.bg_mode = bg_mode
-        self.scheduler = BackgroundScheduler()
+        self.misfire_grace_time = int(self.runtime.get('misfire_grace_sec', DEFAULT_MISFIRE_GRACE_SEC))
+        self.stats_log_interval = int(self.runtime.get('stats_log_sec', DEFAULT_STATS_LOG_SEC))
+        self.scheduler = create_scheduler(self.runtime.get('scheduler'), self._scheduler_workers())
         self.bridge = HTTPBridge(
             self.cloud_client,
             self.cloud_client.device_id,
-            self.cloud_client.config.get('http_bridge')
+            self.cloud_client.config.get('http_bridge'),
+            loader=self.loader
         )
-
-
-    def read_and_send(self, driver_name, driver_config):
+        # Seconds since process start for each startup milestone
+        self.startup = {
+            'imports': IMPORTS_DONE - PROCESS_START,
+            'init': time.monotonic() - init_start,
+        }
+        self.first_reading = {}
+        self.profile_logged = False
+
+
+    def _scheduler_workers(self):
+        """runtime.scheduler_max_workers, else one thread per scheduled job and at least 10"""
+        if self.runtime.get('scheduler_max_workers'):
+            return max(1, int(self.runtime['scheduler_max_workers']))
+        from scheduler import DEFAULT_MAX_WORKERS
+        # A hung driver holds its job's thread until the timeout; it mustn't starve the other jobs
+        return max(DEFAULT_MAX_WORKERS, len(self.loader.get_driver_jobs(self.loader.config)))
+
+    def _read_driver(self, driver_name, driver_config):
+        if self.loader.in_backoff(driver_name):
+            # Failing driver is waiting out its backoff; the loader logs state changes
+            return []
         readings = self.loader.run_driver(driver_name, driver_config)
         if not readings:
             logging.warning(f'No readings from {driver_name}')
-            return
+            return []
+
+        if driver_name not in self.first_reading:
+            self.first_reading[driver_name] = time.monotonic() - PROCESS_START
 
         # Single-line log with driver name and values
         try:
             summary = "; ".join(
-                f"{r.get('name', r.get('rom', 'unknown'))}={r.get('value')}"
+                f"{r.name or r.rom or 'unknown'}={r.value:g}"
                 for r in readings
             )
         except Exception:
             summary = str(readings)
         logging.info(f"Reading: {driver_name} {summary}")
+        return readings
+
+    def read_and_send_batch(self, job_id, drivers):
+        """Read drivers back-to-back and upload all their readings in one request."""
+        readings = []
+        for driver_name, driver_config in drivers:
+            readings.extend(self._read_driver(driver_name, driver_config))
+        if not readings:
+            return
 
         try:
             sender = insert2(readings)
             sender.request()
-            #logging.info(f'Sent {len(readings)} readings for {driver_name}')
+            #logging.info(f'Sent {len(readings)} readings for {job_id}')
         except Exception as e:
-            logging.error(f'Failed to send {driver_name}: {e}')
+            logging.error(f'Failed to send {job_id}: {e}')
+            return
+
+        if not self.profile_logged:
+            self.profile_logged = True
+            self.startup['first_upload'] = time.monotonic() - PROCESS_START
+            self._log_startup_profile()
+
+    def _log_startup_profile(self):
+        """Log where the time to first upload went, per startup step and per driver module."""
+        s = self.startup
+        logging.info(
+            f"Startup profile: imports {s['imports']:.2f}s, client init {s['init']:.2f}s, "
+            f"scheduler up at {s.get('scheduler', 0):.2f}s, first upload at {s['first_upload']:.2f}s"
+        )
+        stats = self.loader.get_driver_stats()
+        for name in sorted(set(self.loader.load_times) | set(self.first_reading)):
+            load = self.loader.load_times.get(name)
+            first = self.first_reading.get(name)
+            duration = stats.get(name, {}).get('last_duration')
+            logging.info(
+                f"Startup profile: {name} import "
+                f"{f'{load:.2f}s' if load is not None else '-'}, first reading at "
+                f"{f'{first:.2f}s' if first is not None else '-'}, read took "
+                f"{f'{duration:.2f}s' if duration is not None else '-'}"
+            )
+
+    def _add_driver_job(self, job_id, drivers, interval):
+        # A late run is dropped after misfire_grace_time and a backlog of missed
+        # runs collapses into one (coalesce); never run the same job twice at once.
+        self.scheduler.add_job(
+            self.read_and_send_batch, 'interval', seconds=interval, args=[job_id, drivers], id=job_id,
+            misfire_grace_time=self.misfire_grace_time, coalesce=True, max_instances=1
+        )
+        names = ', '.join(name for name, _ in drivers)
+        if len(drivers) > 1:
+            logging.info(f'Scheduled {job_id} ({names}) every {interval}s')
+        else:
+            logging.info(f'Scheduled {names} every {interval}s')
 
     def schedule_drivers(self):
-        enabled = self.loader.get_enabled_drivers()
-        for name, cfg in enabled:
-            interval = int(cfg.get('read_in_sec', 60))
-            if self.scheduler.get_job(name):
+        for job_id, drivers, interval in self.loader.get_driver_jobs(self.loader.config):
+            if self.scheduler.get_job(job_id):
                 continue
-            self.scheduler.add_job(self.read_and_send, 'interval', seconds=interval, args=[name, cfg], id=name)
-            logging.info(f'Scheduled {name} every {interval}s')
+            self._add_driver_job(job_id, drivers, interval)
+
+    def _log_driver_stats(self):
+        """Log drivers that timed out, failed or were skipped since startup."""
+        for name, stats in sorted(self.loader.get_driver_stats().items()):
+            if stats.get('timeouts') or stats.get('errors') or stats.get('skipped') or stats.get('restarts'):
+                logging.warning(
+                    f"Driver stats {name}: runs={stats.get('runs', 0)} timeouts={stats.get('timeouts', 0)} "
+                    f"errors={stats.get('errors', 0)} skipped={stats.get('skipped', 0)} "
+                    f"restarts={stats.get('restarts', 0)} last={stats.get('last_duration')}s"
+                )
+        for name, health in sorted(self.loader.get_driver_health().items()):
+            logging.warning(
+                f"Driver health {name}: {health['state']} after {health['failures']} failures, "
+                f"retry in {health['retry_in']:g}s, last error: {health['last_error']}"
+            )
 
     def _reschedule_drivers(self):
         """Reload driver config and reschedule jobs to match enabled drivers."""
@@ -124,6 +238,9 @@ class NettempClient:
         new_config = self.loader.load_config()
         self.loader.config = new_config
 
+        # drivers reopen with their new config on the next read
+        self.loader.close_drivers()
+
         # remove all existing driver jobs
         for job in list(self.scheduler.get_jobs()):
             try:
@@ -133,13 +250,11 @@ class NettempClient:
                 logging.debug(f'Failed to remove job: {job.id}')
 
         # schedule according to new config
-        enabled = self.loader.load_drivers_from_config(new_config)
-        for name, cfg, interval in enabled:
+        for job_id, drivers, interval in self.loader.get_driver_jobs(new_config):
             try:
-                self.scheduler.add_job(self.read_and_send, 'interval', seconds=int(interval), args=[name, cfg], id=name)
-                logging.info(f'Scheduled {name} every {int(interval)}s')
+                self._add_driver_job(job_id, drivers, int(interval))
             except Exception as e:
-                logging.error(f'Failed to schedule {name}: {e}')
+                logging.error(f'Failed to schedule {job_id}: {e}')
 
     def _restart_process(self):
         """Restart the current process (exec into new instance)."""
@@ -152,8 +267,13 @@ class NettempClient:
     def start(self):
         self.schedule_drivers()
         self.scheduler.start()
+        self.startup['scheduler'] = time.monotonic() - PROCESS_START
         logging.info('Runner started')
 
+        # Import driver modules in the background so first reads don't pay for it
+        if self.runtime.get('warm_up', True):
+            self.loader.warm_up(self.loader.get_enabled_drivers())
+
         # track drivers_config.yaml mtime for reloads
         drivers_mtime = None
         try:
@@ -174,10 +294,16 @@ class NettempClient:
         if self.bridge:
             self.bridge.start()
 
+        stats_logged = time.monotonic()
+
         try:
             while True:
                 time.sleep(1)
 
+                if self.stats_log_interval and time.monotonic() - stats_logged >= self.stats_log_interval:
+                    stats_logged = time.monotonic()
+                    self._log_driver_stats()
+
                 # poll drivers_config.yaml for changes and reschedule if changed
                 try:
                     if self.loader.config_file.exists():
@@ -205,6 +331,7 @@ class NettempClient:
         except KeyboardInterrupt:
             logging.info('Stopping runner')
             self.scheduler.shutdown()
+            self.loader.shutdown()
             if self.bridge:
                 self.bridge.stop()
 
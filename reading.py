@@ -0,0 +1,75 @@
+"""
+Reading - Compact sensor reading passed from drivers to the uploaders
+"""
+import logging
+import time
+
+
+class Reading:
+    """
+    One numeric sensor value
+
+    Drivers return lists of these, and DriverLoader, insert2, CloudClient and the
+    HTTP bridge pass them through unchanged. The legacy dict format
+    ({rom, type, value, name, unit}) is only produced or parsed at the edges: the
+    local server POST, legacy function drivers and legacy bridge payloads.
+    """
+
+    __slots__ = ('rom', 'type', 'value', 'name', 'unit', 'timestamp')
+
+    def __init__(self, rom, type, value, name='', unit='', timestamp=None):
+        self.rom = rom
+        self.type = type
+        self.value = float(value)
+        self.name = name
+        self.unit = unit
+        # Time the value was read (epoch seconds), not the time it is uploaded
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @classmethod
+    def from_dict(cls, item):
+        """Build a Reading from a legacy dict; raises ValueError/TypeError on a bad value"""
+        return cls(
+            item.get('rom', ''),
+            item.get('type', ''),
+            item.get('value', 0),
+            item.get('name', ''),
+            item.get('unit', ''),
+            item.get('timestamp'),
+        )
+
+    def copy(self, **changes):
+        """Return a copy with some fields replaced, e.g. r.copy(rom='group_' + r.rom)"""
+        fields = {name: getattr(self, name) for name in self.__slots__}
+        fields.update(changes)
+        return Reading(**fields)
+
+    def to_dict(self):
+        """Legacy dict format used by the local nettemp server"""
+        data = {'rom': self.rom, 'type': self.type, 'value': self.value, 'name': self.name}
+        if self.unit:
+            data['unit'] = self.unit
+        return data
+
+    def __eq__(self, other):
+        if not isinstance(other, Reading):
+            return NotImplemented
+        return (self.rom, self.type, self.value, self.name, self.unit) == \
+            (other.rom, other.type, other.value, other.name, other.unit)
+
+    def __repr__(self):
+        return f'Reading({self.rom!r}, {self.type!r}, {self.value!r}, {self.name!r})'
+
+
+def as_readings(items):
+    """Convert a list of Readings and/or legacy dicts to Readings, dropping unparsable items"""
+    readings = []
+    for item in items or []:
+        if isinstance(item, Reading):
+            readings.append(item)
+            continue
+        try:
+            readings.append(Reading.from_dict(item))
+        except (AttributeError, TypeError, ValueError):
+            logging.warning(f'Dropping reading with invalid value: {item!r}')
+    return readings
@@ -0,0 +1,165 @@
+"""
+Lightweight scheduler - Built-in replacement for APScheduler's BackgroundScheduler
+
+Implements the small part of the APScheduler API the client uses (interval jobs,
+add_job/get_job/get_jobs/remove_job, start/shutdown) with a heap-based timer
+thread and a small thread pool, so low-memory boards don't need to import
+APScheduler at all.
+"""
+import heapq
+import itertools
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Worker threads running jobs (APScheduler's default too); set runtime.scheduler_max_workers
+DEFAULT_MAX_WORKERS = 10
+
+
+class Job:
+    """One interval job"""
+
+    __slots__ = ('id', 'func', 'args', 'kwargs', 'interval', 'jitter', 'misfire_grace_time',
+                 'coalesce', 'max_instances', 'next_run_time', 'running', 'version')
+
+    def __init__(self, job_id, func, args, kwargs, interval, jitter, misfire_grace_time, coalesce, max_instances):
+        self.id = job_id
+        self.func = func
+        self.args = tuple(args or ())
+        self.kwargs = dict(kwargs or {})
+        self.interval = float(interval)
+        self.jitter = float(jitter or 0)
+        self.misfire_grace_time = misfire_grace_time
+        self.coalesce = coalesce
+        self.max_instances = max(1, int(max_instances))
+        self.next_run_time = None
+        self.running = 0
+        self.version = 0
+
+    def __repr__(self):
+        return f'<Job id={self.id} interval={self.interval:g}s>'
+
+
+class SimpleScheduler:
+    """Heap-based interval scheduler with an APScheduler-compatible subset of methods"""
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self.jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._executor = None
+        self._running = False
+
+    def add_job(self, func, trigger='interval', seconds=None, minutes=None, args=None, kwargs=None, id=None,
+                jitter=None, misfire_grace_time=1, coalesce=True, max_instances=1, replace_existing=False, **_):
+        """Add an interval job; the first run is one interval from now (like APScheduler)"""
+        if trigger != 'interval':
+            raise ValueError(f'Unsupported trigger: {trigger}')
+        interval = (seconds or 0) + (minutes or 0) * 60
+        if interval <= 0:
+            raise ValueError('Interval must be positive')
+        job_id = id or f'{getattr(func, "__name__", "job")}-{next(self._seq)}'
+
+        with self._cond:
+            old = self.jobs.get(job_id)
+            if old is not None and not replace_existing:
+                raise ValueError(f'Job {job_id} already exists')
+            job = Job(job_id, func, args, kwargs, interval, jitter, misfire_grace_time, coalesce, max_instances)
+            # Unique per job object, so heap entries of a removed or replaced job never match it
+            job.version = next(self._seq)
+            self.jobs[job_id] = job
+            self._push(job, time.monotonic() + interval)
+            self._cond.notify()
+        return job
+
+    def get_job(self, job_id):
+        with self._cond:
+            return self.jobs.get(job_id)
+
+    def get_jobs(self):
+        with self._cond:
+            return list(self.jobs.values())
+
+    def remove_job(self, job_id):
+        with self._cond:
+            if self.jobs.pop(job_id, None) is None:
+                raise KeyError(job_id)
+            # The stale heap entry is dropped when it comes due
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scheduler')
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+
+    def shutdown(self, wait=True):
+        with self._cond:
+            self._running = False
+            self._cond.notify()
+        if self._thread:
+            self._thread.join(5 if wait else 0)
+        if self._executor:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _push(self, job, scheduled):
+        # Jitter shifts a single run; the base schedule stays on the interval grid
+        job.next_run_time = scheduled
+        run_at = scheduled + (random.uniform(0, job.jitter) if job.jitter else 0)
+        heapq.heappush(self._heap, (run_at, next(self._seq), job.id, job.version, scheduled))
+
+    def _loop(self):
+        with self._cond:
+            while self._running:
+                now = time.monotonic()
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                run_at, _, job_id, version, scheduled = self._heap[0]
+                if run_at > now:
+                    self._cond.wait(run_at - now)
+                    continue
+                heapq.heappop(self._heap)
+
+                job = self.jobs.get(job_id)
+                if job is None or job.version != version:
+                    continue
+                self._dispatch(job, now - run_at)
+
+                next_time = scheduled + job.interval
+                if next_time <= now and job.coalesce:
+                    # Collapse missed runs into the next slot on the grid
+                    missed = int((now - next_time) // job.interval) + 1
+                    next_time += missed * job.interval
+                self._push(job, next_time)
+
+    def _dispatch(self, job, lateness):
+        # Called with self._cond held
+        grace = job.misfire_grace_time
+        if grace is not None and lateness > grace:
+            logging.warning(f'Run of job {job.id} missed by {lateness:.1f}s, skipping')
+            return
+        if job.running >= job.max_instances:
+            logging.warning(f'Job {job.id} still running ({job.running} instances), skipping')
+            return
+        job.running += 1
+        try:
+            self._executor.submit(self._run, job)
+        except RuntimeError:
+            job.running -= 1
+
+    def _run(self, job):
+        try:
+            job.func(*job.args, **job.kwargs)
+        except Exception:
+            logging.exception(f'Job {job.id} raised an exception')
+        finally:
+            with self._cond:
+                job.running -= 1
@@ -0,0 +1,1158 @@
+#!/usr/bin/env python3
+"""
+Simulation layer - Run the real drivers without sensor hardware
+
+Installs stand-ins for the bus and sensor libraries the drivers import
+(smbus, Adafruit_PureIO.smbus, board/busio, adafruit_dht and the other
+adafruit sensor libraries, Adafruit_BMP, w1thermsensor, sdm_modbus, gpiozero)
+and builds a fake sysfs tree with 1-Wire slaves, hwmon chips and a
+`sensors` script. I2C devices are register-map models, so driver code runs
+its real read path: calibration reads, command writes and data decoding.
+
+Each bus transaction can be given a latency and a failure rate, and sensor
+conversion times (DHT, 1-Wire, VL53L0X...) are scaled by `time_scale`, which
+makes driver latency measurable and repeatable on a plain Linux machine.
+
+    from simulation import Simulation
+
+    with Simulation({'error_rate': 0.01, 'time_scale': 0}) as sim:
+        sim.i2c_device(1, 0x76).temperature = 25.0
+        loader = DriverLoader(config_file=...)
+        readings = loader.run_driver('bme280', {'i2c_bus': 1})
+
+Run `python3 simulation.py` to read every simulated driver once.
+
+Isolated drivers (`isolate: true`) run in a fresh process that does not see
+the stand-in modules; run them in-process when simulating.
+"""
+import enum
+import errno
+import json
+import logging
+import math
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import types
+
+from drivers import _i2c, _paths
+
+# Default simulated hardware: one of each supported I2C sensor on bus 1
+DEFAULT_I2C_DEVICES = [
+    {'model': 'bme280', 'address': 0x76, 'temperature': 21.5, 'pressure': 1013.25, 'humidity': 45.0},
+    {'model': 'bmp180', 'address': 0x77, 'temperature': 21.0, 'pressure': 1012.8},
+    {'model': 'bh1750', 'address': 0x23, 'lux': 320.0},
+    {'model': 'hih6130', 'address': 0x27, 'temperature': 22.4, 'humidity': 41.0},
+    {'model': 'htu21d', 'address': 0x40, 'temperature': 22.1, 'humidity': 43.5},
+    {'model': 'tmp102', 'address': 0x48, 'temperature': 23.25},
+    {'model': 'tsl2561', 'address': 0x39, 'lux': 180.0},
+    {'model': 'vl53l0x', 'address': 0x29, 'distance_mm': 412},
+    {'model': 'adxl345', 'address': 0x53, 'acceleration': (0.0, 0.0, 9.81)},
+    {'model': 'mpl3115a2', 'address': 0x60, 'temperature': 20.5, 'pressure': 101.3, 'altitude': 120.0},
+]
+DEFAULT_W1_SENSORS = [
+    {'id': '28-000007165506', 'temperature': 21.75},
+    {'id': '28-0000071a2b3c', 'temperature': 4.5},
+]
+DEFAULT_DHT = {4: {'model': 'dht22', 'temperature': 22.3, 'humidity': 48.0}}
+DEFAULT_SDM = {'/dev/ttyUSB0': {1: {'voltage': 231.4, 'current': 1.27, 'power_active': 287.9}}}
+DEFAULT_HWMON = [{'name': 'cpu_thermal', 'temps': {'temp1': 48.3}}]
+
+# Conversion times (seconds, before time_scale) of sensors whose libraries wait for a result
+W1_CONVERSION_SEC = 0.75
+DHT_READ_SEC = 0.025
+DHT_MIN_INTERVAL_SEC = 2.0
+VL53L0X_TIMING_BUDGET_SEC = 0.033
+HTU21D_CONVERSION_SEC = 0.05
+TSL2561_INTEGRATION_SEC = 0.101
+SDM_REQUEST_SEC = 0.08
+
+_sim = None
+
+
+def _active():
+    if _sim is None:
+        raise RuntimeError('Simulation is not installed')
+    return _sim
+
+
+def _remote_io_error():
+    return OSError(errno.EREMOTEIO, os.strerror(errno.EREMOTEIO))
+
+
+# ---------------------------------------------------------------------------
+# I2C device models
+# ---------------------------------------------------------------------------
+
+class I2CDeviceModel:
+    """
+    Register-file I2C device: a write sets the register pointer (first byte)
+    and stores any following bytes; a read returns bytes from the pointer on,
+    auto-incrementing. Subclasses refresh data registers in refresh().
+    """
+
+    def __init__(self, address, latency_ms=None, error_rate=None, noise=0.0, **values):
+        self.address = address
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.noise = noise
+        self.fail_next = 0
+        self.regs = bytearray(256)
+        self.pointer = 0
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def sample(self, value):
+        """Current value of a quantity, with the configured noise"""
+        if self.noise and _sim is not None:
+            return value + _sim.random.gauss(0, self.noise)
+        return value
+
+    def refresh(self):
+        """Update data registers from the current values before a read"""
+
+    def on_write(self, register, value):
+        """Called for each register written"""
+
+    def write(self, data):
+        if not data:
+            return
+        self.pointer = data[0]
+        for offset, value in enumerate(data[1:]):
+            register = (self.pointer + offset) & 0xFF
+            self.regs[register] = value
+            self.on_write(register, value)
+
+    def read(self, length):
+        self.refresh()
+        data = bytes(self.regs[(self.pointer + i) & 0xFF] for i in range(length))
+        self.pointer = (self.pointer + length) & 0xFF
+        return data
+
+
+class CommandDeviceModel(I2CDeviceModel):
+    """Device that answers reads with a frame for the last command instead of a register file"""
+
+    def __init__(self, address, **kwargs):
+        self.command = None
+        super().__init__(address, **kwargs)
+
+    def write(self, data):
+        if data:
+            self.command = data[0]
+
+    def frame(self, command):
+        raise NotImplementedError
+
+    def read(self, length):
+        frame = self.frame(self.command)
+        return bytes(frame[i] if i < len(frame) else 0xFF for i in range(length))
+
+
+class BME280Model(I2CDeviceModel):
+    """BME280 with real calibration registers; raw ADC values are solved from the target readings"""
+
+    # Trimming parameters of a production part
+    CALIBRATION = {
+        'T1': 27504, 'T2': 26435, 'T3': -1000,
+        'P1': 36477, 'P2': -10685, 'P3': 3024, 'P4': 2855, 'P5': 140, 'P6': -7,
+        'P7': 15500, 'P8': -14600, 'P9': 6000,
+        'H1': 75, 'H2': 362, 'H3': 0, 'H4': 313, 'H5': 50, 'H6': 30,
+    }
+    CHIP_ID = 0x60
+
+    def __init__(self, address=0x76, temperature=21.5, pressure=1013.25, humidity=45.0, **kwargs):
+        super().__init__(address, temperature=temperature, pressure=pressure, humidity=humidity, **kwargs)
+        c = self.CALIBRATION
+        self.regs[0xD0] = self.CHIP_ID
+        self.regs[0x88:0x8E] = struct.pack('<Hhh', c['T1'], c['T2'], c['T3'])
+        self.regs[0x8E:0xA0] = struct.pack('<Hhhhhhhhh', c['P1'], c['P2'], c['P3'], c['P4'], c['P5'],
+                                           c['P6'], c['P7'], c['P8'], c['P9'])
+        self.regs[0xA1] = c['H1']
+        self.regs[0xE1:0xE3] = struct.pack('<h', c['H2'])
+        self.regs[0xE3] = c['H3']
+        self.regs[0xE4] = (c['H4'] >> 4) & 0xFF
+        self.regs[0xE5] = (c['H4'] & 0x0F) | ((c['H5'] & 0x0F) << 4)
+        self.regs[0xE6] = (c['H5'] >> 4) & 0xFF
+        self.regs[0xE7] = c['H6'] & 0xFF
+
+    def _compensate_t(self, raw):
+        c = self.CALIBRATION
+        var1 = (raw / 16384.0 - c['T1'] / 1024.0) * c['T2']
+        var2 = ((raw / 131072.0 - c['T1'] / 8192.0) ** 2) * c['T3']
+        return (var1 + var2) / 5120.0, int(var1 + var2)
+
+    def _compensate_p(self, raw, t_fine):
+        c = self.CALIBRATION
+        var1 = t_fine / 2.0 - 64000.0
+        var2 = var1 * var1 * c['P6'] / 32768.0
+        var2 = var2 + var1 * c['P5'] * 2.0
+        var2 = var2 / 4.0 + c['P4'] * 65536.0
+        var1 = (c['P3'] * var1 * var1 / 524288.0 + c['P2'] * var1) / 524288.0
+        var1 = (1.0 + var1 / 32768.0) * c['P1']
+        p = ((1048576.0 - raw) - var2 / 4096.0) * 6250.0 / var1
+        var1 = c['P9'] * p * p / 2147483648.0
+        var2 = p * c['P8'] / 32768.0
+        return p + (var1 + var2 + c['P7']) / 16.0
+
+    def _compensate_h(self, raw, t_fine):
+        c = self.CALIBRATION
+        h = t_fine - 76800.0
+        h = (raw - (c['H4'] * 64.0 + c['H5'] / 16384.8 * h)) * (
+            c['H2'] / 65536.0 * (1.0 + c['H6'] / 67108864.0 * h * (1.0 + c['H3'] / 67108864.0 * h)))
+        return h * (1.0 - c['H1'] * h / 524288.0)
+
+    @staticmethod
+    def _solve(func, target, top, increasing=True):
+        low, high = 0, top
+        while low < high:
+            mid = (low + high) // 2
+            if (func(mid) < target) == increasing:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def refresh(self):
+        raw_t = self._solve(lambda r: self._compensate_t(r)[0], self.sample(self.temperature), (1 << 20) - 1)
+        t_fine = self._compensate_t(raw_t)[1]
+        raw_p = self._solve(lambda r: self._compensate_p(r, t_fine), self.sample(self.pressure) * 100,
+                            (1 << 20) - 1, increasing=False)
+        raw_h = self._solve(lambda r: self._compensate_h(r, t_fine), self.sample(self.humidity), 0xFFFF)
+        for register, raw in ((0xF7, raw_p), (0xFA, raw_t)):
+            self.regs[register:register + 3] = bytes(((raw >> 12) & 0xFF, (raw >> 4) & 0xFF, (raw & 0x0F) << 4))
+        self.regs[0xFD:0xFF] = struct.pack('>H', raw_h)
+
+
+class BMP180Model(I2CDeviceModel):
+    """BMP180: chip ID only; the Adafruit_BMP stand-in reads values from the model"""
+
+    def __init__(self, address=0x77, temperature=21.0, pressure=1012.8, **kwargs):
+        super().__init__(address, temperature=temperature, pressure=pressure, **kwargs)
+        self.regs[0xD0] = 0x55
+
+
+class BH1750Model(CommandDeviceModel):
+    """BH1750: a measurement command is answered with 2 bytes of lux * 1.2"""
+
+    def __init__(self, address=0x23, lux=320.0, **kwargs):
+        super().__init__(address, lux=lux, **kwargs)
+
+    def frame(self, command):
+        return struct.pack('>H', max(0, min(0xFFFF, int(self.sample(self.lux) * 1.2))))
+
+
+class HIH6130Model(CommandDeviceModel):
+    """HIH6130: 4-byte frame of status, 14-bit humidity and 14-bit temperature"""
+
+    def __init__(self, address=0x27, temperature=22.4, humidity=41.0, **kwargs):
+        super().__init__(address, temperature=temperature, humidity=humidity, **kwargs)
+
+    def frame(self, command):
+        rh = int(round(self.sample(self.humidity) / 100.0 * (2 ** 14 - 1))) & 0x3FFF
+        t = int(round((self.sample(self.temperature) + 40) / 165.0 * (2 ** 14 - 1))) & 0x3FFF
+        return bytes((rh >> 8, rh & 0xFF, t >> 6, (t & 0x3F) << 2))
+
+
+class HTU21DModel(CommandDeviceModel):
+    """HTU21D: temperature (0xE3/0xF3) and humidity (0xE5/0xF5) as 16-bit value plus CRC, user register (0xE7)"""
+
+    USER_REGISTER_RESET = 0x02
+
+    def __init__(self, address=0x40, temperature=22.1, humidity=43.5, **kwargs):
+        super().__init__(address, temperature=temperature, humidity=humidity, **kwargs)
+
+    def frame(self, command):
+        if command == 0xE7:
+            return bytes((self.USER_REGISTER_RESET,))
+        if command in (0xE3, 0xF3):
+            raw = int((self.sample(self.temperature) + 46.85) * 65536 / 175.72)
+        else:
+            raw = int((self.sample(self.humidity) + 6) * 65536 / 125.0)
+        raw &= 0xFFFC
+        return bytes((raw >> 8, raw & 0xFF, 0))
+
+
+class TMP102Model(I2CDeviceModel):
+    """TMP102: 16-bit registers behind a pointer byte, temperature (0, 12-bit) and configuration (1)"""
+
+    # Configuration register at power-up: 12-bit resolution (read-only bits), 4 Hz conversions
+    CONFIG_RESET = 0x60A0
+
+    def __init__(self, address=0x48, temperature=23.25, **kwargs):
+        super().__init__(address, temperature=temperature, **kwargs)
+        self.config = self.CONFIG_RESET
+
+    def write(self, data):
+        if not data:
+            return
+        self.pointer = data[0] & 0x03
+        if self.pointer == 1 and len(data) >= 3:
+            # The resolution bits can't be written
+            self.config = (data[1] << 8 | data[2]) & ~0x6000 | 0x6000
+
+    def read(self, length):
+        if self.pointer == 0:
+            word = (int(round(self.sample(self.temperature) / 0.0625)) & 0xFFF) << 4
+        elif self.pointer == 1:
+            word = self.config
+        else:
+            word = 0
+        frame = struct.pack('>H', word)
+        # Reading on repeats the register
+        return bytes(frame[i % 2] for i in range(length))
+
+
+class TSL2561Model(I2CDeviceModel):
+    """TSL2561: ID register 0x0A and the two ADC channels (command byte = 0x80 | register)"""
+
+    # Simplified: channel 0 holds lux * 10 and the IR channel stays 0
+    COUNTS_PER_LUX = 10
+
+    def __init__(self, address=0x39, lux=180.0, **kwargs):
+        super().__init__(address, lux=lux, **kwargs)
+        self.regs[0x0A] = 0x50
+
+    def write(self, data):
+        if data:
+            data = bytes((data[0] & 0x0F,)) + bytes(data[1:])
+        super().write(data)
+
+    def refresh(self):
+        counts = max(0, min(0xFFFF, int(self.sample(self.lux) * self.COUNTS_PER_LUX)))
+        self.regs[0x0C:0x10] = struct.pack('<HH', counts, 0)
+
+
+class VL53L0XModel(I2CDeviceModel):
+    """VL53L0X: model ID 0xEE at 0xC0 and the range (mm) at RESULT_RANGE_STATUS + 10"""
+
+    def __init__(self, address=0x29, distance_mm=412, **kwargs):
+        super().__init__(address, distance_mm=distance_mm, **kwargs)
+        self.regs[0xC0] = 0xEE
+
+    def refresh(self):
+        self.regs[0x1E:0x20] = struct.pack('>H', max(0, min(8190, int(self.sample(self.distance_mm)))))
+
+
+class ADXL345Model(I2CDeviceModel):
+    """
+    ADXL345/343: DEVID 0xE5, full-resolution data registers (4 mg/LSB) and
+    activity interrupt. In FIFO stream mode samples accumulate at the BW_RATE
+    output rate (up to 32) and each data register read pops one; `vibration`
+    adds a sine of that amplitude (m/s^2 per axis) at `vibration_hz`.
+    """
+
+    LSB_PER_MS2 = 1 / (0.004 * 9.80665)
+    FIFO_SIZE = 32
+
+    def __init__(self, address=0x53, acceleration=(0.0, 0.0, 9.81), motion=False,
+                 vibration=(0.0, 0.0, 0.0), vibration_hz=50.0, **kwargs):
+        super().__init__(address, acceleration=tuple(acceleration), motion=motion,
+                         vibration=tuple(vibration), vibration_hz=vibration_hz, **kwargs)
+        self.regs[0x00] = 0xE5
+        self.regs[0x2C] = 0x0A
+        self.fifo_start = None
+        self.popped = 0
+
+    def rate(self):
+        return 3200.0 / (1 << (15 - (self.regs[0x2C] & 0x0F)))
+
+    def on_write(self, register, value):
+        if register in (0x2C, 0x2D, 0x38):
+            streaming = self.regs[0x38] & 0xC0 == 0x80 and self.regs[0x2D] & 0x08
+            self.fifo_start = time.monotonic() if streaming else None
+            self.popped = 0
+
+    def _raw(self, t):
+        values = [a + v * math.sin(2 * math.pi * self.vibration_hz * t)
+                  for a, v in zip(self.acceleration, self.vibration)]
+        return [max(-32768, min(32767, int(round(self.sample(a) * self.LSB_PER_MS2)))) for a in values]
+
+    def _fifo_entries(self):
+        produced = int((time.monotonic() - self.fifo_start) * self.rate())
+        # The oldest samples are overwritten once the FIFO is full
+        self.popped = max(self.popped, produced - self.FIFO_SIZE)
+        return produced - self.popped
+
+    def refresh(self):
+        if self.fifo_start is None:
+            self.regs[0x32:0x38] = struct.pack('<hhh', *self._raw(time.monotonic()))
+        elif self.pointer == 0x39:
+            self.regs[0x39] = self._fifo_entries()
+        elif self.pointer == 0x32 and self._fifo_entries() > 0:
+            self.regs[0x32:0x38] = struct.pack('<hhh', *self._raw(self.popped / self.rate()))
+            self.popped += 1
+            # A burst on into FIFO_STATUS sees the entries left after the pop
+            self.regs[0x39] = min(self.FIFO_SIZE, self._fifo_entries())
+        self.regs[0x30] = 0x10 if self.motion else 0x00
+
+
+class MPL3115A2Model(I2CDeviceModel):
+    """MPL3115A2: WHO_AM_I 0xC4; OUT_P holds altitude or pressure depending on CTRL_REG1"""
+
+    def __init__(self, address=0x60, temperature=20.5, pressure=101.3, altitude=120.0, **kwargs):
+        super().__init__(address, temperature=temperature, pressure=pressure, altitude=altitude, **kwargs)
+        self.regs[0x0C] = 0xC4
+
+    def refresh(self):
+        if self.regs[0x26] & 0x80:
+            word = int(round(self.sample(self.altitude) * 256)) & 0xFFFFF0
+        else:
+            word = int(round(self.sample(self.pressure) * 6400)) & 0xFFFFF0
+        self.regs[0x00] = 0x0E
+        self.regs[0x01:0x04] = word.to_bytes(3, 'big')
+        self.regs[0x04:0x06] = struct.pack('>h', int(round(self.sample(self.temperature) * 256)) & ~0x0F)
+
+
+class DS2482Model(I2CDeviceModel):
+    """DS2482 1-Wire master: answers with an idle status register"""
+
+    def __init__(self, address=0x18, **kwargs):
+        super().__init__(address, **kwargs)
+
+    def read(self, length):
+        return bytes([0x18] * length)
+
+
+I2C_MODELS = {
+    'bme280': BME280Model,
+    'bmp180': BMP180Model,
+    'bh1750': BH1750Model,
+    'hih6130': HIH6130Model,
+    'htu21d': HTU21DModel,
+    'tmp102': TMP102Model,
+    'tsl2561': TSL2561Model,
+    'vl53l0x': VL53L0XModel,
+    'adxl343': ADXL345Model,
+    'adxl345': ADXL345Model,
+    'mpl3115a2': MPL3115A2Model,
+    'ds2482': DS2482Model,
+}
+
+
+class SimBus:
+    """One simulated I2C bus: devices by address, transaction latency, failures and counters"""
+
+    def __init__(self, number, sim):
+        self.number = number
+        self.sim = sim
+        self.devices = {}
+        self.lock = threading.Lock()
+        self.transactions = 0
+        self.bytes = 0
+        self.errors = 0
+
+    def transfer(self, address, write=b'', read_length=0):
+        """One I2C transaction: optional write, then optional read (repeated start)"""
+        device = self.devices.get(address)
+        with self.lock:
+            self.transactions += 1
+            self.bytes += len(write) + read_length + 1
+            latency_ms = self.sim.latency_ms if device is None or device.latency_ms is None else device.latency_ms
+            if latency_ms:
+                time.sleep(latency_ms / 1000.0)
+            if device is None:
+                self.errors += 1
+                raise _remote_io_error()
+            error_rate = self.sim.error_rate if device.error_rate is None else device.error_rate
+            if device.fail_next > 0 or (error_rate and self.sim.random.random() < error_rate):
+                device.fail_next = max(0, device.fail_next - 1)
+                self.errors += 1
+                raise OSError(errno.EIO, os.strerror(errno.EIO))
+            if write:
+                device.write(bytes(write))
+            return device.read(read_length) if read_length else b''
+
+
+# ---------------------------------------------------------------------------
+# Stand-in modules
+# ---------------------------------------------------------------------------
+
+class FakeSMBus:
+    """smbus.SMBus / Adafruit_PureIO.smbus.SMBus over a simulated bus"""
+
+    def __init__(self, bus=None):
+        sim = _active()
+        if bus is None or int(bus) not in sim.buses:
+            raise FileNotFoundError(errno.ENOENT, f'No such file or directory: /dev/i2c-{bus}')
+        self.bus = sim.buses[int(bus)]
+
+    def close(self):
+        pass
+
+    def write_quick(self, addr):
+        self.bus.transfer(addr)
+
+    def read_byte(self, addr):
+        return self.bus.transfer(addr, read_length=1)[0]
+
+    def write_byte(self, addr, value):
+        self.bus.transfer(addr, bytes((value & 0xFF,)))
+
+    def read_byte_data(self, addr, cmd):
+        return self.bus.transfer(addr, bytes((cmd,)), 1)[0]
+
+    def write_byte_data(self, addr, cmd, value):
+        self.bus.transfer(addr, bytes((cmd, value & 0xFF)))
+
+    def read_word_data(self, addr, cmd):
+        return struct.unpack('<H', self.bus.transfer(addr, bytes((cmd,)), 2))[0]
+
+    def write_word_data(self, addr, cmd, value):
+        self.bus.transfer(addr, bytes((cmd,)) + struct.pack('<H', value & 0xFFFF))
+
+    def read_i2c_block_data(self, addr, cmd, length=32):
+        return list(self.bus.transfer(addr, bytes((cmd,)), length))
+
+    def write_i2c_block_data(self, addr, cmd, vals):
+        self.bus.transfer(addr, bytes((cmd,)) + bytes(vals))
+
+
+class FakeI2C:
+    """busio.I2C over simulated bus 1 (the board's default SCL/SDA)"""
+
+    def __init__(self, scl=None, sda=None, frequency=100000):
+        self.bus = _active().buses[_active().default_bus]
+        self._locked = False
+
+    def try_lock(self):
+        self._locked = True
+        return True
+
+    def unlock(self):
+        self._locked = False
+
+    def deinit(self):
+        pass
+
+    def scan(self):
+        return sorted(self.bus.devices)
+
+    def writeto(self, address, buffer, *, start=0, end=None):
+        self.bus.transfer(address, bytes(buffer[start:end]))
+
+    def readfrom_into(self, address, buffer, *, start=0, end=None):
+        end = len(buffer) if end is None else end
+        buffer[start:end] = self.bus.transfer(address, read_length=end - start)
+
+    def writeto_then_readfrom(self, address, buffer_out, buffer_in, *, out_start=0, out_end=None, in_start=0, in_end=None):
+        in_end = len(buffer_in) if in_end is None else in_end
+        buffer_in[in_start:in_end] = self.bus.transfer(address, bytes(buffer_out[out_start:out_end]), in_end - in_start)
+
+
+def _read_reg(i2c, address, register, length):
+    buf = bytearray(length)
+    i2c.writeto_then_readfrom(address, bytes((register,)), buf)
+    return bytes(buf)
+
+
+def _scaled_sleep(seconds):
+    scale = _active().time_scale
+    if scale:
+        time.sleep(seconds * scale)
+
+
+class FakeHTU21D:
+    def __init__(self, i2c_bus, address=0x40):
+        self.i2c = i2c_bus
+        self.address = address
+
+    def _measure(self, command):
+        self.i2c.writeto(self.address, bytes((command,)))
+        _scaled_sleep(HTU21D_CONVERSION_SEC)
+        buf = bytearray(3)
+        self.i2c.readfrom_into(self.address, buf)
+        return struct.unpack('>H', bytes(buf[:2]))[0] & 0xFFFC
+
+    @property
+    def temperature(self):
+        return -46.85 + 175.72 * self._measure(0xF3) / 65536.0
+
+    @property
+    def relative_humidity(self):
+        return -6 + 125.0 * self._measure(0xF5) / 65536.0
+
+
+class FakeTSL2561:
+    """The ADC result is valid one integration time after the sensor is enabled"""
+
+    INTEGRATION_SEC = {0: 0.0137, 1: TSL2561_INTEGRATION_SEC, 2: 0.402}
+
+    def __init__(self, i2c, address=0x39):
+        self.i2c = i2c
+        self.address = address
+        if _read_reg(i2c, address, 0x8A, 1)[0] >> 4 not in (0x1, 0x5):
+            raise RuntimeError('Failed to find TSL2561')
+        self._enabled_at = None
+        self.gain = 0
+        self.integration_time = 2
+
+    @property
+    def enabled(self):
+        return self._enabled_at is not None
+
+    @enabled.setter
+    def enabled(self, enable):
+        if not enable:
+            self._enabled_at = None
+        elif self._enabled_at is None:
+            self._enabled_at = time.monotonic()
+
+    @property
+    def lux(self):
+        if self._enabled_at is None:
+            return 0.0
+        scale = _active().time_scale
+        pending = self._enabled_at + self.INTEGRATION_SEC.get(self.integration_time, 0.402) * scale - time.monotonic()
+        if pending > 0:
+            time.sleep(pending)
+        broadband, _ = struct.unpack('<HH', _read_reg(self.i2c, self.address, 0x8C, 4))
+        return broadband / TSL2561Model.COUNTS_PER_LUX
+
+
+class FakeVL53L0X:
+    """Single-shot ranging takes the timing budget; continuous ranging has a result every budget"""
+
+    def __init__(self, i2c, address=0x29, io_timeout_s=0):
+        self.i2c = i2c
+        self.address = address
+        if _read_reg(i2c, address, 0xC0, 1)[0] != 0xEE:
+            raise RuntimeError('Failed to find expected ID register values. Check wiring!')
+        self.measurement_timing_budget = int(VL53L0X_TIMING_BUDGET_SEC * 1e6)
+        self._continuous_since = None
+        self._taken = 0
+
+    def start_continuous(self):
+        self._continuous_since = time.monotonic()
+        self._taken = 0
+
+    def stop_continuous(self):
+        self._continuous_since = None
+
+    def _budget(self):
+        return self.measurement_timing_budget / 1e6 * _active().time_scale
+
+    @property
+    def data_ready(self):
+        if self._continuous_since is None:
+            return False
+        return time.monotonic() - self._continuous_since >= (self._taken + 1) * self._budget()
+
+    @property
+    def range(self):
+        if self._continuous_since is None:
+            _scaled_sleep(self.measurement_timing_budget / 1e6)
+        else:
+            budget = self._budget()
+            elapsed = time.monotonic() - self._continuous_since
+            if elapsed < (self._taken + 1) * budget:
+                time.sleep((self._taken + 1) * budget - elapsed)
+                elapsed = (self._taken + 1) * budget
+            self._taken = int(elapsed / budget) if budget else self._taken + 1
+        return struct.unpack('>H', _read_reg(self.i2c, self.address, 0x1E, 2))[0]
+
+
+class FakeADXL345:
+    def __init__(self, i2c, address=0x53):
+        self.i2c = i2c
+        self.address = address
+        if _read_reg(i2c, address, 0x00, 1)[0] != 0xE5:
+            raise RuntimeError('Failed to find the expected device ID register value')
+
+    def enable_motion_detection(self, *, threshold=18):
+        self.i2c.writeto(self.address, bytes((0x24, threshold)))
+        self.i2c.writeto(self.address, bytes((0x27, 0x70)))
+        self.i2c.writeto(self.address, bytes((0x2E, 0x10)))
+
+    @property
+    def events(self):
+        return {'motion': bool(_read_reg(self.i2c, self.address, 0x30, 1)[0] & 0x10)}
+
+    @property
+    def acceleration(self):
+        x, y, z = struct.unpack('<hhh', _read_reg(self.i2c, self.address, 0x32, 6))
+        return tuple(v * 0.004 * 9.80665 for v in (x, y, z))
+
+
+class FakeBMP085:
+    def __init__(self, mode=1, address=0x77, busnum=None, **kwargs):
+        sim = _active()
+        self.bus = sim.buses[sim.default_bus if busnum is None else int(busnum)]
+        self.address = address
+        if self.bus.transfer(address, b'\xd0', 1)[0] != 0x55:
+            raise RuntimeError('BMP180 not found')
+        self.model = self.bus.devices[address]
+
+    def read_temperature(self):
+        self.bus.transfer(self.address, b'\xf6', 2)
+        return self.model.sample(self.model.temperature)
+
+    def read_pressure(self):
+        self.bus.transfer(self.address, b'\xf6', 3)
+        return self.model.sample(self.model.pressure) * 100
+
+    def read_altitude(self, sealevel_pa=101325.0):
+        return 44330.0 * (1.0 - pow(self.read_pressure() / sealevel_pa, 1.0 / 5.255))
+
+
+class FakeDHT:
+    """adafruit_dht.DHT11/DHT22: values cached for 2s like the real library"""
+
+    model = 'dht22'
+
+    def __init__(self, pin, use_pulseio=True):
+        self.pin = getattr(pin, 'id', pin)
+        self._last = 0.0
+        self._temperature = None
+        self._humidity = None
+
+    def measure(self):
+        sim = _active()
+        if time.monotonic() - self._last < DHT_MIN_INTERVAL_SEC:
+            return
+        self._last = time.monotonic()
+        _scaled_sleep(DHT_READ_SEC)
+        sensor = sim.dht.get(self.pin)
+        if sensor is None or sensor.get('model', 'dht22') != self.model:
+            raise RuntimeError('DHT sensor not found, check wiring')
+        error_rate = sensor.get('error_rate', sim.error_rate)
+        if error_rate and sim.random.random() < error_rate:
+            raise RuntimeError('Checksum did not validate. Try again.')
+        self._temperature = sensor['temperature']
+        self._humidity = sensor['humidity']
+
+    @property
+    def temperature(self):
+        self.measure()
+        return self._temperature
+
+    @property
+    def humidity(self):
+        self.measure()
+        return self._humidity
+
+    def exit(self):
+        pass
+
+
+class FakeDHT11(FakeDHT):
+    model = 'dht11'
+
+
+class FakeW1ThermSensor:
+    """w1thermsensor.W1ThermSensor reading the simulated sysfs tree"""
+
+    def __init__(self, sensor_type=None, sensor_id=None, slave=None):
+        self.slave = slave
+        self.type_name = slave.split('-')[0] if slave else None
+        self.id = slave.split('-', 1)[1] if slave else sensor_id
+
+    @classmethod
+    def get_available_sensors(cls, types=None):
+        root = _paths.W1_DEVICES_DIR
+        slaves = sorted(n for n in os.listdir(root) if not n.startswith('w1_bus_master')) if os.path.isdir(root) else []
+        return [cls(slave=s) for s in slaves if os.path.exists(os.path.join(root, s, 'w1_slave'))]
+
+    def get_temperature(self, unit=None):
+        sim = _active()
+        _scaled_sleep(W1_CONVERSION_SEC)
+        if sim.error_rate and sim.random.random() < sim.error_rate:
+            raise RuntimeError(f'Sensor {self.id} is not ready to read')
+        with open(os.path.join(_paths.W1_DEVICES_DIR, self.slave, 'w1_slave'), 'r') as f:
+            lines = f.read().splitlines()
+        if not lines or not lines[0].strip().endswith('YES'):
+            raise RuntimeError(f'Sensor {self.id} is not ready to read')
+        return int(lines[1].split('t=')[1]) / 1000.0
+
+
+class FakeRegisterType(enum.Enum):
+    INPUT = 1
+    HOLDING = 2
+
+
+# Input registers of the simulated meters: name -> address (all FLOAT32)
+SDM_REGISTERS = {
+    'voltage': 0x0000, 'current': 0x0006, 'power_active': 0x000C, 'power_apparent': 0x0012,
+    'power_reactive': 0x0018, 'power_factor': 0x001E, 'frequency': 0x0046,
+    'import_energy_active': 0x0048, 'export_energy_active': 0x004A, 'total_energy_active': 0x0156,
+}
+SDM_3P_REGISTERS = {
+    'l1_voltage': 0x0000, 'l2_voltage': 0x0002, 'l3_voltage': 0x0004, 'l1_current': 0x0006,
+    'l2_current': 0x0008, 'l3_current': 0x000A, 'total_power': 0x0034, 'total_power_active': 0x0034,
+    'frequency': 0x0046, 'total_energy_active': 0x0156,
+}
+# Three-phase register -> the single-phase value it takes from the simulation config
+SDM_3P_VALUES = {'l1_voltage': 'voltage', 'l1_current': 'current', 'total_power': 'power_active',
+                 'total_power_active': 'power_active'}
+
+
+class FakeSDMClient:
+    """pymodbus 3.5/3.6 serial client: the reply timeout lives in comm_params"""
+
+    def __init__(self, timeout):
+        self.comm_params = types.SimpleNamespace(timeout_connect=timeout)
+        self.lock = threading.Lock()
+        self.connected = True
+        self.requests = 0
+
+
+class FakeSDM:
+    """sdm_modbus meter: values per (port, unit) from the simulation config"""
+
+    model = 'SDM'
+    register_map = SDM_REGISTERS
+
+    def __init__(self, host=None, port=None, device=None, stopbits=1, parity='N', baud=2400,
+                 timeout=1, retries=3, unit=1, parent=None, **kwargs):
+        if parent is not None:
+            self.device = parent.device
+            self.client = parent.client
+            self.retries = parent.retries
+        else:
+            self.device = device
+            self.client = FakeSDMClient(timeout)
+            self.retries = retries
+        self.unit = unit
+        self.registers = {key: (address, 2, FakeRegisterType.INPUT, None, float, key, '', 1, 1)
+                          for key, address in self.register_map.items()}
+
+    def connected(self):
+        return self.client.connected
+
+    def connect(self):
+        self.client.connected = True
+        return True
+
+    def disconnect(self):
+        self.client.connected = False
+
+    def _request(self):
+        """One Modbus round trip; None if the unit doesn't answer within the retries"""
+        sim = _active()
+        with self.client.lock:
+            for _ in range(max(1, self.retries)):
+                self.client.requests += 1
+                values = sim.sdm.get(self.device, {}).get(int(self.unit))
+                if values is None:
+                    _scaled_sleep(self.client.comm_params.timeout_connect)
+                    continue
+                _scaled_sleep(SDM_REQUEST_SEC)
+                if sim.error_rate and sim.random.random() < sim.error_rate:
+                    continue
+                return values
+        return None
+
+    def _read_all(self, values, rtype):
+        data = self._request()
+        if data is None:
+            return {}
+        return {key: float(data.get(key, data.get(SDM_3P_VALUES.get(key), 0.0))) for key in values}
+
+    def read(self, key, scaling=False):
+        data = self._request()
+        if data is None:
+            raise OSError(errno.ETIMEDOUT, f'No response from unit {self.unit} on {self.device}')
+        return float(data.get(key, 0.0))
+
+    def read_all(self, rtype=None, scaling=False):
+        return self._read_all(self.registers, rtype)
+
+
+class FakeCPUTemperature:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    @property
+    def temperature(self):
+        return _active().cpu_temperature
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    module.__simulated__ = True
+    return module
+
+
+def _board_module():
+    class Pin:
+        def __init__(self, pin_id):
+            self.id = pin_id
+
+        def __repr__(self):
+            return f'board.D{self.id}'
+
+    pins = {f'D{n}': Pin(n) for n in range(28)}
+    return _module('board', SCL=pins['D3'], SDA=pins['D2'], **pins)
+
+
+def _stand_in_modules():
+    smbus = _module('smbus', SMBus=FakeSMBus)
+    pureio_smbus = _module('Adafruit_PureIO.smbus', SMBus=FakeSMBus)
+    bmp085 = _module('Adafruit_BMP.BMP085', BMP085=FakeBMP085, BMP085_STANDARD=1)
+    sdm_classes = {name: type(name, (FakeSDM,), {'model': name, 'register_map': registers})
+                   for name, registers in (('SDM72', SDM_3P_REGISTERS), ('SDM72V2', SDM_3P_REGISTERS),
+                                           ('SDM120', SDM_REGISTERS), ('SDM230', SDM_REGISTERS),
+                                           ('SDM630', SDM_3P_REGISTERS))}
+    return {
+        'smbus': smbus,
+        'Adafruit_PureIO': _module('Adafruit_PureIO', smbus=pureio_smbus),
+        'Adafruit_PureIO.smbus': pureio_smbus,
+        'Adafruit_BMP': _module('Adafruit_BMP', BMP085=bmp085),
+        'Adafruit_BMP.BMP085': bmp085,
+        'board': _board_module(),
+        'busio': _module('busio', I2C=FakeI2C),
+        'adafruit_dht': _module('adafruit_dht', DHT22=FakeDHT, DHT11=FakeDHT11),
+        'adafruit_htu21d': _module('adafruit_htu21d', HTU21D=FakeHTU21D),
+        'adafruit_tsl2561': _module('adafruit_tsl2561', TSL2561=FakeTSL2561),
+        'adafruit_vl53l0x': _module('adafruit_vl53l0x', VL53L0X=FakeVL53L0X),
+        'adafruit_adxl34x': _module('adafruit_adxl34x', ADXL345=FakeADXL345, ADXL343=FakeADXL345),
+        'w1thermsensor': _module('w1thermsensor', W1ThermSensor=FakeW1ThermSensor),
+        'sdm_modbus': _module('sdm_modbus', registerType=FakeRegisterType, **sdm_classes),
+        'gpiozero': _module('gpiozero', CPUTemperature=FakeCPUTemperature),
+    }
+
+
+# ---------------------------------------------------------------------------
+# Simulation
+# ---------------------------------------------------------------------------
+
+class Simulation:
+    """
+    Simulated hardware, installed process-wide until uninstall()
+
+    Config keys (all optional):
+        latency_ms: I2C transaction latency (default 0.2, per device: latency_ms)
+        error_rate: probability that a transaction or read fails (per device: error_rate)
+        time_scale: multiplier for sensor conversion times (1 = real time, 0 = instant)
+        seed: random seed for noise and error injection
+        i2c: {bus: [device, ...]}, device = {model, address, <values>, noise, latency_ms, error_rate}
+        w1: [{id, temperature}], dht: {gpio_pin: {model, temperature, humidity}},
+        sdm: {port: {unit: {voltage, current, power_active, ...}}},
+        hwmon: [{name, temps: {temp1: C}, fans: {fan1: rpm}, voltages: {in0: V}, power: {power1: W},
+               labels: {temp1: label}}], cpu_temperature
+    """
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.latency_ms = float(config.get('latency_ms', 0.2))
+        self.error_rate = float(config.get('error_rate', 0.0))
+        self.time_scale = float(config.get('time_scale', 1.0))
+        self.random = random.Random(config.get('seed', 1))
+        self.cpu_temperature = float(config.get('cpu_temperature', 47.8))
+        self.dht = {int(pin): dict(sensor) for pin, sensor in (config.get('dht') or DEFAULT_DHT).items()}
+        self.sdm = {port: {int(unit): dict(values) for unit, values in units.items()}
+                    for port, units in (config.get('sdm') or DEFAULT_SDM).items()}
+        self.w1_sensors = [dict(s) for s in (config.get('w1') if config.get('w1') is not None else DEFAULT_W1_SENSORS)]
+        self.hwmon = [dict(chip) for chip in (config.get('hwmon') if config.get('hwmon') is not None else DEFAULT_HWMON)]
+
+        self.buses = {}
+        i2c = config.get('i2c') or {1: DEFAULT_I2C_DEVICES}
+        for number, devices in i2c.items():
+            bus = self.buses[int(number)] = SimBus(int(number), self)
+            for spec in devices:
+                spec = dict(spec)
+                model = I2C_MODELS[spec.pop('model')]
+                if 'address' in spec:
+                    spec['address'] = int(str(spec['address']), 0)
+                device = model(**spec)
+                bus.devices[device.address] = device
+        self.default_bus = min(self.buses) if 1 not in self.buses else 1
+
+        self.root = None
+        self._saved_modules = {}
+        self._saved_env = {}
+        self._saved_paths = None
+
+    def i2c_device(self, bus, address):
+        """Return the model at an address, e.g. to change its values or set fail_next"""
+        return self.buses[bus].devices[address]
+
+    def set_w1_temperature(self, sensor_id, temperature):
+        for sensor in self.w1_sensors:
+            if sensor['id'] == sensor_id:
+                sensor['temperature'] = temperature
+        if self.root:
+            self._write_w1()
+
+    def stats(self):
+        """Transaction counters per I2C bus"""
+        return {number: {'transactions': bus.transactions, 'bytes': bus.bytes, 'errors': bus.errors}
+                for number, bus in self.buses.items()}
+
+    def install(self):
+        global _sim
+        if _sim is not None:
+            raise RuntimeError('A simulation is already installed')
+        self.root = tempfile.mkdtemp(prefix='nettemp-sim-')
+        self._build_tree()
+
+        for name, module in _stand_in_modules().items():
+            self._saved_modules[name] = sys.modules.get(name)
+            sys.modules[name] = module
+
+        sysfs = os.path.join(self.root, 'sys')
+        dev = os.path.join(self.root, 'dev')
+        sensors = os.path.join(self.root, 'bin', 'sensors')
+        env = {'NETTEMP_SYSFS_ROOT': sysfs, 'NETTEMP_DEV_ROOT': dev, 'NETTEMP_SENSORS_BIN': sensors,
+               'NETTEMP_STATE_DIR': self.root}
+        for key, value in env.items():
+            self._saved_env[key] = os.environ.get(key)
+            os.environ[key] = value
+        self._saved_paths = (_paths.SYSFS_ROOT, _paths.DEV_ROOT, _paths.SENSORS_BIN, _paths.STATE_DIR)
+        _paths.set_roots(sysfs, dev, sensors, self.root)
+        # Pooled bus handles must be opened on the simulated buses, and dropped again on uninstall
+        _i2c.pool.close()
+
+        # Drivers imported before install keep their references to the real modules
+        for name in [n for n in sys.modules if n.startswith('drivers.') and not n.startswith('drivers._')]:
+            del sys.modules[name]
+        _sim = self
+        logging.info(f'Simulation installed ({sum(len(b.devices) for b in self.buses.values())} I2C devices, '
+                     f'{len(self.w1_sensors)} 1-Wire sensors) in {self.root}')
+        return self
+
+    def uninstall(self):
+        global _sim
+        if _sim is not self:
+            return
+        for name, module in self._saved_modules.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        for key, value in self._saved_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        _paths.set_roots(*self._saved_paths)
+        _i2c.pool.close()
+        for name in [n for n in sys.modules if n.startswith('drivers.') and not n.startswith('drivers._')]:
+            del sys.modules[name]
+        shutil.rmtree(self.root, ignore_errors=True)
+        self.root = None
+        _sim = None
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, *exc):
+        self.uninstall()
+
+    def _build_tree(self):
+        os.makedirs(os.path.join(self.root, 'dev'))
+        for number in self.buses:
+            open(os.path.join(self.root, 'dev', f'i2c-{number}'), 'w').close()
+        self._write_w1()
+
+        hwmon_dir = os.path.join(self.root, 'sys', 'class', 'hwmon')
+        os.makedirs(hwmon_dir)
+        sensors_json = {}
+        for index, chip in enumerate(self.hwmon):
+            path = os.path.join(hwmon_dir, f'hwmon{index}')
+            os.makedirs(path)
+            with open(os.path.join(path, 'name'), 'w') as f:
+                f.write(chip['name'] + '\n')
+            entry = sensors_json[f"{chip['name']}-virtual-0"] = {'Adapter': 'Virtual device'}
+            labels = chip.get('labels', {})
+            for key, scale in (('temps', 1000), ('fans', 1), ('voltages', 1000), ('power', 1000000)):
+                for channel, value in chip.get(key, {}).items():
+                    with open(os.path.join(path, f'{channel}_input'), 'w') as f:
+                        f.write(f'{int(round(value * scale))}\n')
+                    if channel in labels:
+                        with open(os.path.join(path, f'{channel}_label'), 'w') as f:
+                            f.write(labels[channel] + '\n')
+                    entry[labels.get(channel, channel)] = {f'{channel}_input': value}
+
+        thermal = os.path.join(self.root, 'sys', 'class', 'thermal', 'thermal_zone0')
+        os.makedirs(thermal)
+        with open(os.path.join(thermal, 'temp'), 'w') as f:
+            f.write(f'{int(round(self.cpu_temperature * 1000))}\n')
+
+        bin_dir = os.path.join(self.root, 'bin')
+        os.makedirs(bin_dir)
+        with open(os.path.join(bin_dir, 'sensors.json'), 'w') as f:
+            json.dump(sensors_json, f)
+        script = os.path.join(bin_dir, 'sensors')
+        with open(script, 'w') as f:
+            f.write(f'#!/bin/sh\ncat "{os.path.join(bin_dir, "sensors.json")}"\n')
+        os.chmod(script, 0o755)
+
+    def _write_w1(self):
+        devices = os.path.join(self.root, 'sys', 'bus', 'w1', 'devices')
+        master = os.path.join(devices, 'w1_bus_master1')
+        os.makedirs(master, exist_ok=True)
+        with open(os.path.join(master, 'w1_master_slaves'), 'w') as f:
+            f.write(''.join(s['id'] + '\n' for s in self.w1_sensors) or 'not found.\n')
+        with open(os.path.join(master, 'therm_bulk_read'), 'w') as f:
+            f.write('0\n')
+        for sensor in self.w1_sensors:
+            path = os.path.join(devices, sensor['id'])
+            os.makedirs(path, exist_ok=True)
+            millis = int(round(sensor['temperature'] * 1000))
+            raw = int(round(sensor['temperature'] * 16)) & 0xFFFF
+            data = f'{raw & 0xFF:02x} {raw >> 8:02x} 4b 46 7f ff 0c 10 1c'
+            with open(os.path.join(path, 'w1_slave'), 'w') as f:
+                f.write(f'{data} : crc=1c YES\n{data} t={millis}\n')
+            with open(os.path.join(path, 'temperature'), 'w') as f:
+                f.write(f'{millis}\n')
+
+
+def simulated_drivers_config(read_in_sec=60):
+    """drivers_config.yaml contents that enable every driver the default simulation covers"""
+    names = ['adxl345', 'bh1750', 'bme280', 'bmp180', 'dht22', 'hih6130', 'htu21d', 'lm_sensors',
+             'mpl3115a2', 'rpi', 'sdm120', 'system', 'tmp102', 'tsl2561', 'vl53l0x', 'w1_kernel']
+    config = {name: {'enabled': True, 'read_in_sec': read_in_sec} for name in names}
+    config['dht22']['gpio_pin'] = 4
+    config['sdm120'].update(port='/dev/ttyUSB0', unit=1)
+    config['bme280']['i2c_address'] = '0x76'
+    return config
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Read drivers against simulated hardware')
+    parser.add_argument('--config', help='simulation config (YAML); defaults to one of each sensor')
+    parser.add_argument('--drivers', help='drivers_config.yaml to run (defaults to every simulated driver)')
+    parser.add_argument('--rounds', type=int, default=1, help='read each driver this many times')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+    import yaml
+    sim_config = {}
+    if args.config:
+        with open(args.config, 'r') as f:
+            sim_config = yaml.safe_load(f) or {}
+
+    with Simulation(sim_config) as sim:
+        from driver_loader import DriverLoader
+        drivers_file = args.drivers
+        if not drivers_file:
+            drivers_file = os.path.join(sim.root, 'drivers_config.yaml')
+            with open(drivers_file, 'w') as f:
+                yaml.safe_dump(simulated_drivers_config(), f)
+        loader = DriverLoader(config_file=os.path.abspath(drivers_file), settings={'cache_ttl_sec': 0})
+        try:
+            for name, cfg in loader.get_enabled_drivers():
+                # Every round is a real read: no cache, no worker process, no failure backoff or quarantine
+                cfg = dict(cfg, isolate=False, cache_ttl_sec=0, read_in_sec=0, quarantine_after=0)
+                for _ in range(args.rounds):
+                    start = time.monotonic()
+                    readings = loader.run_driver(name, cfg)
+                    took = (time.monotonic() - start) * 1000
+                    values = ', '.join(f'{r.name or r.rom}={r.value:g}' for r in readings) or 'no readings'
+                    print(f'{name:<16} {took:8.1f} ms  {values}')
+        finally:
+            loader.shutdown()
+        print(f'I2C bus stats: {sim.stats()}')
+
+
+if __name__ == '__main__':
+    main()
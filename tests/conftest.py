@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the client's top-level modules (scheduler, driver_loader, drivers...)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,23 @@
+import time
+
+from drivers import _i2c
+from simulation import Simulation
+
+
+def test_capture_drains_only_while_holding_the_bus_lock():
+    config = {'time_scale': 0, 'i2c': {1: [{'model': 'adxl345', 'address': 0x53, 'vibration': (0.0, 0.0, 2.0)}]}}
+    with Simulation(config):
+        from drivers.adxl345 import adxl345
+        driver = adxl345()
+        driver.open({'i2c_bus': 1, 'mode': 'capture', 'rate_hz': 400, 'window_sec': 0.25})
+        try:
+            assert driver.read()
+            capture = driver.capture
+            with _i2c.pool.lock(1):
+                held = capture.count
+                time.sleep(0.3)
+                assert capture.count == held
+            time.sleep(0.3)
+            assert capture.count > held
+        finally:
+            driver.close()
@@ -0,0 +1,20 @@
+from benchmark import bench_driver
+from driver_loader import DriverLoader
+
+
+def test_every_round_calls_a_failing_driver(tmp_path):
+    loader = DriverLoader(config_file=str(tmp_path / 'drivers_config.yaml'))
+    calls = []
+
+    def broken(config_dict):
+        calls.append(config_dict)
+        raise OSError('no device')
+
+    loader.loaded_drivers['broken'] = broken
+    try:
+        result = bench_driver(loader, 'broken', {}, 30)
+    finally:
+        loader.shutdown()
+    # First read + 30 timed rounds + the traced read; quarantine would stop after 10
+    assert len(calls) == 32
+    assert result['empty'] == 30
@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from simulation import Simulation
+
+
+class ScriptedDHT:
+    """adafruit_dht device returning a fixed series of (temperature, humidity), None for a failed try"""
+
+    def __init__(self, samples):
+        self.samples = iter(samples)
+        self.current = None
+
+    @property
+    def temperature(self):
+        self.current = next(self.samples)
+        if self.current is None:
+            raise RuntimeError('Checksum did not validate. Try again.')
+        return self.current[0]
+
+    @property
+    def humidity(self):
+        return self.current[1]
+
+    def exit(self):
+        pass
+
+
+@pytest.fixture
+def dht():
+    with Simulation({'time_scale': 0, 'dht': {4: {'model': 'dht22'}}}):
+        from drivers import _dht
+        from drivers.dht22 import dht22
+
+        def open_scripted(series, **config):
+            driver = dht22()
+            driver.open(dict(config, gpio_pin=4))
+            driver.device = ScriptedDHT(series)
+            return driver
+
+        yield _dht, open_scripted
+
+
+def test_median_of_successful_samples_and_success_rate(dht, monkeypatch):
+    _dht, open_scripted = dht
+    monkeypatch.setattr(_dht, 'MIN_SPACING_SEC', 0)
+    driver = open_scripted([None, (20.0, 40.0), (30.0, 60.0), None, (21.0, 41.0)], attempts=5, samples=3)
+
+    values = {reading.type: reading.value for reading in driver.read()}
+    assert values == {'temp': 21.0, 'humid': 41.0, 'system': 60.0}
+
+
+def test_read_stops_at_the_loader_budget(dht, monkeypatch):
+    _dht, open_scripted = dht
+    monkeypatch.setattr(_dht, 'MIN_SPACING_SEC', 0.2)
+    # read_budget: 0.8 of 0.6 s leaves room for tries at 0, 0.2 and 0.4 s
+    driver = open_scripted([None] * 10, attempts=10, _timeout_sec=0.6)
+
+    start = time.monotonic()
+    assert driver.read() == []
+    assert time.monotonic() - start < 0.6
+    assert len(driver.history) == 3
@@ -0,0 +1,94 @@
+from driver_loader import DriverLoader
+
+
+def make_loader(tmp_path):
+    return DriverLoader(config_file=str(tmp_path / 'drivers_config.yaml'), settings={'i2c_batching': True})
+
+
+def test_instance_read_in_sec_overrides_driver_interval(tmp_path):
+    loader = make_loader(tmp_path)
+    config = {
+        'bme280': {
+            'enabled': True,
+            'read_in_sec': 60,
+            'i2c_bus': 1,
+            'instances': [
+                {'i2c_address': 0x76},
+                {'i2c_address': 0x77, 'read_in_sec': 10},
+            ],
+        },
+    }
+
+    enabled = {name: interval for name, _, interval in loader.load_drivers_from_config(config)}
+    assert enabled == {'bme280:0x76': 60, 'bme280:0x77': 10}
+
+    jobs = {job_id: ([name for name, _ in members], interval) for job_id, members, interval in loader.get_driver_jobs(config)}
+    assert jobs == {'i2c-1@60s': (['bme280:0x76'], 60), 'i2c-1@10s': (['bme280:0x77'], 10)}
+
+
+def test_invalid_instance_interval_skips_only_that_instance(tmp_path):
+    loader = make_loader(tmp_path)
+    config = {
+        'sdm120': {
+            'enabled': True,
+            'port': '/dev/ttyUSB0',
+            'instances': [{'unit': 1}, {'unit': 2, 'read_in_sec': 'often'}],
+        },
+    }
+    assert [name for name, _, _ in loader.load_drivers_from_config(config)] == ['sdm120:1']
+
+
+def run_rounds(loader, name, config_dict, rounds):
+    for _ in range(rounds):
+        loader.run_driver(name, dict(config_dict, read_in_sec=0, cache_ttl_sec=0))
+
+
+def test_driver_returning_nothing_by_design_is_not_quarantined(tmp_path):
+    loader = make_loader(tmp_path)
+    calls = []
+    loader.loaded_drivers['ds2482'] = lambda config_dict: calls.append(1) or []
+    try:
+        run_rounds(loader, 'ds2482', {}, 12)
+    finally:
+        loader.shutdown()
+    assert len(calls) == 12
+    assert loader.get_driver_health() == {}
+
+
+def test_empty_ok_opts_a_driver_out_but_exceptions_still_fail(tmp_path):
+    loader = make_loader(tmp_path)
+
+    def broken(config_dict):
+        raise OSError('no device')
+
+    loader.loaded_drivers['quiet'] = lambda config_dict: []
+    loader.loaded_drivers['empty'] = lambda config_dict: []
+    loader.loaded_drivers['system'] = broken
+    try:
+        run_rounds(loader, 'quiet', {'empty_ok': True}, 12)
+        run_rounds(loader, 'empty', {}, 12)
+        run_rounds(loader, 'system', {}, 12)
+        health = loader.get_driver_health()
+    finally:
+        loader.shutdown()
+    assert 'quiet' not in health
+    assert health['empty']['state'] == 'quarantined'
+    assert health['system']['state'] == 'quarantined'
+
+
+def test_drivers_get_the_loaders_effective_timeout(tmp_path):
+    from drivers._base import read_budget
+
+    loader = DriverLoader(config_file=str(tmp_path / 'drivers_config.yaml'), settings={'default_timeout_sec': 10})
+    seen = []
+    loader.loaded_drivers['probe'] = lambda config_dict: seen.append(config_dict) or []
+    try:
+        loader.run_driver('probe', {'empty_ok': True})
+        loader.run_driver('probe', {'empty_ok': True, 'timeout_sec': 4, 'cache_ttl_sec': 0})
+    finally:
+        loader.shutdown()
+    assert [c['_timeout_sec'] for c in seen] == [10, 4]
+    assert read_budget(seen[0]) == 8
+    # Outside the loader: the driver's own timeout_sec, else the loader's default
+    assert read_budget({'timeout_sec': 5}) == 4
+    assert read_budget({}) == 24
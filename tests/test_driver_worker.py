@@ -0,0 +1,98 @@
+import multiprocessing
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from drivers._base import Driver
+from driver_worker import DriverWorker, WorkerError, _worker_main
+
+
+def test_worker_closes_class_driver_on_stop(monkeypatch):
+    events = []
+
+    class Counter(Driver):
+        def open(self, config):
+            events.append('open')
+
+        def read(self):
+            return [{'name': 'count', 'value': 1}]
+
+        def close(self):
+            events.append('close')
+
+    module = types.ModuleType('drivers.counter')
+    module.counter = Counter
+    monkeypatch.setitem(sys.modules, 'drivers.counter', module)
+
+    parent, child = multiprocessing.Pipe()
+    worker = threading.Thread(target=_worker_main, args=(child, 'counter'), daemon=True)
+    worker.start()
+    parent.send({})
+    assert parent.recv()[0] == 'ok'
+    parent.send(None)
+    worker.join(5)
+    assert not worker.is_alive()
+    assert events == ['open', 'close']
+
+
+class FakeProcess:
+    pid = 4242
+
+    def __init__(self):
+        self.killed = False
+
+    def is_alive(self):
+        return not self.killed
+
+    def kill(self):
+        self.killed = True
+
+    def join(self, timeout=None):
+        pass
+
+
+class SilentConn:
+    """A pipe to a wedged worker: requests go out, no reply comes back"""
+
+    def send(self, obj):
+        pass
+
+    def poll(self, timeout):
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        pass
+
+
+def make_worker():
+    worker = DriverWorker(multiprocessing.get_context('spawn'), 'stuck')
+    worker.process = FakeProcess()
+    worker.conn = SilentConn()
+    return worker
+
+
+def test_watchdog_leaves_kill_to_the_reader():
+    worker = make_worker()
+    process = worker.process
+    with worker.lock:
+        worker.request_kill('exceeded 1s')
+        # The lock holder owns process and conn; the watchdog only leaves a request
+        assert not process.killed
+        assert worker.process is process
+    assert worker.kill_requested == 'exceeded 1s'
+
+
+def test_reader_kills_on_request():
+    worker = make_worker()
+    process = worker.process
+    timer = threading.Timer(0.3, worker.request_kill, args=['exceeded 1s'])
+    timer.start()
+    with pytest.raises(WorkerError, match='exceeded 1s'):
+        worker.call({}, timeout=30)
+    timer.join()
+    assert process.killed
+    assert worker.restarts == 1
@@ -0,0 +1,106 @@
+import errno
+import os
+import sys
+import types
+
+import pytest
+
+import hardware_probe
+from drivers import _paths
+
+
+class FakeSMBus:
+    """
+    Bus answering from a table of {address: {register: bytes}}; addresses in
+    BUSY are owned by a kernel driver
+    """
+
+    DEVICES = {}
+    BUSY = set()
+
+    def __init__(self, busnum):
+        self.busnum = busnum
+
+    def _device(self, addr):
+        if addr in self.BUSY:
+            raise OSError(errno.EBUSY, 'Device or resource busy')
+        if addr not in self.DEVICES:
+            raise OSError(errno.ENXIO, 'No such device or address')
+        return self.DEVICES[addr]
+
+    def write_quick(self, addr):
+        self._device(addr)
+
+    def read_byte(self, addr):
+        self._device(addr)
+        return 0
+
+    def read_byte_data(self, addr, register):
+        return self.read_i2c_block_data(addr, register, 1)[0]
+
+    def read_i2c_block_data(self, addr, register, length):
+        registers = self._device(addr)
+        if register not in registers:
+            raise OSError(errno.EIO, 'Input/output error')
+        return list(registers[register][:length])
+
+    def close(self):
+        pass
+
+
+TMP102 = {0x00: b'\x17\x40', 0x01: b'\x60\xa0'}
+
+
+@pytest.fixture
+def fake_bus(tmp_path, monkeypatch):
+    (tmp_path / 'dev').mkdir()
+    (tmp_path / 'dev' / 'i2c-1').touch()
+    monkeypatch.setattr(_paths, 'DEV_ROOT', str(tmp_path / 'dev'))
+    monkeypatch.setattr(_paths, 'SYSFS_ROOT', str(tmp_path / 'sys'))
+    monkeypatch.setitem(sys.modules, 'smbus', types.SimpleNamespace(SMBus=FakeSMBus))
+    monkeypatch.setattr(FakeSMBus, 'DEVICES', {})
+    monkeypatch.setattr(FakeSMBus, 'BUSY', set())
+    return tmp_path
+
+
+def test_busy_address_counts_as_present(fake_bus):
+    FakeSMBus.DEVICES = {0x48: TMP102}
+    FakeSMBus.BUSY = {0x18}
+    assert hardware_probe.scan_i2c() == {'1': {'0x18': 'ds2482', '0x48': 'tmp102'}}
+
+
+def test_kernel_bound_client_is_identified_by_name(fake_bus):
+    FakeSMBus.BUSY = {0x76}
+    client = fake_bus / 'sys' / 'bus' / 'i2c' / 'devices' / '1-0076'
+    os.makedirs(client)
+    (client / 'name').write_text('bme280\n')
+    assert hardware_probe.scan_i2c()['1']['0x76'] == 'bme280'
+
+
+def test_supported_chips_are_identified_by_id_register(fake_bus):
+    FakeSMBus.DEVICES = {
+        0x29: {0xC0: b'\xee'},
+        0x39: {0x8A: b'\x50'},
+        0x40: {0xE7: b'\x02'},
+        0x4a: TMP102,
+        0x53: {0x00: b'\xe5'},
+    }
+    assert hardware_probe.scan_i2c() == {'1': {
+        '0x29': 'vl53l0x', '0x39': 'tsl2561', '0x40': 'htu21d', '0x4a': 'tmp102', '0x53': 'adxl345',
+    }}
+
+
+def test_other_chips_at_known_addresses_enable_nothing(fake_bus):
+    FakeSMBus.DEVICES = {
+        # TSL2561 alternative address, but not a TSL2561
+        0x29: {0xC0: b'\x00', 0x8A: b'\x00'},
+        # Si7021 user register (reserved bits set), where an HTU21D would sit
+        0x40: {0xE7: b'\x3a'},
+        # ADS1115: configuration 0x8583 at power-up
+        0x48: {0x00: b'\x12\x34', 0x01: b'\x85\x83'},
+        # EEPROM at the ADXL345's alternative address
+        0x53: {0x00: b'\xff'},
+    }
+    result = {'i2c': hardware_probe.scan_i2c()}
+    assert set(result['i2c']['1'].values()) == {hardware_probe.UNKNOWN}
+    assert hardware_probe.detected_drivers(result)[0] == {}
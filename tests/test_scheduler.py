@@ -0,0 +1,65 @@
+import threading
+import time
+
+from scheduler import SimpleScheduler
+
+
+def test_remove_then_readd_runs_once_per_interval():
+    scheduler = SimpleScheduler()
+    runs = []
+    lock = threading.Lock()
+
+    def job():
+        with lock:
+            runs.append(time.monotonic())
+
+    scheduler.start()
+    try:
+        scheduler.add_job(job, 'interval', seconds=0.2, id='reader', max_instances=2)
+        scheduler.remove_job('reader')
+        scheduler.add_job(job, 'interval', seconds=0.2, id='reader', max_instances=2)
+        time.sleep(0.9)
+    finally:
+        scheduler.shutdown()
+    # Four slots in 0.9 s; a stale heap entry would double that (max_instances=2 lets the
+    # duplicate through instead of skipping it as still running)
+    assert 3 <= len(runs) <= 5
+
+
+def test_replace_existing_keeps_single_schedule():
+    scheduler = SimpleScheduler()
+    runs = []
+    scheduler.start()
+    try:
+        scheduler.add_job(runs.append, 'interval', seconds=0.2, args=[1], id='reader', max_instances=2)
+        scheduler.add_job(runs.append, 'interval', seconds=0.2, args=[2], id='reader', max_instances=2, replace_existing=True)
+        time.sleep(0.9)
+    finally:
+        scheduler.shutdown()
+    assert 1 not in runs
+    assert 3 <= len(runs) <= 5
+
+
+def test_builtin_worker_count_is_configurable():
+    from nettemp_client import create_scheduler
+    from scheduler import DEFAULT_MAX_WORKERS
+
+    assert DEFAULT_MAX_WORKERS >= 10
+    assert create_scheduler('builtin').max_workers == DEFAULT_MAX_WORKERS
+    assert create_scheduler('builtin', 16).max_workers == 16
+
+
+def test_blocked_jobs_do_not_starve_others():
+    scheduler = SimpleScheduler(max_workers=3)
+    release = threading.Event()
+    runs = []
+    scheduler.start()
+    try:
+        for n in range(2):
+            scheduler.add_job(release.wait, 'interval', seconds=0.1, id=f'stuck{n}')
+        scheduler.add_job(runs.append, 'interval', seconds=0.1, args=[1], id='reader')
+        time.sleep(0.5)
+    finally:
+        release.set()
+        scheduler.shutdown()
+    assert len(runs) >= 3
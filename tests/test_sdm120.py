@@ -0,0 +1,84 @@
+import logging
+import time
+import types
+
+import pytest
+
+from simulation import Simulation
+
+
+@pytest.fixture
+def sdm():
+    with Simulation({'time_scale': 0}):
+        import sdm_modbus
+        from drivers import sdm120
+        yield sdm_modbus, sdm120
+
+
+def test_poll_errors_are_logged_as_warnings(sdm, caplog):
+    sdm_modbus, sdm120 = sdm
+    meter = sdm_modbus.SDM120(device='/dev/ttyUSB0', unit=1)
+    unit = sdm120.MeterUnit(meter, {'read_in_sec': 10})
+
+    def broken(values, rtype):
+        raise AttributeError("'ModbusSerialClient' object has no attribute 'read_input_registers'")
+
+    meter._read_all = broken
+    with caplog.at_level(logging.WARNING):
+        unit.poll()
+    assert unit.values is None and unit.failures == 1
+    assert 'poll failed: AttributeError' in caplog.text
+
+
+def test_block_plan_groups_nearby_registers_and_splits_long_spans(sdm):
+    _, sdm120 = sdm
+    registers = {'power': (12, 2), 'voltage': (0, 2), 'far': (118, 2), 'past': (119, 2), 'current': (6, 2)}
+
+    plan = sdm120.block_plan(registers, ['power', 'far', 'voltage', 'current'])
+    # 0..120 is exactly MAX_BLOCK_REGISTERS, so one read, in address order
+    assert [list(block) for block in plan] == [['voltage', 'current', 'power', 'far']]
+
+    plan = sdm120.block_plan(registers, ['past', 'voltage', 'current'])
+    assert [list(block) for block in plan] == [['voltage', 'current'], ['past']]
+    assert plan[1]['past'] == (119, 2)
+
+
+def test_pick_is_round_robin_over_due_units(sdm):
+    _, sdm120 = sdm
+    poller = sdm120.PortPoller('/dev/ttyUSB0')
+    now = time.monotonic()
+    poller.units = [types.SimpleNamespace(name=name, next_due=now - 1) for name in 'abc']
+
+    picked = [poller._pick()[0].name for _ in range(4)]
+    assert picked == ['a', 'b', 'c', 'a']
+
+    # Nothing due: report the wait until the soonest unit
+    for offset, unit in zip((30, 5, 60), poller.units):
+        unit.next_due = now + offset
+    unit, wait = poller._pick()
+    assert unit is None and 4 < wait <= 5
+
+
+def test_failing_unit_backs_off_exponentially_up_to_the_cap(sdm, caplog):
+    sdm_modbus, sdm120 = sdm
+    meter = sdm_modbus.SDM120(device='/dev/ttyUSB0', unit=1)
+    unit = sdm120.MeterUnit(meter, {'read_in_sec': 100})
+    good = meter._read_all
+    meter._read_all = lambda values, rtype: {}
+
+    delays = []
+    with caplog.at_level(logging.WARNING):
+        for _ in range(5):
+            unit.poll()
+            delays.append(unit.next_due - time.monotonic())
+    assert [round(d, -1) for d in delays] == [100, 200, 400, 600, 600]
+    assert unit.failures == 5
+    # A meter that stopped answering gets a single try per poll
+    assert meter.retries == 1
+
+    meter._read_all = good
+    # The poller only polls a unit once it is due
+    unit.next_due = time.monotonic()
+    unit.poll()
+    assert unit.failures == 0 and unit.values
+    assert round(unit.next_due - time.monotonic(), -1) == 100
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+from drivers import _paths
+from drivers import _w1
+
+
+def add_master(root, name, slaves, bulk=True):
+    master = root / name
+    master.mkdir()
+    (master / 'w1_master_slaves').write_text(''.join(s + '\n' for s in slaves))
+    if bulk:
+        (master / 'therm_bulk_read').write_text('0\n')
+    else:
+        # A directory can't be written to, like a kernel without bulk support
+        (master / 'therm_bulk_read').mkdir()
+    for slave in slaves:
+        (root / slave).mkdir()
+        (root / slave / 'temperature').write_text('21500\n')
+
+
+@pytest.fixture
+def w1_tree(tmp_path, monkeypatch):
+    devices = tmp_path / 'devices'
+    devices.mkdir()
+    monkeypatch.setattr(_paths, 'W1_DEVICES_DIR', str(devices))
+    monkeypatch.setattr(_paths, 'STATE_DIR', str(tmp_path))
+    _w1.invalidate()
+    yield devices
+    _w1.invalidate()
+
+
+def test_read_bulk_reads_sensors_of_a_failing_master_one_by_one(w1_tree):
+    add_master(w1_tree, 'w1_bus_master1', ['28-000000000001'])
+    add_master(w1_tree, 'w1_bus_master2', ['28-000000000002', '28-000000000003'], bulk=False)
+
+    results = dict(_w1.read_bulk())
+    assert results == {'28-000000000001': 21.5, '28-000000000002': 21.5, '28-000000000003': 21.5}
+
+
+def test_read_bulk_without_any_bulk_master_returns_none(w1_tree):
+    add_master(w1_tree, 'w1_bus_master1', ['28-000000000001'], bulk=False)
+    assert _w1.read_bulk() is None